@@ -0,0 +1,169 @@
+"""
+Export a trained GRU4Rec / SimpleSASRec checkpoint for CPU serving.
+
+The model is wrapped so top-k runs inside the graph (padding and items already
+in the session masked out), traced, frozen and saved as TorchScript together
+with its vocabulary, then benchmarked on CPU at several torch thread counts
+against the serving latency budget.
+
+Writes to --output-dir (the serving MODEL_DIR):
+    session_model.pt     TorchScript: (batch, max_len) int64 -> (scores, indices), each (batch, top_k)
+    session_vocab.npy    int64 item id of every model index (index 0 = padding, -1)
+    session_model.json   max_len, top_k, model type, latency report
+
+    python -m phase3.export_session_model --checkpoint ckpt/checkpoint.pth --model gru4rec \
+        --vocab vocab.json --output-dir ../serving/models
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+import numpy as np
+import torch
+import torch.nn as nn
+from phase3.session_models import GRU4Rec, SimpleSASRec
+from phase3.trainer import load_checkpoint
+from phase3.utils import get_logger, ensure_dir
+
+logger = get_logger(__name__)
+
+MODEL_FILE = "session_model.pt"
+VOCAB_FILE = "session_vocab.npy"
+META_FILE = "session_model.json"
+
+
+class SessionTopK(nn.Module):
+    """
+    Session model plus in-graph top-k, so serving gets (scores, indices)
+    for top_k items instead of logits over the whole vocabulary.
+    """
+    def __init__(self, model: nn.Module, top_k: int):
+        super().__init__()
+        self.model = model
+        self.top_k = top_k
+
+    def forward(self, input_seq: torch.LongTensor):
+        logits = self.model(input_seq)
+        # Padding (index 0) and items already in the session are never recommended.
+        logits = logits.scatter(1, input_seq, float("-inf"))
+        scores, indices = torch.topk(logits, self.top_k, dim=1)
+        return scores, indices
+
+
+def build_model(model_type: str, state_dict: Dict[str, torch.Tensor], n_heads: int = 4) -> nn.Module:
+    """
+    Rebuild the architecture from the checkpoint's tensor shapes.
+    """
+    if model_type == "gru4rec":
+        vocab_size, embed_dim = state_dict["embedding.weight"].shape
+        hidden_dim = state_dict["fc.weight"].shape[1]
+        n_layers = sum(1 for k in state_dict if k.startswith("gru.weight_ih_l"))
+        model = GRU4Rec(vocab_size, embed_dim, hidden_dim, n_layers)
+    elif model_type == "sasrec":
+        vocab_size, embed_dim = state_dict["item_emb.weight"].shape
+        num_layers = len({k.split(".")[2] for k in state_dict if k.startswith("transformer.layers.")})
+        model = SimpleSASRec(vocab_size, embed_dim, n_heads, num_layers)
+    else:
+        raise ValueError(f"Unknown session model type {model_type!r}, expected gru4rec or sasrec")
+    model.load_state_dict(state_dict)
+    return model.eval()
+
+
+def export(model: nn.Module, max_len: int, top_k: int) -> torch.jit.ScriptModule:
+    wrapped = SessionTopK(model, min(top_k, model.vocab_size - 1)).eval()
+    # Batch of 2 so the trace does not specialize on single requests (serving micro-batches).
+    example = torch.randint(1, model.vocab_size, (2, max_len), dtype=torch.long)
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapped, example)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+
+def latency_report(scripted, vocab_size: int, max_len: int, threads: List[int],
+                   iterations: int = 1000, budget_ms: float = 20.0, seed: int = 0) -> Dict[str, dict]:
+    """
+    p50/p99 single-request latency per torch thread count, on left-padded
+    sessions of random length, as served.
+    """
+    rng = np.random.default_rng(seed)
+    sessions = np.zeros((iterations, 1, max_len), dtype=np.int64)
+    for s, length in zip(sessions, rng.integers(1, max_len + 1, iterations)):
+        s[0, max_len - length:] = rng.integers(1, vocab_size, length)
+
+    report = {}
+    for n in threads:
+        torch.set_num_threads(n)
+        latencies = []
+        with torch.inference_mode():
+            for _ in range(20):  # warm up the profiling executor
+                scripted(torch.from_numpy(sessions[0]))
+            for s in sessions:
+                start = time.perf_counter()
+                scripted(torch.from_numpy(s))
+                latencies.append((time.perf_counter() - start) * 1000)
+        p99 = float(np.percentile(latencies, 99))
+        report[str(n)] = {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": p99,
+            "within_budget": p99 <= budget_ms,
+        }
+        logger.info("threads=%d p50=%.2fms p99=%.2fms", n, report[str(n)]["p50_ms"], p99)
+    return report
+
+
+def save_export(scripted, vocab: List[int], output_dir: str, meta: dict):
+    """
+    vocab[i] is the item id of model index i (i >= 1); index 0 is padding.
+    """
+    ensure_dir(output_dir)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    scripted.save(model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+
+    vocab_array = np.asarray(vocab, dtype=np.int64).copy()
+    vocab_array[0] = -1
+    with open(os.path.join(output_dir, VOCAB_FILE + ".tmp"), "wb") as f:
+        np.save(f, vocab_array, allow_pickle=False)
+    os.replace(os.path.join(output_dir, VOCAB_FILE + ".tmp"), os.path.join(output_dir, VOCAB_FILE))
+
+    # Written last: the server only loads a session model whose metadata exists.
+    with open(os.path.join(output_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    logger.info("Exported session model to %s", model_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a session model to TorchScript for CPU serving")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--model", choices=["gru4rec", "sasrec"], default="gru4rec")
+    parser.add_argument("--vocab", required=True,
+                        help="JSON list: item id of each model index (index 0 = padding)")
+    parser.add_argument("--n-heads", type=int, default=4, help="SASRec attention heads")
+    parser.add_argument("--max-len", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=100, help="Largest top_k the endpoint can serve")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--output-dir", required=True)
+    args = parser.parse_args()
+
+    state = load_checkpoint(args.checkpoint)
+    model = build_model(args.model, state.get("model_state_dict", state), args.n_heads)
+    with open(args.vocab) as f:
+        vocab = json.load(f)
+    if len(vocab) != model.vocab_size:
+        raise ValueError(f"Vocabulary has {len(vocab)} entries, model has {model.vocab_size}")
+
+    scripted = export(model, args.max_len, args.top_k)
+    threads = [int(t) for t in args.threads.split(",")]
+    latency = latency_report(scripted, model.vocab_size, args.max_len, threads,
+                             args.iterations, args.budget_ms)
+    save_export(scripted, vocab, args.output_dir, {
+        "model": args.model,
+        "max_len": args.max_len,
+        "top_k": min(args.top_k, model.vocab_size - 1),
+        "vocab_size": model.vocab_size,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "budget_ms": args.budget_ms,
+        "latency": latency,
+    })
@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from core.cache import cache_stats
+from core.executor import compute_stats
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -6,3 +8,13 @@ router = APIRouter(prefix="/health", tags=["health"])
 @router.get("/")
 def health_check():
     return {"status": "ok"}
+
+
+@router.get("/cache")
+def cache_health():
+    return {"cache": cache_stats()}
+
+
+@router.get("/compute")
+def compute_health():
+    return {"compute": compute_stats()}
@@ -1,10 +1,45 @@
-from fastapi import FastAPI
+import time
+_imports_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from core.config import settings
-from routers import recommend, similar, trending, health, reload
+from core.executor import ComputeQueueFull
+from core.metrics import observe_request, record_model
+from core.model_loader import get_model_store, load_models, start_model_watcher
+from core.startup import mark_preloaded, mark_ready, phase, record
+from services.item_filter_refresh import start_item_filter_refresh
+from services.trending_stream import start_trending_stream
+from routers import recommend, similar, trending, health, reload, metrics, ready
+
+record("imports", time.perf_counter() - _imports_started)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store = get_model_store()
+    if store["version"] is None:
+        with phase("artifacts"):
+            load_models()
+    else:
+        # gunicorn preload_app: the master loaded the artifacts before forking,
+        # this worker shares their pages; only publish what it serves.
+        mark_preloaded()
+        record_model(store["version"], {})
+    with phase("background_threads"):
+        # Every worker watches MODEL_DIR so /reload-model reaches all of them.
+        start_model_watcher()
+        start_trending_stream()
+        start_item_filter_refresh()
+    mark_ready()
+    yield
+
 
 app = FastAPI(
     title="Phase-4 Recommendation API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Routers
@@ -13,6 +48,31 @@ app.include_router(similar.router)
 app.include_router(trending.router)
 app.include_router(health.router)
 app.include_router(reload.router)
+app.include_router(metrics.router)
+app.include_router(ready.router)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route template (/recommend/{user_id}), not the raw path, keeps label cardinality bounded.
+    route = request.scope.get("route")
+    observe_request(
+        request.method, route.path if route is not None else "unmatched",
+        response.status_code, time.perf_counter() - start,
+    )
+    return response
+
+
+@app.exception_handler(ComputeQueueFull)
+async def compute_queue_full(request: Request, exc: ComputeQueueFull):
+    # Shed load instead of queueing: clients retry, latency stays bounded.
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, retry shortly"},
+        headers={"Retry-After": str(settings.COMPUTE_RETRY_AFTER_SECONDS)},
+    )
 
 
 @app.get("/")
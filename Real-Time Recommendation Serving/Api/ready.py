@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from core.model_loader import get_model_store
+from core.startup import is_ready, startup_report
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/ready")
+def readiness():
+    """
+    503 until the worker has its artifacts and background threads; the body
+    breaks its startup time down by phase.
+    """
+    report = startup_report()
+    store = get_model_store()
+    report["model_version"] = store["version"]
+    report["load_seconds"] = dict(store["load_seconds"])
+    return JSONResponse(status_code=200 if is_ready() else 503, content=report)
@@ -1,13 +1,96 @@
+import json
+from typing import List, Optional
 from fastapi import APIRouter, HTTPException
-from services.recommender_service import get_recommendations
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from core.cache import cached_call
+from core.config import settings
+from core.executor import ComputeQueueFull, run_compute
+from core.model_loader import get_model_store
+from services.recommender_service import (
+    is_cold_user, personalized_recommendations, recommendation_blocks
+)
+from services.session_recommender import session_recommendations_async
+from services.trending_engine import cold_start_recommendations
 
 router = APIRouter(prefix="/recommend", tags=["recommend"])
 
 
+class BatchRecommendRequest(BaseModel):
+    user_ids: List[int]
+    top_k: int = 10
+    category: Optional[str] = None
+
+
+class SessionRecommendRequest(BaseModel):
+    item_ids: List[int]
+    top_k: int = 10
+
+
+@router.post("/session")
+async def recommend_session(request: SessionRecommendRequest):
+    """
+    Next-item recommendations for the current session's item sequence
+    (oldest first), scored by the session model in micro-batches.
+    """
+    store = get_model_store()
+    if store["session_model"] is None:
+        raise HTTPException(status_code=503, detail="Session model not loaded")
+    recs = await session_recommendations_async(request.item_ids, request.top_k, store)
+    return {"item_ids": request.item_ids, "recommendations": recs}
+
+
+@router.post("/batch")
+async def recommend_batch(request: BatchRecommendRequest):
+    """
+    Recommendations for many users in one call, streamed as NDJSON
+    (one {"user_id", "recommendations"} object per line), the same lists
+    GET /recommend/{user_id} returns. Each block is scored on the compute
+    executor. If the executor is full after the response has started, the
+    stream ends with {"error": "overloaded", "remaining_user_ids": [...]}
+    so the client can retry those users.
+    """
+    if len(request.user_ids) > settings.BATCH_MAX_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_USERS} user_ids per batch",
+        )
+    store = get_model_store()
+    if request.category is not None and store["item_filters"] is None:
+        raise HTTPException(status_code=503, detail="Item filters not loaded")
+
+    blocks = recommendation_blocks(request.user_ids, request.top_k, store, request.category)
+    # Score the first block before answering so a full queue is still a 503.
+    first = await run_compute(next, blocks, None)
+
+    async def stream():
+        block, done = first, 0
+        while block is not None:
+            for user_id, recs in block:
+                yield json.dumps({"user_id": user_id, "recommendations": recs}) + "\n"
+            done += len(block)
+            try:
+                block = await run_compute(next, blocks, None)
+            except ComputeQueueFull:
+                remaining = request.user_ids[done:]
+                yield json.dumps({"error": "overloaded", "remaining_user_ids": remaining}) + "\n"
+                return
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/{user_id}")
-def recommend_items(user_id: int, top_k: int = 10):
+async def recommend_items(user_id: int, top_k: int = 10, category: Optional[str] = None):
+    store = get_model_store()
+    if category is not None and store["item_filters"] is None:
+        raise HTTPException(status_code=503, detail="Item filters not loaded")
     try:
-        recs = get_recommendations(user_id, top_k)
+        if is_cold_user(user_id, store):
+            recs = await cached_call(cold_start_recommendations, top_k, category, store=store)
+        else:
+            recs = await cached_call(personalized_recommendations, user_id, top_k, category, store=store)
         return {"user_id": user_id, "recommendations": recs}
+    except ComputeQueueFull:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,20 @@
-from fastapi import APIRouter
-from core.model_loader import load_models
+import asyncio
+from fastapi import APIRouter, HTTPException
+from core.model_loader import reload_models_in_background, signal_reload
 
 router = APIRouter(prefix="/reload-model", tags=["reload"])
 
 
 @router.post("/")
-def reload_model():
-    load_models()
-    return {"message": "Model reloaded successfully"}
+async def reload_model():
+    """
+    Build the new snapshot on the reload thread (awaited, so no request
+    thread is held meanwhile), swap it in, then signal the other workers
+    through the reload trigger file.
+    """
+    try:
+        version = await asyncio.wrap_future(reload_models_in_background())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous model still live: {e}")
+    signal_reload()
+    return {"message": "Model reloaded successfully", "version": version}
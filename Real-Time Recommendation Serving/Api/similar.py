@@ -1,13 +1,22 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
+from core.cache import cached_call
+from core.executor import ComputeQueueFull
+from core.model_loader import get_model_store
 from services.content_based import get_similar_items
 
 router = APIRouter(prefix="/similar", tags=["similar"])
 
 
 @router.get("/{item_id}")
-def similar_items(item_id: int, top_k: int = 10):
+async def similar_items(item_id: int, top_k: int = 10, category: Optional[str] = None):
+    store = get_model_store()
+    if category is not None and store["item_filters"] is None:
+        raise HTTPException(status_code=503, detail="Item filters not loaded")
     try:
-        items = get_similar_items(item_id, top_k)
+        items = await cached_call(get_similar_items, item_id, top_k, category, store=store)
         return {"item_id": item_id, "similar_items": items}
+    except ComputeQueueFull:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
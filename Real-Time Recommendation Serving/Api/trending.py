@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException
+from services.trending_engine import get_trending_items
+
+router = APIRouter(prefix="/trending", tags=["trending"])
+
+
+@router.get("/")
+async def trending_items(top_k: int = 10):
+    # A slice of the pre-ranked index: cheap enough to stay on the event loop.
+    try:
+        return {"trending": get_trending_items(top_k)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,69 @@
 # Gunicorn configuration for production
+import os
+import shutil
+import subprocess
+import sys
+
+# One BLAS thread per compute-executor thread (see core/executor.py); must be
+# set before workers import numpy.
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, os.environ.get("BLAS_THREADS", "1"))
+
+# Prometheus multiprocess mode (core/metrics.py): workers write their samples
+# here and /metrics aggregates them. With preload_app the master imports the
+# app (and opens its metric files) before any server hook runs, so the
+# directory is emptied and created here, when gunicorn reads this file.
+# Samples of a previous run would otherwise be summed into the new one.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 bind = "0.0.0.0:8000"
 workers = 4
 worker_class = "uvicorn.workers.UvicornWorker"
-timeout = 120
+# Import the app once in the master and load the artifacts there (when_ready),
+# so workers fork with them already mapped: a worker boots in well under a
+# second and shares the artifact pages instead of loading its own copy.
+preload_app = True
+# Boot no longer includes artifact loading, so a stuck worker is caught sooner.
+timeout = 30
 loglevel = "info"
 accesslog = "/app/logs/access.log"
 errorlog = "/app/logs/errors.log"
 capture_output = True
+
+
+def when_ready(server):
+    # Runs in the master after the app import, before the first worker forks.
+    # No model metrics from the master: child_exit only clears workers' series,
+    # so its version gauge would outlive every reload. Workers publish their own.
+    from core.model_loader import load_models
+    from core.startup import phase
+    with phase("artifacts"):
+        version = load_models(record_metrics=False)
+    server.log.info("Artifacts %s loaded in master", version)
+    # The app import created the master's live gauges (e.g. worker RSS);
+    # drop them so /metrics only shows processes that serve.
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(os.getpid())
+
+    # One trending producer for all workers (services/trending_stream.py): a
+    # separate process, so the master never holds DB connections the workers
+    # would inherit. Workers only read the file it writes.
+    from core.config import settings
+    if settings.TRENDING_STREAM_ENABLED and settings.TRENDING_PRODUCER_IN_MASTER:
+        server.trending_producer = subprocess.Popen([sys.executable, "-m", "services.trending_stream"])
+        server.log.info("Trending producer started (pid %s)", server.trending_producer.pid)
+
+
+def on_exit(server):
+    producer = getattr(server, "trending_producer", None)
+    if producer is not None:
+        producer.terminate()
+        producer.wait(timeout=10)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges (RSS, model version) of a worker that is gone.
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
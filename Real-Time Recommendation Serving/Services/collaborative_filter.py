@@ -1,14 +1,57 @@
-from core.model_loader import model_store
+from core.batcher import MicroBatcher
+from core.config import settings
+from core.metrics import timed
+from core.model_loader import get_model_store, row_of, rows_of
+from utils.scoring_utils import empty_candidates, matrix_scores, matrix_top_k, top_k_candidates
 
-def cf_score(user_id: int):
-    user_emb = model_store["user_embeddings"].get(user_id)
-    item_emb = model_store["item_embeddings"]
+@timed("cf_score")
+def cf_score(user_id: int, top_k: int = None, store=None, rows=None):
+    """
+    Candidate stage: score the catalog with one matrix-vector product and
+    return the top_k (settings.CF_TOP_K by default) as (rows, scores) arrays
+    of catalog rows. With `rows` (sorted catalog rows, e.g. one category)
+    only those are scored.
+    """
+    store = store or get_model_store()
+    row = row_of(store["user_ids"], user_id)
+    if row < 0:
+        return empty_candidates()
 
-    if user_emb is None:
-        return {}
+    if rows is None:
+        scores = matrix_scores(store["item_matrix"], store["user_matrix"][row], store.get("item_matrix_scale"))
+        return top_k_candidates(scores, top_k or settings.CF_TOP_K)
+    scale = store.get("item_matrix_scale")
+    scores = matrix_scores(
+        store["item_matrix"][rows], store["user_matrix"][row], None if scale is None else scale[rows]
+    )
+    top, top_scores = top_k_candidates(scores, top_k or settings.CF_TOP_K)
+    return rows[top], top_scores
 
-    scores = {}
-    for item_id, emb in item_emb.items():
-        scores[item_id] = float(user_emb @ emb)
 
-    return scores
+@timed("cf_score_batch")
+def cf_score_batch(requests):
+    """
+    Batched cf_score for a list of (user_id, top_k, store) requests: one
+    (users x dim) @ (dim x items) multiply per snapshot in the batch, in item
+    blocks (matrix_top_k), so a batch never holds a users x items array.
+    Returns one (rows, scores) pair per request, in order.
+    """
+    results = [empty_candidates()] * len(requests)
+    by_store = {}
+    for i, (user_id, top_k, store) in enumerate(requests):
+        by_store.setdefault(id(store), (store, []))[1].append(i)
+
+    for store, positions in by_store.values():
+        user_rows = rows_of(store["user_ids"], [requests[i][0] for i in positions])
+        known = [(i, row) for i, row in zip(positions, user_rows.tolist()) if row >= 0]
+        if not known:
+            continue
+        ks = [requests[i][1] or settings.CF_TOP_K for i, _ in known]
+        users = store["user_matrix"][[row for _, row in known]]
+        top, top_scores = matrix_top_k(store["item_matrix"], users.T, max(ks), store.get("item_matrix_scale"))
+        for (i, _), k, row_top, row_scores in zip(known, ks, top, top_scores):
+            results[i] = (row_top[:k], row_scores[:k])
+    return results
+
+
+cf_batcher = MicroBatcher(cf_score_batch)
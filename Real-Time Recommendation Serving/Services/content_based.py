@@ -1,37 +1,131 @@
-from core.model_loader import model_store
-from utils.scoring_utils import cosine_similarity
+import numpy as np
+from core.cache import local_tier, read_through
+from core.config import settings
+from core.item_filters import allowed_mask, category_rows
+from core.local_cache import MISSING
+from core.metrics import stage_timer, timed
+from core.model_loader import get_model_store, row_of, rows_of, seen_rows
+from utils.scoring_utils import (
+    dequantize_rows, empty_candidates, matrix_scores, normalize_rows, top_k_candidates, top_k_indices
+)
 
-def get_similar_items(item_id: int, top_k: int = 10):
-    target = model_store["content_embeddings"].get(item_id)
-    items = model_store["content_embeddings"]
+@local_tier("similar", maxsize=settings.LOCAL_CACHE_SIZE_SIMILAR, ttl=settings.LOCAL_CACHE_TTL_SIMILAR)
+@read_through("similar", ttl=settings.CACHE_TTL_SIMILAR)
+def get_similar_items(item_id: int, top_k: int = 10, category: str = None, store=None):
+    """
+    Nearest neighbours by content embedding that pass the item filters (and
+    are in `category`, if given). Tries, in order: the precomputed neighbour
+    table (a slice, independent of catalog size), the snapshot's FAISS
+    index, exact brute-force cosine.
+    """
+    store = store or get_model_store()
+    row = row_of(store["item_ids"], item_id)
 
-    if target is None:
+    if row < 0:
         return []
 
-    sims = {}
-    for other, emb in items.items():
-        sims[other] = cosine_similarity(target, emb)
+    filters = store.get("item_filters")
+    filtered = filters is not None
+    table = store["neighbour_rows"]
+    if table is not None:
+        complete = table.shape[1] >= len(table) - 1
+        if not filtered and (top_k <= table.shape[1] or complete):
+            return store["item_ids"][table[row, :top_k]].tolist()
+        if filtered:
+            rows = table[row]
+            rows = rows[allowed_mask(filters, rows, category)][:top_k]
+            # Too many neighbours filtered out: search further below.
+            if len(rows) == top_k or complete:
+                return store["item_ids"][rows].tolist()
+
+    if store["faiss_index"] is not None and category is None:
+        # Already imported by the model loader when it loaded the index.
+        from core.faiss_loader import search
+        fetch = top_k + 1 if not filtered else (top_k + 1) * settings.ITEM_FILTERS_OVERFETCH
+        with stage_timer("faiss_search"):
+            ids, _ = search(content_rows(store, [row])[0], fetch, index=store["faiss_index"])
+        ids = [i for i in ids if i != item_id]
+        if filtered:
+            rows = rows_of(store["item_ids"], ids)
+            ids = [i for i, ok in zip(ids, (rows >= 0) & allowed_mask(filters, np.maximum(rows, 0))) if ok]
+        if len(ids) >= top_k or not filtered:
+            return ids[:top_k]
+
+    return exact_similar_items(row, top_k, store, category)
 
-    sorted_items = sorted(sims.items(), key=lambda x: x[1], reverse=True)
-    sorted_items = [i for i, s in sorted_items if i != item_id]
 
-    return sorted_items[:top_k]
+@timed("similar_exact")
+def exact_similar_items(row: int, top_k: int, store, category: str = None):
+    item_ids = store["item_ids"]
+    filters = store.get("item_filters")
+    query = content_rows(store, [row])[0]
+    if category is not None:
+        # Only the category's allowed rows are scored, never the whole catalog.
+        rows = category_rows(filters, category)
+        sims = content_rows(store, rows) @ query
+        top = rows[top_k_indices(sims, top_k + 1)]
+        return item_ids[top[top != row][:top_k]].tolist()
 
+    # Rows are L2-normalized, so one GEMV gives cosine similarity.
+    sims = matrix_scores(store["content_matrix"], query, store.get("content_matrix_scale"))
+    if filters is not None:
+        sims[filters["excluded_rows"]] = -np.inf
+    top = top_k_indices(sims, top_k + 1)
+    top = top[top != row]
+    if filters is not None:
+        top = top[np.isfinite(sims[top])]
+    return item_ids[top[:top_k]].tolist()
 
-def content_score(user_id: int):
+
+def content_rows(store, rows) -> np.ndarray:
     """
-    Fallback using item's textual embedding similarity based on user's history.
+    float32 content vectors of catalog `rows`, whatever the storage dtype.
+    """
+    scale = store.get("content_matrix_scale")
+    return dequantize_rows(store["content_matrix"][rows], None if scale is None else scale[rows])
+
+
+def user_profile(user_id: int, store=None):
+    """
+    Normalized mean content embedding of the user's history, or None without
+    history. Cached per model snapshot (LRU, settings.PROFILE_CACHE_SIZE).
     """
-    user_history = model_store["user_history"].get(user_id, [])
-    content_emb = model_store["content_embeddings"]
+    store = store or get_model_store()
+    cache = store["profile_cache"]
+    profile = cache.get(user_id)
+    if profile is MISSING:
+        profile = _compute_profile(user_id, store)
+        cache.put(user_id, profile)
+    return profile
+
+
+def _compute_profile(user_id: int, store):
+    rows = seen_rows(store["user_history"], user_id)
+    if len(rows) == 0:
+        return None
 
-    if not user_history:
-        return {}
+    profile = normalize_rows(content_rows(store, rows).mean(axis=0, keepdims=True))[0]
+    profile.flags.writeable = False
+    return profile
 
-    scores = {}
-    avg_emb = sum([content_emb[i] for i in user_history]) / len(user_history)
 
-    for item_id, emb in content_emb.items():
-        scores[item_id] = cosine_similarity(avg_emb, emb)
+@timed("content_score")
+def content_score(user_id: int, top_k: int = None, store=None, rows=None):
+    """
+    Fallback using item's textual embedding similarity based on user's history.
+    Candidate stage: one GEMV of the cached profile against the normalized
+    content matrix, returning the top_k (settings.CONTENT_TOP_K by default)
+    as (rows, scores) arrays of catalog rows. With `rows` only those are scored.
+    """
+    store = store or get_model_store()
+    profile = user_profile(user_id, store)
+
+    if profile is None:
+        return empty_candidates()
 
-    return scores
+    if rows is None:
+        scores = matrix_scores(store["content_matrix"], profile, store.get("content_matrix_scale"))
+        return top_k_candidates(scores, top_k or settings.CONTENT_TOP_K)
+    scores = content_rows(store, rows) @ profile
+    top, top_scores = top_k_candidates(scores, top_k or settings.CONTENT_TOP_K)
+    return rows[top], top_scores
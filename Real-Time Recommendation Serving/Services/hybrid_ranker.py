@@ -1,11 +1,35 @@
-def rank_scores(cf, cb, tr):
-    final = {}
+import numpy as np
+from core.metrics import timed
 
-    for item in set(list(cf.keys()) + list(cb.keys()) + list(tr.keys())):
-        final[item] = (
-            cf.get(item, 0) * 0.55 +
-            cb.get(item, 0) * 0.35 +
-            tr.get(item, 0) * 0.10
-        )
+CF_WEIGHT = 0.55
+CONTENT_WEIGHT = 0.35
+TRENDING_WEIGHT = 0.10
 
-    return final
+@timed("rank_scores")
+def rank_scores(cf, cb, tr, boost=None, exclude=None):
+    """
+    Blend the (rows, scores) candidate sets of the three sources over their
+    union. Each source lists a row at most once. Returns (rows, scores).
+    With `boost` (the catalog-aligned trending vector) every candidate gets
+    its trending score by a single gather, not only the rows listed in `tr`.
+    Rows in `exclude` (sorted, e.g. the user's seen items) are dropped.
+    """
+    sources = ((cf, CF_WEIGHT), (cb, CONTENT_WEIGHT), (tr, TRENDING_WEIGHT))
+    rows, inverse = np.unique(
+        np.concatenate([src[0] for src, _ in sources]), return_inverse=True
+    )
+    if boost is not None:
+        final = TRENDING_WEIGHT * boost[rows]
+        sources = sources[:2]
+    else:
+        final = np.zeros(len(rows), dtype=np.float32)
+
+    offset = 0
+    for (src_rows, src_scores), weight in sources:
+        final[inverse[offset:offset + len(src_rows)]] += weight * np.asarray(src_scores, dtype=np.float32)
+        offset += len(src_rows)
+
+    if exclude is not None and len(exclude):
+        keep = ~np.isin(rows, exclude, assume_unique=True)
+        rows, final = rows[keep], final[keep]
+    return rows, final
@@ -0,0 +1,135 @@
+"""
+Keeps the live snapshot's item filters (core.item_filters) in step with the
+item_attributes table (DDL: Real-Time-Data-Processing/Sql/item_filters.sql).
+
+A daemon thread per worker loads the whole table once, then every
+ITEM_FILTERS_REFRESH_SECONDS fetches only the rows whose updated_at moved,
+merges them into the attributes with array operations and publishes the
+result (core.model_loader.publish_filters). Nothing is published when
+nothing changed, so response caches survive quiet periods.
+"""
+import threading
+import time
+from types import MappingProxyType
+import numpy as np
+from core.config import settings
+from core.item_filters import empty_attributes
+from core.logging_config import get_logger
+from core.model_loader import publish_filters
+
+logger = get_logger(__name__)
+
+CHANGED_ROWS = """
+    SELECT item_id, category, in_stock, blocked, updated_at
+    FROM item_attributes
+    WHERE updated_at >= :watermark
+    ORDER BY updated_at
+"""
+
+
+def merge_attributes(current, item_ids, categories, in_stock, blocked, version: str) -> MappingProxyType:
+    """
+    New attributes with the given rows upserted into `current`. Later rows
+    win for repeated ids; category names are coded against current's list,
+    new names appended.
+    """
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    # Last occurrence of each id in the batch.
+    _, last = np.unique(item_ids[::-1], return_index=True)
+    take = len(item_ids) - 1 - last
+    item_ids = item_ids[take]
+    in_stock = np.asarray(in_stock, dtype=bool)[take]
+    blocked = np.asarray(blocked, dtype=bool)[take]
+    categories = [categories[i] for i in take.tolist()]
+
+    names = list(current["categories"])
+    codes_by_name = {name: code for code, name in enumerate(names)}
+    codes = np.empty(len(categories), dtype=np.int32)
+    for i, name in enumerate(categories):
+        if name is None:
+            codes[i] = -1
+            continue
+        if name not in codes_by_name:
+            codes_by_name[name] = len(names)
+            names.append(name)
+        codes[i] = codes_by_name[name]
+
+    old_ids = current["item_ids"]
+    stale = np.isin(old_ids, item_ids, assume_unique=True)
+    merged_ids = np.concatenate([old_ids[~stale], item_ids])
+    order = np.argsort(merged_ids, kind="stable")
+    return MappingProxyType({
+        "item_ids": merged_ids[order],
+        "category": np.concatenate([current["category"][~stale], codes])[order],
+        "in_stock": np.concatenate([current["in_stock"][~stale], in_stock])[order],
+        "blocked": np.concatenate([current["blocked"][~stale], blocked])[order],
+        "categories": tuple(names),
+        "version": version,
+    })
+
+
+def postgres_attribute_batches(poll_interval: float = None):
+    """
+    Changed item_attributes rows as (item_ids, categories, in_stock, blocked,
+    version) tuples, polled forever; the first batch is the whole table.
+    Rows at the watermark itself are read again (a row committed late with
+    the same updated_at is not missed); re-applying them is harmless.
+    """
+    # Imported here: workers without ITEM_FILTERS_ENABLED never open a DB pool.
+    from core.db import read_sql
+
+    poll_interval = poll_interval or settings.ITEM_FILTERS_REFRESH_SECONDS
+    watermark = None
+    applied_at_watermark = 0
+    while True:
+        rows = read_sql(CHANGED_ROWS, {"watermark": watermark or "-infinity"})
+        # Rows are ordered by updated_at: anything new is past the watermark
+        # or a late row at it (then more rows share the watermark than before).
+        at_watermark = sum(1 for r in rows if r[4] == watermark)
+        if rows and (rows[-1][4] != watermark or at_watermark != applied_at_watermark):
+            watermark = rows[-1][4]
+            applied_at_watermark = sum(1 for r in rows if r[4] == watermark)
+            yield (
+                [r[0] for r in rows], [r[1] for r in rows], [bool(r[2]) for r in rows],
+                [bool(r[3]) for r in rows], f"{watermark.isoformat()}#{applied_at_watermark}",
+            )
+        time.sleep(poll_interval)
+
+
+def run_filter_refresh(batches, attributes=None, publish=publish_filters):
+    """
+    Merge each batch into the attributes and publish them. Returns the
+    final attributes when the source ends.
+    """
+    attributes = attributes or empty_attributes()
+    for item_ids, categories, in_stock, blocked, version in batches:
+        start = time.perf_counter()
+        attributes = merge_attributes(attributes, item_ids, categories, in_stock, blocked, version)
+        publish(attributes)
+        logger.info(
+            "Item filters %s: %d changed rows merged and published in %.1f ms",
+            version, len(item_ids), (time.perf_counter() - start) * 1e3,
+        )
+    return attributes
+
+
+def _refresh_forever():
+    while True:
+        try:
+            run_filter_refresh(postgres_attribute_batches())
+        except Exception:
+            # Keep the last published filters; reload the table after a pause.
+            logger.exception("Item filter refresh failed, restarting")
+            time.sleep(settings.ITEM_FILTERS_REFRESH_SECONDS)
+
+
+def start_item_filter_refresh():
+    """
+    Start the per-worker daemon thread that keeps snapshot["item_filters"]
+    fresh. No-op unless settings.ITEM_FILTERS_ENABLED.
+    """
+    if not settings.ITEM_FILTERS_ENABLED:
+        return None
+    thread = threading.Thread(target=_refresh_forever, name="item-filter-refresh", daemon=True)
+    thread.start()
+    return thread
@@ -1,14 +1,150 @@
-from services.collaborative_filter import cf_score
-from services.content_based import content_score
+import numpy as np
+from core.cache import async_compute, read_through
+from core.config import settings
+from core.executor import run_compute
+from core.item_filters import allowed_mask, category_rows
+from core.metrics import stage_timer
+from core.model_loader import get_model_store, row_of, rows_of, seen_rows
+from services.collaborative_filter import cf_batcher, cf_score
+from services.content_based import content_score, user_profile
 from services.hybrid_ranker import rank_scores
-from services.trending_engine import trending_boost
+from services.trending_engine import cold_start_recommendations, trending_boost, trending_vector
+from utils.scoring_utils import empty_candidates, matrix_top_k, top_k_indices
 
-def get_recommendations(user_id: int, top_k: int = 10):
-    cf = cf_score(user_id)
-    cb = content_score(user_id)
-    tr = trending_boost()
+def is_cold_user(user_id: int, store=None) -> bool:
+    """
+    No CF vector and no content history: only trending can be offered.
+    """
+    store = store or get_model_store()
+    return row_of(store["user_ids"], user_id) < 0 and user_profile(user_id, store) is None
 
-    final_scores = rank_scores(cf, cb, tr)
-    ranked = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
 
-    return [item_id for item_id, score in ranked[:top_k]]
+def get_recommendations(user_id: int, top_k: int = 10, category: str = None, store=None):
+    # One snapshot for all sources so a concurrent reload cannot mix versions.
+    store = store or get_model_store()
+    if is_cold_user(user_id, store):
+        return cold_start_recommendations(top_k, category, store=store)
+    return personalized_recommendations(user_id, top_k, category, store=store)
+
+
+@read_through("recommend", ttl=settings.CACHE_TTL_RECOMMEND)
+def personalized_recommendations(user_id: int, top_k: int = 10, category: str = None, store=None):
+    store = store or get_model_store()
+    rows = None if category is None else category_rows(store.get("item_filters"), category)
+    return _rerank(user_id, top_k, cf_score(user_id, store=store, rows=rows), store, category)
+
+
+@async_compute(personalized_recommendations)
+async def personalized_recommendations_batched(user_id: int, top_k: int = 10, category: str = None,
+                                               store=None):
+    """
+    personalized_recommendations for the async path: the CF candidate stage
+    goes through the micro-batcher (one GEMM for every concurrent request),
+    the rest runs on the compute executor. Category requests score only the
+    category's rows and skip the batcher.
+    """
+    store = store or get_model_store()
+    if not settings.BATCHER_ENABLED or category is not None:
+        return await run_compute(personalized_recommendations.uncached, user_id, top_k, category, store)
+    cf = await cf_batcher.submit((user_id, None, store))
+    return await run_compute(_rerank, user_id, top_k, cf, store)
+
+
+def _rerank(user_id: int, top_k: int, cf, store, category: str = None, cb=None):
+    """
+    Blend the CF candidates `cf` with the content (`cb`, scored here unless
+    given) and trending candidates and return the top_k item ids.
+    """
+    filters = store.get("item_filters")
+    if cb is None:
+        restrict = None if category is None else category_rows(filters, category)
+        cb = content_score(user_id, store=store, rows=restrict)
+    tr = trending_boost(store=store)
+
+    # Re-rank stage: only the small candidate union, never the full catalog.
+    # Items the user already has are not recommended again.
+    rows, final_scores = rank_scores(
+        cf, cb, tr, boost=trending_vector(store), exclude=seen_rows(store["user_history"], user_id)
+    )
+    if filters is not None or category is not None:
+        keep = allowed_mask(filters, rows, category)
+        rows, final_scores = rows[keep], final_scores[keep]
+    with stage_timer("final_sort"):
+        top = top_k_indices(final_scores, top_k)
+        return store["item_ids"][rows[top]].tolist()
+
+
+def get_recommendations_batch(user_ids, top_k: int = 10, store=None, category: str = None):
+    """
+    Yields (user_id, [item_ids]) per user; see recommendation_blocks.
+    """
+    for block in recommendation_blocks(user_ids, top_k, store, category):
+        yield from block
+
+
+def recommendation_blocks(user_ids, top_k: int = 10, store=None, category: str = None):
+    """
+    Recommendations for many users, identical to personalized_recommendations
+    / cold_start_recommendations per user. Users are processed in blocks of
+    settings.BATCH_BLOCK_SIZE: both candidate stages are one blocked
+    (block x dim) @ (dim x items) multiply with a running top-k
+    (matrix_top_k) -- CF over the item matrix, content over the content
+    matrix with the users' profiles -- and only the small per-user blend
+    runs user by user, in the same _rerank as a single request. Yields a
+    [(user_id, [item_ids]), ...] list as each block finishes so the caller
+    can stream results.
+    """
+    store = store or get_model_store()
+    restrict = None if category is None else category_rows(store.get("item_filters"), category)
+    item_matrix, item_scale = _candidate_matrix(store, "item_matrix", restrict)
+    content_matrix, content_scale = _candidate_matrix(store, "content_matrix", restrict)
+    block_size = settings.BATCH_BLOCK_SIZE
+
+    for start in range(0, len(user_ids), block_size):
+        block = list(user_ids[start:start + block_size])
+        with stage_timer("batch_block"):
+            rows = rows_of(store["user_ids"], block)
+            known = np.flatnonzero(rows >= 0)
+            cf = _block_candidates(item_matrix, item_scale, store["user_matrix"][rows[known]],
+                                   known, settings.CF_TOP_K, restrict)
+
+            profiles = [user_profile(user_id, store) for user_id in block]
+            with_profile = np.array([i for i, p in enumerate(profiles) if p is not None], dtype=np.int64)
+            cb = _block_candidates(content_matrix, content_scale, [profiles[i] for i in with_profile.tolist()],
+                                   with_profile, settings.CONTENT_TOP_K, restrict)
+
+            results = []
+            for i, user_id in enumerate(block):
+                if i not in cf and i not in cb:
+                    # No CF vector and no history: the cold-start list.
+                    recs = cold_start_recommendations(top_k, category, store=store)
+                else:
+                    recs = _rerank(user_id, top_k, cf.get(i, empty_candidates()), store, category,
+                                   cb=cb.get(i, empty_candidates()))
+                results.append((user_id, recs))
+        # Outside the timer: the consumer's time between blocks is not scoring.
+        yield results
+
+
+def _candidate_matrix(store, name: str, restrict):
+    """
+    (matrix, scale) of store[name], only the `restrict` rows if given.
+    """
+    matrix, scale = store[name], store.get(f"{name}_scale")
+    if restrict is not None:
+        matrix = matrix[restrict]
+        scale = None if scale is None else scale[restrict]
+    return matrix, scale
+
+
+def _block_candidates(matrix, scale, vectors, positions, k: int, restrict) -> dict:
+    """
+    {position: (rows, scores)} of the top k catalog rows for each of the
+    (n, dim) `vectors`, keyed by the block positions they belong to.
+    """
+    if len(positions) == 0:
+        return {}
+    top, top_scores = matrix_top_k(matrix, np.asarray(vectors, dtype=np.float32).T, k, scale)
+    if restrict is not None:
+        top = restrict[top]
+    return dict(zip(positions.tolist(), zip(top, top_scores)))
@@ -0,0 +1,60 @@
+from core.batcher import MicroBatcher
+from core.config import settings
+from core.executor import run_compute
+from core.metrics import timed
+from core.model_loader import get_model_store
+from services.trending_engine import cold_start_recommendations
+
+@timed("session_model")
+def session_recommendations(item_ids, top_k: int = 10, store=None):
+    """
+    Next items for the current session's item sequence (oldest first), from
+    the exported session model. Sessions with no item the model knows get
+    the cold-start (trending) list. Raises LookupError if no session model
+    is loaded.
+    """
+    store = store or get_model_store()
+    model = _session_model(store)
+    return model.recommend(item_ids, top_k) or cold_start_recommendations(top_k, store=store)
+
+
+@timed("session_model_batch")
+def session_recommendations_batch(requests):
+    """
+    Batched session_recommendations for (item_ids, top_k, store) requests:
+    one forward pass per session model in the batch.
+    """
+    results = [None] * len(requests)
+    by_model = {}
+    for i, (_, _, store) in enumerate(requests):
+        by_model.setdefault(id(store["session_model"]), (store, []))[1].append(i)
+
+    for store, positions in by_model.values():
+        model = _session_model(store)
+        recs = model.recommend_batch(
+            [requests[i][0] for i in positions], [requests[i][1] for i in positions]
+        )
+        for i, r in zip(positions, recs):
+            results[i] = r or cold_start_recommendations(requests[i][1], store=store)
+    return results
+
+
+session_batcher = MicroBatcher(session_recommendations_batch)
+
+
+async def session_recommendations_async(item_ids, top_k: int = 10, store=None):
+    """
+    session_recommendations for the async path, micro-batched with other
+    concurrent sessions unless settings.BATCHER_ENABLED is off.
+    """
+    store = store or get_model_store()
+    if not settings.BATCHER_ENABLED:
+        return await run_compute(session_recommendations, item_ids, top_k, store)
+    return await session_batcher.submit((item_ids, top_k, store))
+
+
+def _session_model(store):
+    model = store["session_model"]
+    if model is None:
+        raise LookupError("No session model loaded")
+    return model
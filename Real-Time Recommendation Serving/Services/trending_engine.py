@@ -1,10 +1,46 @@
-from core.model_loader import model_store
+from core.cache import local_tier
+from core.config import settings
+from core.item_filters import allowed_mask
+from core.metrics import timed
+from core.model_loader import get_model_store
 
-def get_trending_items(top_k=10):
-    trending = model_store["trending_scores"]
-    ranked = sorted(trending.items(), key=lambda x: x[1], reverse=True)
-    return [i for i, s in ranked[:top_k]]
+def get_trending_items(top_k=10, store=None):
+    """
+    The top_k trending item ids: a slice of the index ranked at load time.
+    """
+    trending = (store or get_model_store())["trending"]
+    return trending["item_ids"][:top_k].tolist()
 
 
-def trending_boost():
-    return model_store["trending_scores"]
+@timed("trending_boost")
+def trending_boost(top_k: int = None, store=None):
+    """
+    Candidate stage: the top_k (settings.TRENDING_TOP_K by default) trending
+    items as (rows, scores) arrays of catalog rows.
+    """
+    trending = (store or get_model_store())["trending"]
+    top_k = top_k or settings.TRENDING_TOP_K
+    return trending["rows"][:top_k], trending["row_scores"][:top_k]
+
+
+def trending_vector(store=None):
+    """
+    Trending scores as a dense, read-only float32 vector aligned to the catalog rows.
+    """
+    return (store or get_model_store())["trending"]["vector"]
+
+
+@local_tier("cold_start", maxsize=settings.LOCAL_CACHE_SIZE_COLD_START, ttl=settings.LOCAL_CACHE_TTL_COLD_START)
+def cold_start_recommendations(top_k: int = 10, category: str = None, store=None):
+    """
+    Recommendations for users with neither a CF vector nor history: the
+    trending candidates, which is all the hybrid ranker would see for them.
+    Identical for every such user, so it is served from the worker's memory.
+    Candidates failing the item filters, or outside `category`, are dropped.
+    """
+    store = store or get_model_store()
+    rows, _ = trending_boost(store=store)
+    filters = store.get("item_filters")
+    if filters is not None or category is not None:
+        rows = rows[allowed_mask(filters, rows, category)]
+    return store["item_ids"][rows[:top_k]].tolist()
@@ -0,0 +1,361 @@
+"""
+Streaming, exponentially time-decayed trending scores in bounded memory.
+
+Each event adds weight * 2^(-(now - t) / half_life) to its item's score.
+Scores use forward decay: an event at time t is stored as
+weight * exp(lam * (t - landmark)), so stored values only grow, never need
+per-item decay, and rank exactly like the decayed scores (all share the
+factor exp(-lam * (now - landmark))). When the stored values get large the
+landmark moves forward and everything is rescaled once.
+
+Per-item scores live in a Count-Min sketch (depth x width counters,
+overestimates only), and the heaviest items in a min-heap of size heap_size.
+Memory is fixed by (width, depth, heap_size), not by catalog or traffic.
+
+One producer process (`python -m services.trending_stream`, started by the
+gunicorn master or run as a sidecar) polls events_clean and writes the top
+items to TRENDING_LIVE_FILE in MODEL_DIR every
+TRENDING_PUBLISH_INTERVAL_SECONDS. Every worker runs a daemon thread that
+swaps the file's scores into its live snapshot when the file changes
+(core.model_loader.publish_trending), so all workers serve the same list
+and the database sees one poller, not one per worker.
+"""
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from core.config import settings
+from core.logging_config import get_logger
+from core.model_loader import publish_trending
+
+logger = get_logger(__name__)
+
+# Weight of each event type in the trending score; other types are ignored.
+EVENT_WEIGHTS = {"view": 1.0}
+
+# Move the landmark once stored values reach exp(RESCALE_EXPONENT).
+RESCALE_EXPONENT = 30.0
+
+
+class CountMinSketch:
+    """
+    depth x width float64 counters with multiply-shift hashing of int64 keys.
+    Estimates are never below the true (decayed) total of a key.
+    """
+
+    def __init__(self, width: int, depth: int, seed: int = 0):
+        if width < 2 or width & (width - 1):
+            raise ValueError(f"Sketch width must be a power of two, got {width}")
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.float64)
+        rng = np.random.default_rng(seed)
+        # Odd multipliers for multiply-shift; uint64 arithmetic wraps mod 2^64.
+        self._a = rng.integers(1, 2**63, size=(depth, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=(depth, 1), dtype=np.uint64)
+        self._shift = np.uint64(64 - int(math.log2(width)))
+        self._depth_rows = np.arange(depth)[:, None]
+
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64).view(np.uint64)[None, :]
+        return ((self._a * keys + self._b) >> self._shift).astype(np.intp)
+
+    def add(self, keys: np.ndarray, values: np.ndarray):
+        columns = self._columns(keys)
+        rows = np.broadcast_to(self._depth_rows, columns.shape)
+        np.add.at(self.table, (rows, columns), np.broadcast_to(values, columns.shape))
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        return self.table[self._depth_rows, self._columns(keys)].min(axis=0)
+
+    def scale(self, factor: float):
+        self.table *= factor
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+
+class StreamingTrending:
+    """
+    Time-decayed heavy hitters: a Count-Min sketch for scores plus a
+    heap_size min-heap of the current top items.
+    """
+
+    def __init__(self, half_life_seconds: float = None, width: int = None, depth: int = None,
+                 heap_size: int = None, seed: int = 0):
+        half_life = half_life_seconds or settings.TRENDING_HALF_LIFE_SECONDS
+        self.decay = math.log(2) / half_life
+        self.sketch = CountMinSketch(
+            width or settings.TRENDING_SKETCH_WIDTH, depth or settings.TRENDING_SKETCH_DEPTH, seed
+        )
+        self.heap_size = heap_size or settings.TRENDING_HEAP_SIZE
+        self.landmark = None
+        self.now = None
+        self.events = 0
+        self._top = {}    # item_id -> stored (forward-decayed) estimate
+        self._heap = []   # (estimate, item_id); entries not matching _top are stale
+
+    def add(self, item_ids, timestamps, weights=None):
+        """
+        Ingest a batch of events. timestamps are epoch seconds and may arrive
+        out of order; weights default to 1.
+        """
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if len(item_ids) == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        weights = np.ones(len(item_ids)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+        latest = float(timestamps.max())
+        if self.landmark is None:
+            self.landmark = float(timestamps.min())
+        self.now = latest if self.now is None else max(self.now, latest)
+        if self.decay * (self.now - self.landmark) > RESCALE_EXPONENT:
+            self._move_landmark(self.now)
+
+        self.sketch.add(item_ids, weights * np.exp(self.decay * (timestamps - self.landmark)))
+        self.events += len(item_ids)
+
+        batch_items = np.unique(item_ids)
+        for item_id, estimate in zip(batch_items.tolist(), self.sketch.estimate(batch_items).tolist()):
+            self._offer(item_id, estimate)
+        if len(self._heap) > 4 * self.heap_size:
+            self._rebuild_heap()
+
+    def _offer(self, item_id: int, estimate: float):
+        if item_id in self._top or len(self._top) < self.heap_size:
+            self._top[item_id] = estimate
+            heapq.heappush(self._heap, (estimate, item_id))
+            return
+        self._drop_stale()
+        if estimate > self._heap[0][0]:
+            _, evicted = heapq.heappop(self._heap)
+            del self._top[evicted]
+            self._top[item_id] = estimate
+            heapq.heappush(self._heap, (estimate, item_id))
+
+    def _drop_stale(self):
+        while self._heap and self._top.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _rebuild_heap(self):
+        self._heap = [(estimate, item_id) for item_id, estimate in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def _move_landmark(self, landmark: float):
+        factor = math.exp(-self.decay * (landmark - self.landmark))
+        self.sketch.scale(factor)
+        self._top = {item_id: estimate * factor for item_id, estimate in self._top.items()}
+        self._rebuild_heap()
+        self.landmark = landmark
+
+    def top(self, n: int, now: float = None) -> dict:
+        """
+        {item_id: decayed score at `now`} for the n highest-scoring items,
+        best first. `now` defaults to the latest event time seen.
+        """
+        if self.landmark is None:
+            return {}
+        now = self.now if now is None else now
+        factor = math.exp(-self.decay * (now - self.landmark))
+        ranked = heapq.nlargest(n, self._top.items(), key=lambda kv: kv[1])
+        return {item_id: estimate * factor for item_id, estimate in ranked}
+
+
+def parse_events(events) -> tuple:
+    """
+    (item_ids, timestamps, weights) arrays from event dicts shaped like
+    events_clean rows: event_type, event_timestamp (epoch seconds or ISO
+    8601) and item_id either top-level or in metadata. Events without an
+    item or with an unweighted type are skipped.
+    """
+    item_ids, timestamps, weights = [], [], []
+    for event in events:
+        weight = EVENT_WEIGHTS.get(str(event.get("event_type", "")).lower())
+        metadata = event.get("metadata") or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        item_id = event.get("item_id", metadata.get("item_id"))
+        if weight is None or item_id in (None, ""):
+            continue
+        item_ids.append(int(item_id))
+        timestamps.append(_epoch_seconds(event["event_timestamp"]))
+        weights.append(weight)
+    return (
+        np.array(item_ids, dtype=np.int64),
+        np.array(timestamps, dtype=np.float64),
+        np.array(weights, dtype=np.float64),
+    )
+
+
+def _epoch_seconds(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def file_event_batches(path: str, batch_size: int = None):
+    """
+    Replay source: a JSON-lines file of events, yielded in batches.
+    """
+    batch_size = batch_size or settings.TRENDING_POLL_BATCH
+    batch = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield parse_events(batch)
+                batch = []
+    if batch:
+        yield parse_events(batch)
+
+
+def postgres_event_batches(batch_size: int = None, poll_interval: float = None, overlap: int = None):
+    """
+    Live source: events_clean rows past an id watermark, polled forever.
+    Starts with the events of the last few half-lives so scores are warm.
+    Yields an empty batch after each idle poll so the caller can publish.
+
+    Ids come from a sequence and are assigned before commit, so a row can
+    become visible after rows with higher ids. Each poll re-reads the last
+    `overlap` ids below the highest one seen and skips ids already counted;
+    a row committed late within that window is still picked up.
+    """
+    # Imported here: only the producer process opens a DB pool.
+    from core.db import read_sql
+
+    batch_size = batch_size or settings.TRENDING_POLL_BATCH
+    poll_interval = poll_interval or settings.TRENDING_PUBLISH_INTERVAL_SECONDS
+    # The re-read window must leave room for new rows in every batch.
+    overlap = min(settings.TRENDING_ID_OVERLAP if overlap is None else overlap, batch_size // 2)
+    warmup_seconds = 4 * settings.TRENDING_HALF_LIFE_SECONDS
+    floor = read_sql(
+        "SELECT COALESCE(MAX(id), 0) FROM events_clean "
+        "WHERE event_timestamp < NOW() - make_interval(secs => :warmup)",
+        {"warmup": warmup_seconds},
+    )[0][0]
+    seen = set()  # ids above floor already yielded
+
+    while True:
+        rows = read_sql(
+            "SELECT id, event_type, event_timestamp, metadata->>'item_id' AS item_id "
+            "FROM events_clean WHERE id > :floor ORDER BY id LIMIT :limit",
+            {"floor": floor, "limit": batch_size},
+        )
+        new_rows = [r for r in rows if r[0] not in seen]
+        if rows:
+            seen.update(r[0] for r in new_rows)
+            floor = max(floor, rows[-1][0] - overlap)
+            seen = {i for i in seen if i > floor}
+        yield parse_events(
+            {"event_type": r[1], "event_timestamp": r[2], "item_id": r[3]} for r in new_rows
+        )
+        if len(rows) < batch_size:
+            time.sleep(poll_interval)
+
+
+def run_trending_stream(batches, engine: StreamingTrending = None, publish=publish_trending,
+                        publish_interval: float = None, top_n: int = None, clock=time.monotonic):
+    """
+    Feed `batches` of (item_ids, timestamps, weights) into the engine and
+    publish engine.top(top_n) at most every publish_interval seconds, and
+    once more when the source ends. Returns the engine.
+    """
+    engine = engine or StreamingTrending()
+    publish_interval = settings.TRENDING_PUBLISH_INTERVAL_SECONDS if publish_interval is None else publish_interval
+    top_n = top_n or settings.TRENDING_TOP_N
+    last_publish = None
+    for item_ids, timestamps, weights in batches:
+        engine.add(item_ids, timestamps, weights)
+        if last_publish is None or clock() - last_publish >= publish_interval:
+            if engine.landmark is not None:
+                publish(engine.top(top_n))
+            last_publish = clock()
+    if engine.landmark is not None:
+        publish(engine.top(top_n))
+    return engine
+
+
+def live_trending_path() -> str:
+    return os.path.join(settings.MODEL_DIR, settings.TRENDING_LIVE_FILE)
+
+
+def write_live_trending(trending_scores: dict, path: str = None):
+    """
+    Publish `trending_scores` to the workers: write the file next to it and
+    rename it into place, so a worker never reads a half-written list.
+    """
+    path = path or live_trending_path()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({str(item_id): score for item_id, score in trending_scores.items()}, f)
+    os.replace(tmp, path)
+
+
+def _stream_forever():
+    while True:
+        try:
+            run_trending_stream(postgres_event_batches(), publish=write_live_trending)
+        except Exception:
+            # Workers keep the last written trending; retry the source after a pause.
+            logger.exception("Trending stream failed, restarting")
+            time.sleep(settings.TRENDING_PUBLISH_INTERVAL_SECONDS)
+
+
+def load_live_trending(path: str = None, last_stamp=None, publish=publish_trending):
+    """
+    Publish the live trending file if its mtime differs from `last_stamp`.
+    Returns the stamp seen (None while the file does not exist yet).
+    """
+    path = path or live_trending_path()
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if stamp != last_stamp:
+        with open(path) as f:
+            publish(json.load(f))
+    return stamp
+
+
+def _consume_forever(interval: float):
+    stamp = None
+    while True:
+        try:
+            stamp = load_live_trending(last_stamp=stamp)
+        except Exception:
+            # Keep the last published trending; the next poll retries.
+            logger.exception("Reading %s failed", live_trending_path())
+        time.sleep(interval)
+
+
+def start_trending_stream():
+    """
+    Start the per-worker daemon thread that keeps snapshot["trending"] in
+    step with the producer's live trending file. No-op unless
+    settings.TRENDING_STREAM_ENABLED.
+    """
+    if not settings.TRENDING_STREAM_ENABLED:
+        return None
+    thread = threading.Thread(
+        target=_consume_forever, args=(settings.TRENDING_PUBLISH_INTERVAL_SECONDS,),
+        name="trending-consumer", daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # The single producer: gunicorn's master starts it (Docker/gunicorn.conf.py)
+    # unless TRENDING_PRODUCER_IN_MASTER is off and a sidecar runs it instead.
+    _stream_forever()
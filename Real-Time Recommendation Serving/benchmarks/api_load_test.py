@@ -0,0 +1,303 @@
+"""
+End-to-end load test of the HTTP API on synthetic artifacts of any size.
+
+Writes model artifacts for --users x --items x --dim into a scratch
+MODEL_DIR (mmap layout, trending, FAISS index or neighbour table), starts
+the app with uvicorn on it, and runs --concurrency closed-loop clients for
+--duration seconds, each picking /recommend, /similar or /trending by the
+--mix weights. The report has throughput, error counts and p50/p95/p99 per
+endpoint and overall, plus the mean time per scoring stage from the
+server's /metrics.
+
+    python -m benchmarks.api_load_test --users 100000 --items 200000 --dim 64 \
+        --concurrency 32 --duration 30 --mix recommend=0.7,similar=0.2,trending=0.1
+    python -m benchmarks.api_load_test --baseline api_report.json    # exit 1 on regression
+    python -m benchmarks.api_load_test --url http://staging:8000      # existing server
+
+The clients run on one event loop in this process; at high request rates
+run them on another machine (--url) so they do not compete with the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+from core.artifact_store import HISTORY_SOURCES, NEIGHBOUR_SOURCES, history_arrays, quantized, write_artifacts
+from core.faiss_loader import build_index, save_index
+from utils.scoring_utils import normalize_rows
+
+ENDPOINTS = ("recommend", "similar", "trending")
+
+
+def generate_artifacts(model_dir: str, users: int, items: int, dim: int, history: int = 20,
+                       trending: int = 1000, similar_backend: str = "faiss", dtype: str = "float32",
+                       seed: int = 0) -> dict:
+    """
+    Random artifacts in the layout core.model_loader reads. Users are
+    1..users, items 1..items. Returns what was written.
+    """
+    from scripts.build_neighbours import compute_neighbours
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(model_dir, exist_ok=True)
+    item_ids = np.arange(1, items + 1, dtype=np.int64)
+    content = normalize_rows(rng.standard_normal((items, dim)).astype(np.float32))
+    write_artifacts(model_dir, quantized({
+        "user_ids": np.arange(1, users + 1, dtype=np.int64),
+        "user_matrix": rng.standard_normal((users, dim)).astype(np.float32),
+        "item_ids": item_ids,
+        "item_matrix": rng.standard_normal((items, dim)).astype(np.float32),
+        "content_matrix": content,
+    }, dtype), version="loadtest", normalized=("content_matrix",))
+
+    lengths = rng.integers(1, history + 1, users)
+    write_artifacts(model_dir, history_arrays(
+        np.repeat(np.arange(1, users + 1), lengths), rng.integers(1, items + 1, lengths.sum()), item_ids
+    ), built_from=HISTORY_SOURCES)
+    top = rng.choice(item_ids, size=min(trending, items), replace=False)
+    with open(os.path.join(model_dir, "trending.json"), "w") as f:
+        json.dump({str(i): float(s) for i, s in zip(top, np.sort(rng.random(len(top)))[::-1])}, f)
+    with open(os.path.join(model_dir, "version.txt"), "w") as f:
+        f.write("loadtest")
+
+    if similar_backend == "faiss":
+        save_index(build_index(content, item_ids), model_dir)
+    elif similar_backend == "neighbours":
+        rows, scores = compute_neighbours(content, top_n=50)
+        write_artifacts(model_dir, {"neighbour_rows": rows, "neighbour_scores": scores}, built_from=NEIGHBOUR_SOURCES)
+    return {"users": users, "items": items, "dim": dim, "dtype": dtype, "similar_backend": similar_backend}
+
+
+def start_server(model_dir: str, port: int, workers: int, similar_backend: str, cache: bool,
+                 app: str = "api.main:app", env: dict = None) -> subprocess.Popen:
+    server_env = dict(
+        os.environ,
+        MODEL_DIR=model_dir,
+        SIMILAR_BACKEND="faiss" if similar_backend == "faiss" else "exact",
+        CACHE_ENABLED=str(cache).lower(),
+        MODEL_WATCH_INTERVAL_SECONDS="0",
+        **(env or {}),
+    )
+    if workers > 1:
+        # One aggregated /metrics across the uvicorn workers.
+        metrics_dir = tempfile.mkdtemp(prefix="prometheus_")
+        server_env.setdefault("PROMETHEUS_MULTIPROC_DIR", metrics_dir)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=server_env,
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen = None, timeout: float = 300.0) -> float:
+    """
+    Poll /health/ until it answers; returns the seconds it took.
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(f"{url}/health/", timeout=1.0).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {url} not ready after {timeout:.0f}s")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r}, expected one of {ENDPOINTS}")
+        mix[name] = float(weight)
+    return mix
+
+
+def make_paths(mix: dict, users: int, items: int, top_k: int, seed: int = 1):
+    """
+    Endless (endpoint, path) generator following the mix weights.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(mix)
+    weights = np.array([mix[n] for n in names]) / sum(mix.values())
+    while True:
+        name = names[rng.choice(len(names), p=weights)]
+        if name == "recommend":
+            yield name, f"/recommend/{int(rng.integers(1, users + 1))}?top_k={top_k}"
+        elif name == "similar":
+            yield name, f"/similar/{int(rng.integers(1, items + 1))}?top_k={top_k}"
+        else:
+            yield name, f"/trending/?top_k={top_k}"
+
+
+async def _client(client: httpx.AsyncClient, paths, deadline: float, record_from: float, samples: list):
+    while time.perf_counter() < deadline:
+        name, path = next(paths)
+        start = time.perf_counter()
+        try:
+            status = (await client.get(path)).status_code
+        except httpx.HTTPError:
+            status = 0
+        end = time.perf_counter()
+        if start >= record_from:
+            samples.append((name, status, (end - start) * 1000))
+
+
+async def drive(url: str, paths, concurrency: int, duration: float, warmup: float) -> tuple:
+    """
+    (samples, measured seconds); samples are (endpoint, status, latency_ms),
+    status 0 for transport errors. Requests started during warmup are dropped.
+    """
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        start = time.perf_counter()
+        record_from = start + warmup
+        deadline = record_from + duration
+        await asyncio.gather(*(
+            _client(client, paths, deadline, record_from, samples) for _ in range(concurrency)
+        ))
+    return samples, time.perf_counter() - record_from
+
+
+def summarize(samples: list, seconds: float) -> dict:
+    latencies = np.array([s[2] for s in samples]) if samples else np.zeros(1)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not 200 <= s[1] < 300),
+        "statuses": statuses,
+        "requests_per_second": len(samples) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def stage_means(url: str) -> dict:
+    """
+    Mean milliseconds per scoring stage from the server's reco_stage_seconds.
+    """
+    try:
+        text = httpx.get(f"{url}/metrics", timeout=10.0).text
+    except httpx.HTTPError:
+        return {}
+    sums, counts = {}, {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "reco_stage_seconds":
+            continue
+        for sample in family.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_sum"):
+                sums[stage] = sums.get(stage, 0.0) + sample.value
+            elif sample.name.endswith("_count"):
+                counts[stage] = counts.get(stage, 0.0) + sample.value
+    return {
+        stage: {"calls": int(counts[stage]), "mean_ms": 1000 * sums[stage] / counts[stage]}
+        for stage in sorted(counts) if counts[stage]
+    }
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Endpoints whose p99 grew, or throughput fell, by more than `tolerance`
+    (a fraction) against the baseline report.
+    """
+    found = []
+    for name, current in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        if current["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            found.append(f"{name}: p99 {before['p99_ms']:.2f}ms -> {current['p99_ms']:.2f}ms")
+        if current["requests_per_second"] < before["requests_per_second"] * (1 - tolerance):
+            found.append(
+                f"{name}: throughput {before['requests_per_second']:.0f}/s -> "
+                f"{current['requests_per_second']:.0f}/s"
+            )
+    return found
+
+
+def run(args) -> dict:
+    report = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}}
+    process = None
+    url = args.url
+    try:
+        if url is None:
+            model_dir = args.model_dir or tempfile.mkdtemp(prefix="loadtest_models_")
+            start = time.perf_counter()
+            report["artifacts"] = generate_artifacts(
+                model_dir, args.users, args.items, args.dim, args.history, args.trending,
+                args.similar_backend, args.dtype, args.seed,
+            )
+            report["artifacts"]["generate_seconds"] = time.perf_counter() - start
+            url = f"http://127.0.0.1:{args.port}"
+            process = start_server(model_dir, args.port, args.workers, args.similar_backend, args.cache)
+            report["startup_seconds"] = wait_ready(url, process)
+
+        paths = make_paths(args.mix, args.users, args.items, args.top_k, args.seed + 1)
+        samples, seconds = asyncio.run(drive(url, paths, args.concurrency, args.duration, args.warmup))
+        report["endpoints"] = {
+            name: summarize([s for s in samples if s[0] == name], seconds)
+            for name in args.mix
+        }
+        report["overall"] = summarize(samples, seconds)
+        report["stages"] = stage_means(url)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test on synthetic artifacts")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--history", type=int, default=20, help="Max history items per user")
+    parser.add_argument("--trending", type=int, default=1000, help="Items in trending.json")
+    parser.add_argument("--dtype", default="float32", help="Item/content matrix storage")
+    parser.add_argument("--similar-backend", choices=["faiss", "neighbours", "exact"], default="faiss")
+    parser.add_argument("--model-dir", help="Where to write artifacts (default: a temp dir)")
+    parser.add_argument("--url", help="Load-test this running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache", action="store_true", help="Keep the Redis response cache on")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("recommend=0.7,similar=0.2,trending=0.1"))
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed p99 growth / throughput drop vs the baseline")
+    parser.add_argument("--output", default="api_report.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, stats in report["endpoints"].items():
+        print(json.dumps({"endpoint": name, **stats}))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,126 @@
+"""
+Throughput vs added latency of micro-batched scoring (core/batcher.py).
+
+Runs `--concurrency` async clients, each issuing requests back to back, on
+one event loop against the compute executor, as one uvicorn worker would:
+"direct" sends every request to the executor on its own, "batched" goes
+through a MicroBatcher for each --max-wait-us. CF scoring runs on a synthetic
+catalog; --session also benchmarks the session model in MODEL_DIR.
+
+    python -m benchmarks.batching_benchmark --items 100000 --dim 64 --concurrency 1,16,64
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from core.batcher import MicroBatcher
+from core.config import settings
+from core.executor import run_compute
+
+
+def synthetic_store(users: int, items: int, dim: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "user_ids": np.arange(users, dtype=np.int64),
+        "user_matrix": rng.standard_normal((users, dim)).astype(np.float32),
+        "item_ids": np.arange(items, dtype=np.int64),
+        "item_matrix": rng.standard_normal((items, dim)).astype(np.float32),
+    }
+
+
+async def _client(call, make_request, requests: int, latencies: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call(make_request())
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def _run(call, make_request, concurrency: int, requests: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(call, make_request, requests, latencies) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def compare(single_fn, batch_fn, make_request, concurrency: list, max_wait_us: list,
+            requests: int, max_batch: int) -> list:
+    rows = []
+    for c in concurrency:
+        direct = asyncio.run(_run(lambda r: run_compute(single_fn, *r), make_request, c, requests))
+        rows.append({"concurrency": c, "mode": "direct", **direct})
+        print(json.dumps(rows[-1]))
+        for wait in max_wait_us:
+            batcher = MicroBatcher(batch_fn, max_batch=max_batch, max_wait_us=wait)
+            batched = asyncio.run(_run(batcher.submit, make_request, c, requests))
+            rows.append({
+                "concurrency": c, "mode": "batched", "max_wait_us": wait,
+                "mean_batch_size": batcher.stats()["mean_batch_size"],
+                **batched,
+                "added_p50_ms": batched["p50_ms"] - direct["p50_ms"],
+                "speedup": batched["requests_per_second"] / direct["requests_per_second"],
+            })
+            print(json.dumps(rows[-1]))
+    return rows
+
+
+def cf_benchmark(args) -> list:
+    from services.collaborative_filter import cf_score, cf_score_batch
+    store = synthetic_store(args.users, args.items, args.dim)
+    rng = np.random.default_rng(1)
+    make_request = lambda: (int(rng.integers(0, args.users)), None, store)
+    return compare(cf_score, cf_score_batch, make_request, args.concurrency,
+                   args.max_wait_us, args.requests, args.max_batch)
+
+
+def session_benchmark(args) -> list:
+    from core.model_loader import get_model_store, load_models
+    from services.session_recommender import session_recommendations, session_recommendations_batch
+    load_models()
+    store = get_model_store()
+    model = store["session_model"]
+    if model is None:
+        raise SystemExit(f"No session model in {settings.MODEL_DIR}")
+    rng = np.random.default_rng(1)
+    vocab = model.vocab[1:]
+    make_request = lambda: (
+        rng.choice(vocab, int(rng.integers(1, model.max_len + 1))).tolist(), 10, store
+    )
+    return compare(session_recommendations, session_recommendations_batch, make_request,
+                   args.concurrency, args.max_wait_us, args.requests, args.max_batch)
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching throughput vs latency")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32, 64])
+    parser.add_argument("--max-wait-us", type=_ints, default=[500, 2000, 5000])
+    parser.add_argument("--max-batch", type=int, default=settings.BATCHER_MAX_BATCH)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client")
+    parser.add_argument("--session", action="store_true", help="Also benchmark the MODEL_DIR session model")
+    parser.add_argument("--output", default="batching_report.json")
+    args = parser.parse_args()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "compute_workers": settings.COMPUTE_WORKERS,
+        "cf": cf_benchmark(args),
+    }
+    if args.session:
+        report["session"] = session_benchmark(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.output}")
@@ -0,0 +1,338 @@
+"""
+On-disk model artifact layout shared by the writers (models/, scripts/)
+and the API loader.
+
+Every array is a plain .npy file (no pickle) listed in manifest.json, so
+workers can np.load(..., mmap_mode="r") them and share a single page-cache
+copy instead of each holding a private heap copy.
+
+    MODEL_DIR/
+        manifest.json
+        user_ids.npy        int64, sorted
+        user_matrix.npy     float32 (n_users, dim)
+        item_ids.npy        int64, sorted; the catalog row order
+        item_matrix.npy     float32 (n_items, dim)
+        content_matrix.npy  float32 (n_items, content_dim), rows L2-normalized
+
+    item_matrix / content_matrix may instead be stored as float16, or as int8
+    with a float32 per-row <name>_scale.npy (see quantize_rows); readers go
+    through utils.scoring_utils.matrix_scores / dequantize_rows.
+
+    Every manifest entry records a digest of its array. Arrays derived from
+    others (neighbour table: content_matrix; histories: item_ids) also
+    record the digests of those sources as "built_from", so a reader can
+    tell a table built for the current arrays from a stale one of the same
+    length (is_current).
+
+    optional (scripts/build_neighbours.py):
+        neighbour_rows.npy    int32 (n_items, N) catalog rows of each item's top-N
+        neighbour_scores.npy  float16 (n_items, N) cosine scores, best first
+
+    optional (scripts/build_user_history.py), user histories in CSR form:
+        history_user_ids.npy  int64, sorted; users with a history
+        history_offsets.npy   int32 (n + 1,); user i's items are rows[offsets[i]:offsets[i + 1]]
+        history_rows.npy      int32 catalog rows, sorted and unique per user
+"""
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from utils.scoring_utils import dequantize_rows, normalize_rows, quantize_rows
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+EMBEDDING_ARRAYS = ("user_ids", "user_matrix", "item_ids", "item_matrix", "content_matrix")
+NEIGHBOUR_ARRAYS = ("neighbour_rows", "neighbour_scores")
+QUANTIZABLE_ARRAYS = ("item_matrix", "content_matrix")
+HISTORY_ARRAYS = ("history_user_ids", "history_offsets", "history_rows")
+# Source arrays of the derived ones, checked on load (is_current)
+NEIGHBOUR_SOURCES = {name: ("content_matrix",) for name in NEIGHBOUR_ARRAYS}
+HISTORY_SOURCES = {"history_rows": ("item_ids",)}
+
+
+def to_matrix(embeddings: dict, ids: np.ndarray = None):
+    """
+    Pack a {id: vector} dict into a sorted int64 id array and a contiguous
+    float32 matrix whose row i holds the vector of ids[i].
+    When `ids` is given the rows follow it and missing ids get zero vectors.
+    """
+    if ids is None:
+        ids = np.array(sorted(int(k) for k in embeddings), dtype=np.int64)
+    dim = len(next(iter(embeddings.values()))) if embeddings else 0
+    matrix = np.zeros((len(ids), dim), dtype=np.float32)
+    for row, key in enumerate(ids.tolist()):
+        emb = embeddings.get(key)
+        if emb is not None:
+            matrix[row] = emb
+    return ids, matrix
+
+
+def history_arrays(user_ids, item_ids, catalog: np.ndarray) -> dict:
+    """
+    CSR history arrays (HISTORY_ARRAYS) from parallel (user_id, item_id)
+    interaction arrays. Items outside `catalog` are dropped, repeats are
+    kept once. Offsets are int32 unless there are more than 2**31 entries.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    if len(catalog):
+        pos = np.minimum(np.searchsorted(catalog, item_ids), len(catalog) - 1)
+        known = catalog[pos] == item_ids
+    else:
+        pos, known = item_ids, np.zeros(len(item_ids), dtype=bool)
+    users, rows = user_ids[known], pos[known]
+
+    order = np.lexsort((rows, users))
+    users, rows = users[order], rows[order]
+    first = np.ones(len(users), dtype=bool)
+    first[1:] = (users[1:] != users[:-1]) | (rows[1:] != rows[:-1])
+    users, rows = users[first], rows[first]
+
+    history_users, counts = np.unique(users, return_counts=True)
+    offset_dtype = np.int32 if len(rows) <= np.iinfo(np.int32).max else np.int64
+    offsets = np.zeros(len(history_users) + 1, dtype=offset_dtype)
+    np.cumsum(counts, out=offsets[1:])
+    return {
+        "history_user_ids": history_users,
+        "history_offsets": offsets,
+        "history_rows": rows.astype(np.int32),
+    }
+
+
+def history_from_dict(histories: dict, catalog: np.ndarray) -> dict:
+    """
+    history_arrays of a {user_id: [item_id, ...]} dict (keys may be strings,
+    as in the legacy metadata.json).
+    """
+    lengths = [len(items) for items in histories.values()]
+    users = np.repeat(np.array([int(k) for k in histories], dtype=np.int64), lengths)
+    items = np.fromiter(
+        (int(item) for items in histories.values() for item in items), dtype=np.int64, count=sum(lengths)
+    )
+    return history_arrays(users, items, catalog)
+
+
+def has_manifest(model_dir: str) -> bool:
+    return os.path.exists(os.path.join(model_dir, MANIFEST_FILE))
+
+
+def read_manifest(model_dir: str) -> dict:
+    with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def array_digest(array: np.ndarray) -> str:
+    """
+    Content digest of an array (dtype, shape and bytes).
+    """
+    array = np.ascontiguousarray(array)
+    h = hashlib.blake2b(f"{array.dtype}{array.shape}".encode(), digest_size=16)
+    h.update(memoryview(array).cast("B"))
+    return h.hexdigest()
+
+
+def _digest(model_dir: str, manifest: dict, name: str) -> str:
+    # Entries written before digests were recorded get theirs now.
+    entry = manifest["arrays"][name]
+    if "digest" not in entry:
+        entry["digest"] = array_digest(np.load(os.path.join(model_dir, entry["file"]), mmap_mode="r"))
+    return entry["digest"]
+
+
+def write_artifacts(model_dir: str, arrays: dict, version: str = None, normalized=(), built_from=None):
+    """
+    Save each array as <name>.npy and (re)write the manifest last, so a
+    reader never sees a manifest pointing at half-written files.
+    Arrays already listed in an existing manifest are kept. Names in
+    `normalized` are recorded as having L2-normalized rows. `built_from`
+    ({name: source names}, e.g. NEIGHBOUR_SOURCES) records the digests of
+    the sources, as written in this call or already in the manifest, that
+    derived arrays were computed from.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    manifest = read_manifest(model_dir) if has_manifest(model_dir) else {"arrays": {}}
+
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        filename = f"{name}.npy"
+        tmp_path = os.path.join(model_dir, f".{filename}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp_path, os.path.join(model_dir, filename))
+        manifest["arrays"][name] = {
+            "file": filename,
+            "dtype": str(array.dtype),
+            "shape": list(array.shape),
+            "normalized": name in normalized,
+            "digest": array_digest(array),
+        }
+    for name, sources in (built_from or {}).items():
+        if name in arrays:
+            manifest["arrays"][name]["built_from"] = {
+                source: _digest(model_dir, manifest, source) for source in sources
+            }
+
+    manifest["format"] = FORMAT_VERSION
+    manifest["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    if version is not None:
+        manifest["version"] = version
+    return _write_manifest(model_dir, manifest)
+
+
+def remove_artifacts(model_dir: str, names):
+    """
+    Drop arrays from the manifest (e.g. a neighbour table that no longer
+    matches the content matrix). Files are left for mapped readers.
+    """
+    manifest = read_manifest(model_dir)
+    for name in names:
+        manifest["arrays"].pop(name, None)
+    return _write_manifest(model_dir, manifest)
+
+
+def is_current(manifest: dict, name: str, sources) -> bool:
+    """
+    Whether derived array `name` was computed from the current `sources`.
+    An entry without "built_from" (written before digests were recorded)
+    counts as current only while none of its sources has been rewritten
+    since, i.e. none has a digest either.
+    """
+    entries = manifest["arrays"]
+    built_from = entries.get(name, {}).get("built_from")
+    if built_from is None:
+        return all("digest" not in entries.get(source, {}) for source in sources)
+    return all(source in entries and entries[source].get("digest") == built_from.get(source) for source in sources)
+
+
+def restamp_artifacts(model_dir: str, built_from: dict):
+    """
+    Record derived arrays as built from the current sources, for rewrites
+    that keep their meaning (e.g. the same content matrix re-quantized).
+    """
+    manifest = read_manifest(model_dir)
+    for name, sources in built_from.items():
+        if name in manifest["arrays"]:
+            manifest["arrays"][name]["built_from"] = {
+                source: _digest(model_dir, manifest, source) for source in sources
+            }
+    return _write_manifest(model_dir, manifest)
+
+
+def _write_manifest(model_dir: str, manifest: dict) -> dict:
+    tmp_path = os.path.join(model_dir, f".{MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(model_dir, MANIFEST_FILE))
+    return manifest
+
+
+def quantized(arrays: dict, dtype: str = "float32") -> dict:
+    """
+    Copy of `arrays` with item/content matrices stored as `dtype`, plus a
+    <name>_scale array for int8.
+    """
+    arrays = dict(arrays)
+    for name in QUANTIZABLE_ARRAYS:
+        if name in arrays:
+            arrays[name], scale = quantize_rows(arrays[name], dtype)
+            if scale is not None:
+                arrays[f"{name}_scale"] = scale
+    return arrays
+
+
+def dequantized(arrays: dict, name: str) -> np.ndarray:
+    """
+    Full float32 copy of a stored matrix, whatever its storage dtype.
+    """
+    return dequantize_rows(arrays[name], arrays.get(f"{name}_scale") if arrays[name].dtype == np.int8 else None)
+
+
+def write_embedding_artifacts(model_dir: str,
+                              user_embeddings: dict,
+                              item_embeddings: dict,
+                              content_embeddings: dict,
+                              version: str = None,
+                              dtype: str = "float32"):
+    """
+    Write {id: vector} embedding dicts in the mmap layout. Item and content
+    matrices are aligned to one catalog (the union of their ids); content
+    rows are stored L2-normalized so cosine is a plain dot product. `dtype`
+    ("float32", "float16" or "int8") is the storage of both matrices.
+    """
+    catalog = np.array(
+        sorted({int(k) for k in item_embeddings} | {int(k) for k in content_embeddings}),
+        dtype=np.int64,
+    )
+    user_ids, user_matrix = to_matrix(user_embeddings)
+    _, item_matrix = to_matrix(item_embeddings, catalog)
+    _, content_matrix = to_matrix(content_embeddings, catalog)
+    return write_artifacts(model_dir, quantized({
+        "user_ids": user_ids,
+        "user_matrix": user_matrix,
+        "item_ids": catalog,
+        "item_matrix": item_matrix,
+        "content_matrix": normalize_rows(content_matrix),
+    }, dtype), version=version, normalized=("content_matrix",))
+
+
+def read_artifacts(model_dir: str, mmap: bool = True) -> dict:
+    """
+    Load every array listed in the manifest. With mmap=True arrays are
+    read-only memory maps backed by the page cache.
+    """
+    manifest = read_manifest(model_dir)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')} in {model_dir}")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        path = os.path.join(model_dir, entry["file"])
+        array = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            raise ValueError(f"Artifact {path} does not match manifest entry {entry}")
+        arrays[name] = array
+
+    for name in ("user_ids", "item_ids"):
+        ids = arrays.get(name)
+        if ids is not None and len(ids) > 1 and not np.all(ids[1:] > ids[:-1]):
+            raise ValueError(f"{name} must be sorted and unique")
+    return arrays
+
+
+def is_normalized(model_dir: str, name: str) -> bool:
+    entry = read_manifest(model_dir)["arrays"].get(name, {})
+    return bool(entry.get("normalized"))
+
+
+def memory_report(arrays: dict) -> dict:
+    """
+    Resident-memory breakdown of this process next to the bytes served from
+    memory maps. Mapped bytes live in the shared page cache, so each extra
+    worker saves that much private heap. smaps fields are Linux-only and
+    reported as None elsewhere.
+    """
+    mapped = sum(a.nbytes for a in arrays.values() if isinstance(a, np.memmap))
+    heap = sum(a.nbytes for a in arrays.values() if not isinstance(a, np.memmap))
+    report = {
+        "mapped_bytes": int(mapped),
+        "heap_bytes": int(heap),
+        "rss_bytes": None,
+        "pss_bytes": None,
+        "shared_bytes": None,
+        "private_bytes": None,
+    }
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return report
+
+    def kb(*names):
+        return sum(int(fields[n].split()[0]) * 1024 for n in names if n in fields)
+
+    report["rss_bytes"] = kb("Rss")
+    report["pss_bytes"] = kb("Pss")
+    report["shared_bytes"] = kb("Shared_Clean", "Shared_Dirty")
+    report["private_bytes"] = kb("Private_Clean", "Private_Dirty")
+    return report
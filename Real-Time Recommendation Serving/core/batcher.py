@@ -0,0 +1,89 @@
+"""
+Adaptive micro-batching for model scoring on the async request path.
+
+Concurrent requests submit single inputs; a MicroBatcher hands them to one
+batch function call (a GEMM instead of many GEMVs, one forward pass instead
+of many) on the compute executor and resolves each caller's future with its
+own result.
+
+Dispatch is adaptive: while fewer than max_concurrent batches are running,
+whatever was submitted in the current event-loop iteration is dispatched on
+the next one, so an idle server adds no measurable latency. Once that many
+are busy, submissions queue up and go out together when a batch finishes,
+when max_batch are waiting, or after max_wait_us, whichever comes first.
+The batch size therefore follows the load.
+"""
+import asyncio
+from core.config import settings
+from core.executor import run_compute
+
+
+class MicroBatcher:
+    """
+    batch_fn(list of inputs) -> list of results, same order and length.
+    Must be used from one event loop (one per worker).
+    """
+
+    def __init__(self, batch_fn, max_batch: int = None, max_wait_us: int = None,
+                 max_concurrent: int = None):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch or settings.BATCHER_MAX_BATCH
+        self.max_wait_us = settings.BATCHER_MAX_WAIT_US if max_wait_us is None else max_wait_us
+        self.max_concurrent = max_concurrent or settings.BATCHER_MAX_CONCURRENT
+        self._pending = []
+        self._running = 0
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            if self._running < self.max_concurrent:
+                # Next loop iteration: requests that are ready right now join this batch.
+                self._timer = loop.call_soon(self._dispatch)
+            else:
+                self._timer = loop.call_later(self.max_wait_us / 1e6, self._dispatch)
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        self._running += 1
+        self.batches += 1
+        self.items += len(batch)
+        asyncio.ensure_future(self._run(batch))
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_us / 1e6, self._dispatch)
+
+    async def _run(self, batch):
+        try:
+            results = await run_compute(self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            # Includes ComputeQueueFull: every caller in the batch sees it.
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running -= 1
+            if self._pending:
+                self._dispatch()
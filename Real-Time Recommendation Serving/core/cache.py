@@ -0,0 +1,265 @@
+"""
+Response caches for the serving endpoints, checked in this order:
+
+1. local_tier: a bounded per-worker LRU/TTL dict (hottest keys, no I/O).
+2. read_through: Redis, shared by all workers.
+
+Both are namespaced by the live model snapshot, so swapping in a new model
+(/reload-model or the artifact watcher) invalidates every entry without a
+flush: the local tier clears itself, old Redis keys simply expire.
+
+    reco:<snapshot cache namespace>:<endpoint>:<arg>=<value>:...
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import defaultdict
+import redis
+from core.config import settings
+from core.executor import run_compute
+from core.local_cache import LRUCache, MISSING
+from core.logging_config import get_logger
+from core.metrics import count_cache_event
+from core.model_loader import get_model_store
+from core.redis_client import get_async_redis_client, get_redis_client
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "reco"
+
+_stats = defaultdict(lambda: {"local_hits": 0, "hits": 0, "misses": 0, "errors": 0})
+_stats_lock = threading.Lock()
+_redis_down_until = 0.0
+# _stats field -> result label of reco_cache_events_total
+_METRIC_RESULTS = {"local_hits": "local_hit", "hits": "hit", "misses": "miss", "errors": "error"}
+
+
+def _count(endpoint: str, field: str):
+    with _stats_lock:
+        _stats[endpoint][field] += 1
+    count_cache_event(endpoint, _METRIC_RESULTS[field])
+
+
+def cache_stats() -> dict:
+    """
+    Per-endpoint counters of this worker: local-tier hits, Redis hits,
+    misses (computed), Redis errors, and the overall hit ratio.
+    """
+    with _stats_lock:
+        stats = {endpoint: dict(counts) for endpoint, counts in _stats.items()}
+    for counts in stats.values():
+        hits = counts["local_hits"] + counts["hits"]
+        lookups = hits + counts["misses"]
+        counts["hit_ratio"] = hits / lookups if lookups else 0.0
+    return stats
+
+
+def cache_key(endpoint: str, namespace: str, arguments: dict) -> str:
+    parts = [f"{name}={value}" for name, value in arguments.items()]
+    return ":".join([KEY_PREFIX, namespace, endpoint, *parts])
+
+
+def _redis_available() -> bool:
+    return time.monotonic() >= _redis_down_until
+
+
+def _redis_failed(endpoint: str, error: Exception):
+    # Back off for a while instead of paying the socket timeout on every request.
+    global _redis_down_until
+    _count(endpoint, "errors")
+    _redis_down_until = time.monotonic() + settings.CACHE_RETRY_SECONDS
+    logger.warning("Redis cache unavailable (%s), bypassing for %ss", error, settings.CACHE_RETRY_SECONDS)
+
+
+def _bind(signature, args, kwargs):
+    """
+    Normalize a call into (key arguments, snapshot, args, kwargs). `store` is
+    resolved once and, if the function takes it, passed through so the value
+    is computed from the same snapshot the key was namespaced with.
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    store = arguments.pop("store", None) or get_model_store()
+    if "store" in signature.parameters:
+        bound.arguments["store"] = store
+        args, kwargs = bound.args, bound.kwargs
+    return arguments, store, args, kwargs
+
+
+class _LocalTier:
+    """
+    One local_tier's LRU/TTL store, cleared whenever the namespace changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = LRUCache(maxsize, ttl)
+        self.namespace = None
+
+    def get(self, namespace: str, arguments: dict):
+        if self.namespace != namespace:
+            self.cache.clear()
+            self.namespace = namespace
+        return self.cache.get((namespace, *arguments.items()))
+
+    def put(self, namespace: str, arguments: dict, value):
+        self.cache.put((namespace, *arguments.items()), value)
+
+
+def local_tier(endpoint: str, maxsize: int, ttl: float):
+    """
+    Per-worker LRU/TTL cache in front of read_through. Entries are dropped on
+    expiry, on LRU eviction past `maxsize`, and all at once when the live
+    snapshot's cache namespace changes.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        tier = _LocalTier(maxsize, ttl)
+        inner_spec = getattr(fn, "cache_spec", None)
+        spec = dict(inner_spec or {"endpoint": endpoint, "signature": signature, "compute": fn, "ttl": None})
+        spec["local"] = tier
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.CACHE_ENABLED:
+                return fn(*args, **kwargs)
+
+            arguments, store, args, kwargs = _bind(signature, args, kwargs)
+            namespace = store["cache_namespace"]
+            value = tier.get(namespace, arguments)
+            if value is not MISSING:
+                _count(endpoint, "local_hits")
+                return value
+
+            if inner_spec is None:
+                _count(endpoint, "misses")
+            value = fn(*args, **kwargs)
+            tier.put(namespace, arguments, value)
+            return value
+
+        wrapper.uncached = spec["compute"]
+        wrapper.local_cache = tier.cache
+        wrapper.cache_spec = spec
+        return wrapper
+
+    return decorator
+
+
+def read_through(endpoint: str, ttl: int):
+    """
+    Cache a service function's JSON-serializable result in Redis for `ttl`
+    seconds. The `store` argument, if the function takes one, selects the
+    snapshot (and so the key namespace) but is not part of the key.
+    The undecorated function stays reachable as `.uncached`.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.CACHE_ENABLED or not _redis_available():
+                return fn(*args, **kwargs)
+
+            arguments, store, args, kwargs = _bind(signature, args, kwargs)
+            key = cache_key(endpoint, store["cache_namespace"], arguments)
+
+            client = get_redis_client()
+            try:
+                cached = client.get(key)
+            except redis.RedisError as e:
+                _redis_failed(endpoint, e)
+                return fn(*args, **kwargs)
+
+            if cached is not None:
+                _count(endpoint, "hits")
+                return json.loads(cached)
+
+            _count(endpoint, "misses")
+            value = fn(*args, **kwargs)
+            try:
+                client.set(key, json.dumps(value), ex=ttl)
+            except redis.RedisError as e:
+                _redis_failed(endpoint, e)
+            return value
+
+        wrapper.uncached = fn
+        wrapper.cache_spec = {
+            "endpoint": endpoint, "signature": signature, "compute": fn, "ttl": ttl, "local": None,
+        }
+        return wrapper
+
+    return decorator
+
+
+def async_compute(fn):
+    """
+    Register the decorated coroutine function as what cached_call awaits on
+    a miss of `fn`, instead of running fn on the compute executor (e.g. to
+    route part of the work through a MicroBatcher). It must return what fn
+    would for the same arguments, since both fill the same cache entries.
+    """
+    def decorator(afn):
+        fn.cache_spec["async_compute"] = afn
+        return afn
+
+    return decorator
+
+
+async def cached_call(fn, *args, **kwargs):
+    """
+    Async path through the same tiers as calling a local_tier/read_through
+    decorated service function: local tier on the event loop, Redis through
+    the asyncio client, and on a miss the undecorated function on the
+    bounded compute executor (may raise ComputeQueueFull), or the coroutine
+    registered with async_compute.
+    """
+    spec = fn.cache_spec
+    endpoint = spec["endpoint"]
+    arguments, store, args, kwargs = _bind(spec["signature"], args, kwargs)
+    if not settings.CACHE_ENABLED:
+        return await _compute(spec, args, kwargs)
+
+    namespace = store["cache_namespace"]
+    local = spec["local"]
+    if local is not None:
+        value = local.get(namespace, arguments)
+        if value is not MISSING:
+            _count(endpoint, "local_hits")
+            return value
+
+    client = None
+    if spec["ttl"] is not None and _redis_available():
+        key = cache_key(endpoint, namespace, arguments)
+        client = get_async_redis_client()
+        try:
+            cached = await client.get(key)
+        except redis.RedisError as e:
+            _redis_failed(endpoint, e)
+            client = None
+        else:
+            if cached is not None:
+                _count(endpoint, "hits")
+                value = json.loads(cached)
+                if local is not None:
+                    local.put(namespace, arguments, value)
+                return value
+
+    _count(endpoint, "misses")
+    value = await _compute(spec, args, kwargs)
+    if client is not None:
+        try:
+            await client.set(key, json.dumps(value), ex=spec["ttl"])
+        except redis.RedisError as e:
+            _redis_failed(endpoint, e)
+    if local is not None:
+        local.put(namespace, arguments, value)
+    return value
+
+
+async def _compute(spec: dict, args, kwargs):
+    afn = spec.get("async_compute")
+    if afn is not None:
+        return await afn(*args, **kwargs)
+    return await run_compute(spec["compute"], *args, **kwargs)
@@ -3,6 +3,11 @@ from pydantic import BaseSettings
 class Settings(BaseSettings):
     # General
     MODEL_DIR: str = "models"
+    MMAP_ARTIFACTS: bool = True
+    # Storage of item/content matrices written by models/ and scripts/:
+    # "float32", "float16" or "int8" (per-row scaled)
+    EMBEDDING_DTYPE: str = "float32"
+    MODEL_WATCH_INTERVAL_SECONDS: float = 2.0
     LOG_LEVEL: str = "INFO"
 
     # Postgres
@@ -16,8 +21,88 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.05
+
+    # Response cache (Redis)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_RECOMMEND: int = 300
+    CACHE_TTL_SIMILAR: int = 3600
+    CACHE_RETRY_SECONDS: float = 5.0
+
+    # Per-worker cache tier in front of Redis (hot keys only)
+    LOCAL_CACHE_SIZE_SIMILAR: int = 10_000
+    LOCAL_CACHE_TTL_SIMILAR: float = 60.0
+    LOCAL_CACHE_SIZE_COLD_START: int = 64
+    LOCAL_CACHE_TTL_COLD_START: float = 10.0
 
     # API / System
     TOP_K_DEFAULT: int = 10
 
+    # Scoring: candidates each source hands to the hybrid re-rank
+    # (larger = better recall, more latency)
+    CF_TOP_K: int = 100
+    CONTENT_TOP_K: int = 100
+    TRENDING_TOP_K: int = 50
+    PROFILE_CACHE_SIZE: int = 100_000
+
+    # Similar items (FAISS)
+    SIMILAR_BACKEND: str = "faiss"  # "faiss" or "exact"
+    FAISS_INDEX_TYPE: str = "flat"  # "flat", "ivf" or "hnsw"
+    FAISS_NLIST: int = 1024
+    FAISS_NPROBE: int = 16
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64
+    NEIGHBOUR_TABLE_SIZE: int = 50
+
+    # Streaming trending (Services/trending_stream.py)
+    TRENDING_STREAM_ENABLED: bool = False
+    TRENDING_HALF_LIFE_SECONDS: float = 3600.0
+    TRENDING_PUBLISH_INTERVAL_SECONDS: float = 5.0
+    TRENDING_TOP_N: int = 100
+    TRENDING_HEAP_SIZE: int = 1000
+    TRENDING_SKETCH_WIDTH: int = 2**16  # power of two
+    TRENDING_SKETCH_DEPTH: int = 4
+    TRENDING_POLL_BATCH: int = 10_000
+    # Ids below the highest seen that every poll (and build_trending run)
+    # re-reads, for rows committed late
+    TRENDING_ID_OVERLAP: int = 1_000
+    # Written by the single producer in MODEL_DIR, read by every worker
+    TRENDING_LIVE_FILE: str = "trending_live.json"
+    # Start the producer from the gunicorn master; off when a sidecar runs it
+    TRENDING_PRODUCER_IN_MASTER: bool = True
+
+    # Business-rule item filters: stock, blocklist, ?category= (Services/item_filter_refresh.py)
+    ITEM_FILTERS_ENABLED: bool = False
+    ITEM_FILTERS_REFRESH_SECONDS: float = 30.0
+    # Extra FAISS neighbours fetched per result when filters may drop some
+    ITEM_FILTERS_OVERFETCH: int = 4
+
+    # Session model (/recommend/session)
+    SESSION_MODEL_ENABLED: bool = True
+    SESSION_MODEL_THREADS: int = 1
+    SESSION_LATENCY_BUDGET_MS: float = 20.0
+
+    # Batch recommendations
+    BATCH_MAX_USERS: int = 1000
+    # Users per candidate GEMM: small blocks leave BLAS far from peak
+    BATCH_BLOCK_SIZE: int = 128
+
+    # Compute executor for async handlers
+    # (in flight beyond COMPUTE_WORKERS + COMPUTE_QUEUE_SIZE -> 503)
+    COMPUTE_WORKERS: int = 4
+    COMPUTE_QUEUE_SIZE: int = 64
+    COMPUTE_RETRY_AFTER_SECONDS: int = 1
+    BLAS_THREADS: int = 1
+
+    # Micro-batching of model scoring (core/batcher.py)
+    BATCHER_ENABLED: bool = True
+    BATCHER_MAX_BATCH: int = 64
+    BATCHER_MAX_WAIT_US: int = 2000
+    BATCHER_MAX_CONCURRENT: int = 2
+
+    # Prometheus metrics (core/metrics.py, GET /metrics)
+    METRICS_RSS_INTERVAL_SECONDS: float = 5.0
+
 settings = Settings()
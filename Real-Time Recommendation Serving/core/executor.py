@@ -0,0 +1,87 @@
+"""
+Bounded executor for the CPU-bound scoring work of async handlers.
+
+numpy/BLAS calls run here instead of on the event loop or on Starlette's
+default threadpool, so slow scoring cannot stall Redis/DB I/O or other
+requests. At most COMPUTE_WORKERS calls run at once and COMPUTE_QUEUE_SIZE
+more may wait; past that run_compute raises ComputeQueueFull, which the app
+turns into a 503 instead of letting latency grow without bound.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.config import settings
+from core.logging_config import get_logger
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # optional: fall back to OMP/OPENBLAS env vars
+    threadpool_limits = None
+
+logger = get_logger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+class ComputeQueueFull(Exception):
+    """
+    Every compute worker is busy and the wait queue is full.
+    """
+
+
+def get_compute_executor() -> ThreadPoolExecutor:
+    """
+    The worker's compute pool, created on first use. BLAS is capped at
+    settings.BLAS_THREADS per call so COMPUTE_WORKERS concurrent requests
+    do not oversubscribe the cores.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if threadpool_limits is not None:
+                threadpool_limits(limits=settings.BLAS_THREADS, user_api="blas")
+            else:
+                logger.info("threadpoolctl not installed, BLAS threads follow OMP_NUM_THREADS")
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.COMPUTE_WORKERS, thread_name_prefix="compute"
+            )
+    return _executor
+
+
+def compute_stats() -> dict:
+    with _in_flight_lock:
+        in_flight = _in_flight
+    return {
+        "in_flight": in_flight,
+        "workers": settings.COMPUTE_WORKERS,
+        "capacity": settings.COMPUTE_WORKERS + settings.COMPUTE_QUEUE_SIZE,
+    }
+
+
+def _release(_future):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+async def run_compute(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) on the compute executor.
+    Raises ComputeQueueFull instead of queueing past the configured bound.
+    """
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= settings.COMPUTE_WORKERS + settings.COMPUTE_QUEUE_SIZE:
+            raise ComputeQueueFull(f"{_in_flight} compute calls already in flight")
+        _in_flight += 1
+    try:
+        future = get_compute_executor().submit(fn, *args, **kwargs)
+    except BaseException:
+        _release(None)
+        raise
+    # Released when the work finishes, even if the awaiting request was cancelled.
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
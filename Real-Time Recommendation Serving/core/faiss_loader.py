@@ -1,25 +1,101 @@
 import os
+import numpy as np
 import faiss
 from core.config import settings
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_FILE = "faiss.index"
+INDEX_TYPES = ("flat", "ivf", "hnsw")
 
 faiss_index = None
 
-def load_faiss_index():
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.array(vectors, dtype=np.float32, order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str = None,
+                nlist: int = None, hnsw_m: int = None):
+    """
+    Build an inner-product index over L2-normalized vectors (i.e. cosine),
+    keyed by item id through an IndexIDMap.
+    index_type: "flat" (exact), "ivf" or "hnsw"; defaults to settings.FAISS_INDEX_TYPE.
+    nlist / hnsw_m override settings.FAISS_NLIST / settings.FAISS_HNSW_M.
+    """
+    index_type = index_type or settings.FAISS_INDEX_TYPE
+    vectors = _normalized(vectors)
+    n, dim = vectors.shape
+
+    if index_type == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif index_type == "ivf":
+        nlist = max(1, min(nlist or settings.FAISS_NLIST, n))
+        base = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        base.train(vectors)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, hnsw_m or settings.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+    else:
+        raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    index = faiss.IndexIDMap(base)
+    index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    apply_search_params(index)
+    return index
+
+def apply_search_params(index, nprobe: int = None, ef_search: int = None):
+    """
+    Set query-time knobs (IVF nprobe, HNSW efSearch); they are not persisted
+    with the index, so this runs after every load.
+    """
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe or settings.FAISS_NPROBE
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or settings.FAISS_HNSW_EF_SEARCH
+    return index
+
+def save_index(index, model_dir: str = None):
+    path = os.path.join(model_dir or settings.MODEL_DIR, INDEX_FILE)
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def load_faiss_index(model_dir: str = None, expected_size: int = None):
+    """
+    Read the index written by build_index/save_index. When expected_size is
+    given, an index of a different size (stale, or an old id-less IndexFlatL2)
+    is rejected and None is returned so callers fall back to exact search.
+    """
     global faiss_index
-    index_path = os.path.join(settings.MODEL_DIR, "faiss.index")
+    index_path = os.path.join(model_dir or settings.MODEL_DIR, INDEX_FILE)
     if not os.path.exists(index_path):
         raise FileNotFoundError(f"FAISS index not found at {index_path}")
-    faiss_index = faiss.read_index(index_path)
+    index = faiss.read_index(index_path)
+    if expected_size is not None and (
+        not isinstance(index, faiss.IndexIDMap) or index.ntotal != expected_size
+    ):
+        logger.warning(
+            "Ignoring %s: expected an id-mapped index of %d items, got %s with %d",
+            index_path, expected_size, type(index).__name__, index.ntotal,
+        )
+        return None
+    faiss_index = apply_search_params(index)
     return faiss_index
 
-def search(query_vector, top_k=10):
+def search(query_vector, top_k=10, index=None):
     """
     Search FAISS index.
-    query_vector: numpy array (1D)
+    query_vector: numpy array (1D), normalized here to match the index.
+    Returns (ids, scores); empty slots (id -1) are dropped.
     """
     global faiss_index
-    if faiss_index is None:
-        load_faiss_index()
-    query_vector = query_vector.astype('float32').reshape(1, -1)
-    distances, indices = faiss_index.search(query_vector, top_k)
-    return indices.flatten().tolist(), distances.flatten().tolist()
+    if index is None:
+        index = faiss_index if faiss_index is not None else load_faiss_index()
+    query_vector = _normalized(np.asarray(query_vector).reshape(1, -1))
+    scores, ids = index.search(query_vector, top_k)
+    keep = ids[0] >= 0
+    return ids[0][keep].tolist(), scores[0][keep].tolist()
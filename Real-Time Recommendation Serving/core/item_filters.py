@@ -0,0 +1,101 @@
+"""
+Business-rule item filters (stock, blocklist, category) as catalog-aligned
+arrays, built once per refresh so requests only gather and combine them.
+
+The raw rules are "attributes" keyed by item id (kept by
+Services/item_filter_refresh.py, which polls Postgres):
+
+    item_ids    int64, sorted
+    category    int32 code into `categories`, -1 for none
+    in_stock    bool
+    blocked     bool
+    categories  tuple of category names
+    version     str, identical in every worker that has seen the same rows
+
+build_filter_index aligns them to a snapshot's catalog rows:
+
+    excluded         bool per catalog row: ~in_stock | blocked
+    excluded_rows    its nonzero rows, to mask dense score blocks
+    category_codes   int32 per catalog row, -1 for none
+    category_ids     {name: code}
+    category_offsets, category_rows
+                     allowed rows grouped by category (CSR): rows of code c
+                     are category_rows[category_offsets[c]:category_offsets[c + 1]]
+    version
+
+Items missing from the attributes are allowed and have no category.
+"""
+from types import MappingProxyType
+import numpy as np
+
+
+def empty_attributes(version: str = "empty") -> MappingProxyType:
+    return MappingProxyType({
+        "item_ids": np.empty(0, dtype=np.int64),
+        "category": np.empty(0, dtype=np.int32),
+        "in_stock": np.empty(0, dtype=bool),
+        "blocked": np.empty(0, dtype=bool),
+        "categories": (),
+        "version": version,
+    })
+
+
+def build_filter_index(attributes, item_ids: np.ndarray) -> MappingProxyType:
+    n = len(item_ids)
+    ids = attributes["item_ids"]
+    pos = np.minimum(np.searchsorted(item_ids, ids), max(n - 1, 0))
+    known = (item_ids[pos] == ids) if n else np.zeros(len(ids), dtype=bool)
+    rows = pos[known]
+
+    excluded = np.zeros(n, dtype=bool)
+    excluded[rows] = ~attributes["in_stock"][known] | attributes["blocked"][known]
+    codes = np.full(n, -1, dtype=np.int32)
+    codes[rows] = attributes["category"][known]
+
+    # Allowed rows of each category, grouped by code (rows stay sorted within a code).
+    n_categories = len(attributes["categories"])
+    allowed = np.flatnonzero((codes >= 0) & ~excluded)
+    allowed = allowed[np.argsort(codes[allowed], kind="stable")]
+    offsets = np.zeros(n_categories + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[allowed], minlength=n_categories), out=offsets[1:])
+
+    index = {
+        "excluded": excluded,
+        "excluded_rows": np.flatnonzero(excluded),
+        "category_codes": codes,
+        "category_offsets": offsets,
+        "category_rows": allowed.astype(np.int32),
+    }
+    for array in index.values():
+        array.flags.writeable = False
+    index["category_ids"] = MappingProxyType({name: code for code, name in enumerate(attributes["categories"])})
+    index["version"] = attributes["version"]
+    return MappingProxyType(index)
+
+
+def category_rows(filters, category: str) -> np.ndarray:
+    """
+    Sorted catalog rows of `category` that pass every rule; empty for an
+    unknown category or without filters. A slice, so it costs nothing per
+    request.
+    """
+    code = None if filters is None else filters["category_ids"].get(category)
+    if code is None:
+        return np.empty(0, dtype=np.int32)
+    offsets = filters["category_offsets"]
+    return filters["category_rows"][offsets[code]:offsets[code + 1]]
+
+
+def allowed_mask(filters, rows: np.ndarray, category: str = None) -> np.ndarray:
+    """
+    True for each of `rows` (catalog rows, e.g. a candidate set) that passes
+    every rule and, if given, is in `category`. Gathers over `rows` only.
+    """
+    if filters is None:
+        # Without filters loaded no item is known to be in any category.
+        return np.full(len(rows), category is None, dtype=bool)
+    keep = ~filters["excluded"][rows]
+    if category is not None:
+        code = filters["category_ids"].get(category, -2)
+        keep &= filters["category_codes"][rows] == code
+    return keep
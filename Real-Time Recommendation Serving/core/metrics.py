@@ -0,0 +1,139 @@
+"""
+Prometheus metrics for the API, served on GET /metrics.
+
+    reco_stage_seconds{stage}                   scoring stages (cf_score, content_score, ...)
+    reco_request_seconds{route}                 whole requests, by route template
+    reco_requests_total{method,route,status}
+    reco_cache_events_total{endpoint,result}    local_hit / hit / miss / error, see core.cache;
+                                                hit ratio = (local_hit + hit) / (all but error)
+    reco_model_info{version}                    1 for the live model version
+    reco_model_load_seconds{part}               snapshot build time per artifact group
+    reco_worker_rss_bytes                       resident memory, one series per worker
+
+Under gunicorn every worker is a separate process. When
+PROMETHEUS_MULTIPROC_DIR is set (Docker/gunicorn.conf.py sets and creates
+it before the app is imported) each worker writes its samples to
+memory-mapped files in that directory and /metrics, in whichever worker
+serves it, aggregates all of them. The directory must exist before this
+module is first imported.
+"""
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    multiprocess
+)
+from core.config import settings
+
+# Most stages take well under a millisecond; requests up to seconds.
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGE_SECONDS = Histogram(
+    "reco_stage_seconds", "Time spent in one scoring stage", ["stage"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "reco_request_seconds", "Request latency", ["route"], buckets=REQUEST_BUCKETS
+)
+REQUESTS = Counter("reco_requests_total", "Requests served", ["method", "route", "status"])
+CACHE_EVENTS = Counter("reco_cache_events_total", "Response cache lookups", ["endpoint", "result"])
+MODEL_INFO = Gauge(
+    "reco_model_info", "1 for the model version a worker serves", ["version"], multiprocess_mode="liveall"
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "reco_model_load_seconds", "Model snapshot build time", ["part"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+WORKER_RSS = Gauge("reco_worker_rss_bytes", "Resident set size of the worker", multiprocess_mode="liveall")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_rss_updated = 0.0
+_live_version = None
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """
+    Decorator: observe every call of the function in reco_stage_seconds{stage}.
+    """
+    def decorator(fn):
+        histogram = STAGE_SECONDS.labels(stage)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUESTS.labels(method, route, str(status)).inc()
+    REQUEST_SECONDS.labels(route).observe(seconds)
+    update_rss()
+
+
+def count_cache_event(endpoint: str, result: str):
+    CACHE_EVENTS.labels(endpoint, result).inc()
+
+
+def record_model(version: str, load_seconds: dict):
+    """
+    Publish the version a worker now serves and how long its snapshot took
+    to build ({part: seconds}).
+    """
+    global _live_version
+    if _live_version is not None and _live_version != version:
+        MODEL_INFO.labels(_live_version).set(0)
+    MODEL_INFO.labels(version).set(1)
+    _live_version = version
+    for part, seconds in load_seconds.items():
+        MODEL_LOAD_SECONDS.labels(part).observe(seconds)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def update_rss(force: bool = False):
+    """
+    Refresh reco_worker_rss_bytes, at most every METRICS_RSS_INTERVAL_SECONDS
+    (called per request, so every busy worker keeps its own series fresh).
+    """
+    global _rss_updated
+    now = time.monotonic()
+    if force or now - _rss_updated >= settings.METRICS_RSS_INTERVAL_SECONDS:
+        _rss_updated = now
+        WORKER_RSS.set(rss_bytes())
+
+
+def render_metrics() -> tuple:
+    """
+    (body, content type) of the Prometheus text exposition, aggregated over
+    all workers in multiprocess mode.
+    """
+    update_rss(force=True)
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
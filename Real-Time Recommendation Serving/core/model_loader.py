@@ -1,41 +1,420 @@
 import os
-import pickle
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 import numpy as np
 from core.config import settings
+from core.artifact_store import (
+    EMBEDDING_ARRAYS, HISTORY_ARRAYS, HISTORY_SOURCES, MANIFEST_FILE, NEIGHBOUR_ARRAYS, NEIGHBOUR_SOURCES, QUANTIZABLE_ARRAYS,
+    dequantized, has_manifest, history_arrays, history_from_dict, is_current, is_normalized, memory_report,
+    read_artifacts, read_manifest, to_matrix
+)
+from core.item_filters import build_filter_index
+from core.local_cache import LRUCache
+from core.logging_config import get_logger
+from core.metrics import record_model
+from utils.scoring_utils import normalize_rows
 
-model_store = {
-    "user_embeddings": {},
-    "item_embeddings": {},
-    "content_embeddings": {},
-    "user_history": {},
-    "trending_scores": {}
-}
+logger = get_logger(__name__)
+
+RELOAD_TRIGGER_FILE = ".reload"
+# Written last by the session model export (core.session_model.META_FILE).
+SESSION_MODEL_META_FILE = "session_model.json"
+# core.faiss_loader.INDEX_FILE; faiss is only imported when this file exists.
+FAISS_INDEX_FILE = "faiss.index"
+
+# The live snapshot. It is never mutated: a reload builds a complete new
+# snapshot and replaces this reference in one assignment, so a request that
+# called get_model_store() once sees a single consistent model version.
+model_store = MappingProxyType({
+    "version": None,
+    "loaded_at": None,
+    "cache_namespace": None,
+    "model_namespace": None,
+    "user_ids": np.empty(0, dtype=np.int64),
+    "user_matrix": np.empty((0, 0), dtype=np.float32),
+    "item_ids": np.empty(0, dtype=np.int64),
+    "item_matrix": np.empty((0, 0), dtype=np.float32),
+    "content_matrix": np.empty((0, 0), dtype=np.float32),
+    "item_matrix_scale": None,
+    "content_matrix_scale": None,
+    "profile_cache": LRUCache(0),
+    "user_history": MappingProxyType({
+        "user_ids": np.empty(0, dtype=np.int64),
+        "offsets": np.zeros(1, dtype=np.int32),
+        "rows": np.empty(0, dtype=np.int32),
+    }),
+    "trending": None,
+    "item_filters": None,
+    "faiss_index": None,
+    "neighbour_rows": None,
+    "neighbour_scores": None,
+    "session_model": None,
+    "memory_report": {},
+    "load_seconds": {}
+})
+
+_swap_lock = threading.Lock()
+_reload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-reload")
+_watched_stamp = None
+# Latest streamed trending scores; survive model reloads (see publish_trending).
+_live_trending = None
+# Latest item filter attributes; realigned to each new catalog (see publish_filters).
+_live_filters = None
+
+def get_model_store():
+    """
+    Return the live model snapshot. Call once per request and pass it down.
+    """
+    return model_store
 
 def load_embeddings(path: str) -> dict:
     return np.load(path, allow_pickle=True).item()
 
-def load_models():
+def row_of(ids: np.ndarray, key: int) -> int:
     """
-    Load all embeddings and metadata at API startup.
+    Row of `key` in a sorted id array, or -1 if it is absent.
+    """
+    pos = int(np.searchsorted(ids, key))
+    if pos < len(ids) and ids[pos] == key:
+        return pos
+    return -1
+
+def rows_of(ids: np.ndarray, keys) -> np.ndarray:
     """
-    model_store["user_embeddings"] = load_embeddings(
-        os.path.join(settings.MODEL_DIR, "user_embeddings.npy")
+    Vectorized row_of: one row per key, -1 for unknown keys.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(ids) == 0:
+        return np.full(keys.shape, -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+    return np.where(ids[pos] == keys, pos, -1)
+
+def build_trending_index(trending_scores: dict, item_ids: np.ndarray) -> MappingProxyType:
+    """
+    Rank a {item_id: score} dict (keys may be strings, as in trending.json)
+    once, at load time, into read-only arrays:
+        item_ids, scores  every trending item, best first
+        rows, row_scores  the ones in the catalog as catalog rows, best first
+        vector            float32 score per catalog row, 0 if not trending
+    """
+    ids = np.array([int(k) for k in trending_scores], dtype=np.int64)
+    scores = np.array(list(trending_scores.values()), dtype=np.float32)
+    # Stable, so equal scores keep the order of the source file.
+    order = np.argsort(-scores, kind="stable")
+    ids, scores = ids[order], scores[order]
+
+    rows = rows_of(item_ids, ids)
+    known = rows >= 0
+    vector = np.zeros(len(item_ids), dtype=np.float32)
+    vector[rows[known]] = scores[known]
+
+    index = {
+        "item_ids": ids,
+        "scores": scores,
+        "rows": rows[known],
+        "row_scores": scores[known],
+        "vector": vector,
+    }
+    for array in index.values():
+        array.flags.writeable = False
+    return MappingProxyType(index)
+
+def build_history_index(arrays: dict, n_items: int) -> MappingProxyType:
+    """
+    Read-only CSR view of the HISTORY_ARRAYS in `arrays` (memory-mapped when
+    they come from the manifest): user_ids, offsets, rows. Empty when they
+    are missing or were built for a different catalog.
+    """
+    user_ids, offsets, rows = (arrays.get(name) for name in HISTORY_ARRAYS)
+    if user_ids is not None and (
+        len(offsets) != len(user_ids) + 1 or offsets[-1] != len(rows) or (len(rows) and rows.max() >= n_items)
+    ):
+        logger.warning("User history does not match the catalog (%d items); ignoring it", n_items)
+        user_ids = None
+    if user_ids is None:
+        empty = history_arrays([], [], np.empty(0, dtype=np.int64))
+        user_ids, offsets, rows = (empty[name] for name in HISTORY_ARRAYS)
+    index = {"user_ids": user_ids, "offsets": offsets, "rows": rows}
+    for array in index.values():
+        array.flags.writeable = False
+    return MappingProxyType(index)
+
+def seen_rows(history, user_id: int) -> np.ndarray:
+    """
+    Sorted catalog rows in the user's history (a view), empty if none.
+    """
+    row = row_of(history["user_ids"], user_id)
+    if row < 0:
+        return history["rows"][:0]
+    offsets = history["offsets"]
+    return history["rows"][offsets[row]:offsets[row + 1]]
+
+def load_legacy_history(model_dir: str, item_ids: np.ndarray) -> dict:
+    """
+    HISTORY_ARRAYS built in memory from the {user_id: [item_id, ...]} JSON
+    of older artifacts (metadata.json); empty if it holds anything else.
+    Prefer the mmap layout from scripts/build_user_history.py.
+    """
+    path = os.path.join(model_dir, "metadata.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        metadata = json.load(f)
+    histories = {k: v for k, v in metadata.items() if isinstance(v, list)}
+    return history_from_dict(histories, item_ids) if histories else {}
+
+def load_legacy_embeddings(model_dir: str) -> dict:
+    """
+    Read the pickled {id: vector} dicts and pack them into matrices.
+    Every worker ends up with a private heap copy; prefer the mmap layout
+    from core.artifact_store.
+    """
+    user_emb = load_embeddings(os.path.join(model_dir, "user_embeddings.npy"))
+    item_emb = load_embeddings(os.path.join(model_dir, "item_embeddings.npy"))
+    content_emb = load_embeddings(os.path.join(model_dir, "content_embeddings.npy"))
+
+    catalog = np.array(
+        sorted({int(k) for k in item_emb} | {int(k) for k in content_emb}), dtype=np.int64
     )
+    user_ids, user_matrix = to_matrix(user_emb)
+    _, item_matrix = to_matrix(item_emb, catalog)
+    _, content_matrix = to_matrix(content_emb, catalog)
+    return {
+        "user_ids": user_ids,
+        "user_matrix": user_matrix,
+        "item_ids": catalog,
+        "item_matrix": item_matrix,
+        "content_matrix": content_matrix,
+    }
+
+def read_version(model_dir: str) -> str:
+    path = os.path.join(model_dir, "version.txt")
+    if os.path.exists(path):
+        with open(path) as f:
+            return f.read().strip()
+    if has_manifest(model_dir):
+        return read_manifest(model_dir).get("version", "unversioned")
+    return "unversioned"
 
-    model_store["item_embeddings"] = load_embeddings(
-        os.path.join(settings.MODEL_DIR, "item_embeddings.npy")
+def build_snapshot(model_dir: str) -> MappingProxyType:
+    """
+    Load all embeddings and metadata into a new read-only snapshot.
+    Item and content matrices share one catalog row order (snapshot["item_ids"]);
+    content rows are always L2-normalized. int8 matrices come with a per-row
+    snapshot["<name>_scale"] (None for float storage).
+    snapshot["load_seconds"] times each part of the build.
+    """
+    started = time.perf_counter()
+    load_seconds = {}
+    manifest = None
+    if has_manifest(model_dir):
+        manifest = read_manifest(model_dir)
+        arrays = read_artifacts(model_dir, mmap=settings.MMAP_ARTIFACTS)
+        content_normalized = is_normalized(model_dir, "content_matrix")
+    else:
+        arrays = load_legacy_embeddings(model_dir)
+        content_normalized = False
+
+    snapshot = {name: arrays[name] for name in EMBEDDING_ARRAYS}
+    for name in QUANTIZABLE_ARRAYS:
+        scale = None
+        if snapshot[name].dtype == np.int8:
+            scale = arrays.get(f"{name}_scale")
+            if scale is None or len(scale) != len(snapshot[name]):
+                raise ValueError(f"int8 {name} in {model_dir} has no matching {name}_scale")
+        snapshot[f"{name}_scale"] = scale
+    if not content_normalized:
+        # Older artifacts: normalize once here (a private copy) rather than per request.
+        snapshot["content_matrix"] = normalize_rows(dequantized(arrays, "content_matrix"))
+        snapshot["content_matrix_scale"] = None
+    for array in snapshot.values():
+        if array is not None:
+            array.flags.writeable = False
+
+    # Precomputed /similar table, only if it was built from this content matrix.
+    neighbours = [arrays.get(name) for name in NEIGHBOUR_ARRAYS]
+    if any(n is None or len(n) != len(snapshot["item_ids"]) for n in neighbours):
+        neighbours = [None] * len(NEIGHBOUR_ARRAYS)
+    elif not all(is_current(manifest, name, NEIGHBOUR_SOURCES[name]) for name in NEIGHBOUR_ARRAYS):
+        logger.warning("Neighbour table in %s was built from another content matrix, ignoring it", model_dir)
+        neighbours = [None] * len(NEIGHBOUR_ARRAYS)
+    snapshot.update(zip(NEIGHBOUR_ARRAYS, neighbours))
+    load_seconds["arrays"] = time.perf_counter() - started
+
+    part_started = time.perf_counter()
+    snapshot["version"] = read_version(model_dir)
+    snapshot["loaded_at"] = time.time()
+    # Identical in every worker for the same artifacts; response cache keys use it.
+    created_at = manifest.get("created_at") if manifest else None
+    snapshot["cache_namespace"] = f"{snapshot['version']}@{created_at}" if created_at else snapshot["version"]
+    snapshot["model_namespace"] = snapshot["cache_namespace"]
+    snapshot["item_filters"] = None
+    # Profiles depend on this version's content matrix, so the cache lives and dies with it.
+    snapshot["profile_cache"] = LRUCache(settings.PROFILE_CACHE_SIZE)
+
+    if HISTORY_ARRAYS[0] not in arrays:
+        history = load_legacy_history(model_dir, snapshot["item_ids"])
+    elif is_current(manifest, "history_rows", HISTORY_SOURCES["history_rows"]):
+        history = arrays
+    else:
+        # Rows of another catalog would mark the wrong items as seen.
+        logger.warning("User history in %s was built for another item_ids, ignoring it", model_dir)
+        history = {}
+    snapshot["user_history"] = build_history_index(history, len(snapshot["item_ids"]))
+
+    with open(os.path.join(model_dir, "trending.json")) as f:
+        snapshot["trending"] = build_trending_index(json.load(f), snapshot["item_ids"])
+    load_seconds["metadata"] = time.perf_counter() - part_started
+
+    part_started = time.perf_counter()
+    snapshot["faiss_index"] = None
+    if settings.SIMILAR_BACKEND == "faiss" and os.path.exists(os.path.join(model_dir, FAISS_INDEX_FILE)):
+        from core.faiss_loader import load_faiss_index
+        snapshot["faiss_index"] = load_faiss_index(model_dir, expected_size=len(snapshot["item_ids"]))
+    load_seconds["faiss_index"] = time.perf_counter() - part_started
+
+    part_started = time.perf_counter()
+    snapshot["session_model"] = None
+    if settings.SESSION_MODEL_ENABLED and os.path.exists(os.path.join(model_dir, SESSION_MODEL_META_FILE)):
+        try:
+            # torch is imported only here, when a session model is present.
+            from core.session_model import load_session_model
+        except ImportError:
+            logger.warning("Session model found in %s but torch is not installed; skipping it", model_dir)
+        else:
+            snapshot["session_model"] = load_session_model(model_dir)
+    load_seconds["session_model"] = time.perf_counter() - part_started
+
+    report = memory_report(arrays)
+    snapshot["memory_report"] = report
+    load_seconds["total"] = time.perf_counter() - started
+    snapshot["load_seconds"] = load_seconds
+    logger.info(
+        "Built model snapshot %s in %.2fs: %.1f MB memory-mapped (shared across workers), "
+        "%.1f MB private heap, rss=%s pss=%s",
+        snapshot["version"], load_seconds["total"], report["mapped_bytes"] / 1e6,
+        report["heap_bytes"] / 1e6, report["rss_bytes"], report["pss_bytes"],
     )
+    return MappingProxyType(snapshot)
 
-    model_store["content_embeddings"] = load_embeddings(
-        os.path.join(settings.MODEL_DIR, "content_embeddings.npy")
+def load_models(record_metrics: bool = True) -> str:
+    """
+    Build a fresh snapshot from settings.MODEL_DIR and swap it in atomically.
+    If loading fails the current snapshot stays live. Returns the live version.
+    record_metrics=False skips the version and load-time metrics: the
+    gunicorn master preloads for its workers but serves nothing, and series
+    under its pid would never be marked dead.
+    """
+    global model_store
+    stamp = _artifact_stamp(settings.MODEL_DIR)
+    snapshot = build_snapshot(settings.MODEL_DIR)
+    with _swap_lock:
+        if _live_trending is not None:
+            snapshot = _with_trending(snapshot, _live_trending)
+        if _live_filters is not None:
+            snapshot = _with_filters(snapshot, _live_filters)
+        model_store = snapshot
+        _mark_seen(stamp)
+    if record_metrics:
+        record_model(snapshot["version"], snapshot["load_seconds"])
+    return snapshot["version"]
+
+def _with_trending(snapshot, trending_scores: dict) -> MappingProxyType:
+    return MappingProxyType(
+        dict(snapshot, trending=build_trending_index(trending_scores, snapshot["item_ids"]))
     )
 
-    with open(os.path.join(settings.MODEL_DIR, "metadata.json")) as f:
-        model_store["user_history"] = json.load(f)
+def publish_trending(trending_scores: dict):
+    """
+    Swap in a snapshot that differs from the live one only in its trending
+    index (the streaming engine calls this every few seconds). The cache
+    namespace is kept, so response caches are not invalidated: cached
+    recommendations pick up new trending scores as their TTLs expire.
+    """
+    global model_store, _live_trending
+    with _swap_lock:
+        _live_trending = dict(trending_scores)
+        model_store = _with_trending(model_store, _live_trending)
+
+def _with_filters(snapshot, attributes) -> MappingProxyType:
+    filters = build_filter_index(attributes, snapshot["item_ids"])
+    return MappingProxyType(dict(
+        snapshot,
+        item_filters=filters,
+        cache_namespace=f"{snapshot['model_namespace']}|filters={filters['version']}",
+    ))
+
+def publish_filters(attributes):
+    """
+    Swap in a snapshot with item filters rebuilt from `attributes` (see
+    core.item_filters). Unlike trending, a rule change must take effect at
+    once, so the cache namespace changes with the filter version: cached
+    responses are dropped, not served with a blocked item until their TTL.
+    """
+    global model_store, _live_filters
+    with _swap_lock:
+        _live_filters = attributes
+        model_store = _with_filters(model_store, attributes)
+
+def reload_models_in_background():
+    """
+    Build the next snapshot on the dedicated reload thread so request threads
+    keep serving the current one. Reloads are serialized on that thread, so an
+    older build can never be swapped in over a newer one. Returns a Future
+    resolving to the live version.
+    """
+    return _reload_executor.submit(load_models)
+
+def signal_reload():
+    """
+    Touch the reload trigger file so the watchers of every other worker
+    pick up the new artifacts.
+    """
+    path = os.path.join(settings.MODEL_DIR, RELOAD_TRIGGER_FILE)
+    with open(path, "a"):
+        os.utime(path, None)
+    _mark_seen(_artifact_stamp(settings.MODEL_DIR))
+
+def _artifact_stamp(model_dir: str) -> tuple:
+    stamps = []
+    for name in ("version.txt", MANIFEST_FILE, RELOAD_TRIGGER_FILE):
+        try:
+            stamps.append(os.stat(os.path.join(model_dir, name)).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
 
-    with open(os.path.join(settings.MODEL_DIR, "trending.json")) as f:
-        model_store["trending_scores"] = json.load(f)
+def _mark_seen(stamp: tuple):
+    global _watched_stamp
+    _watched_stamp = stamp
 
-# Load models at startup
-load_models()
+def _watch(interval: float):
+    while True:
+        time.sleep(interval)
+        stamp = _artifact_stamp(settings.MODEL_DIR)
+        if stamp == _watched_stamp:
+            continue
+        logger.info("Model artifacts changed on disk, reloading")
+        try:
+            reload_models_in_background().result()
+        except Exception:
+            # Keep serving the current snapshot; the next change retries.
+            _mark_seen(stamp)
+            logger.exception("Model reload failed, keeping version %s", model_store["version"])
+
+def start_model_watcher(interval: float = None):
+    """
+    Start a daemon thread (one per worker) that reloads when version.txt,
+    the manifest or the reload trigger file changes.
+    """
+    interval = settings.MODEL_WATCH_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    if _watched_stamp is None:
+        _mark_seen(_artifact_stamp(settings.MODEL_DIR))
+    thread = threading.Thread(target=_watch, args=(interval,), name="model-watcher", daemon=True)
+    thread.start()
+    return thread
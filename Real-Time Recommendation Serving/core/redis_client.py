@@ -1,11 +1,45 @@
 import redis
+import redis.asyncio as aioredis
 from core.config import settings
 
+_pool = None
+
+def get_redis_pool() -> redis.ConnectionPool:
+    """
+    One connection pool per worker process, shared by every client.
+    """
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True
+        )
+    return _pool
+
 def get_redis_client():
-    return redis.Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=settings.REDIS_DB,
-        decode_responses=True
-    )
+    return redis.Redis(connection_pool=get_redis_pool())
+
+_async_pool = None
 
+def get_async_redis_client():
+    """
+    asyncio client for the request path; its pool belongs to the worker's
+    event loop.
+    """
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = aioredis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True
+        )
+    return aioredis.Redis(connection_pool=_async_pool)
@@ -0,0 +1,120 @@
+"""
+Serving side of the session models exported by
+Build Recommendation Models/export_session_model.py (TorchScript with top-k
+in the graph). torch is only imported by this module, and this module only
+by core.model_loader when a session model is present, so workers without
+one never pay for the import.
+"""
+import json
+import os
+import time
+import numpy as np
+import torch
+from core.config import settings
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_FILE = "session_model.pt"
+VOCAB_FILE = "session_vocab.npy"
+META_FILE = "session_model.json"
+
+_threads_set = False
+
+
+class SessionModel:
+    """
+    A loaded TorchScript session model and its vocabulary.
+    recommend()/recommend_batch() map item ids to model indices, run one
+    (batch, max_len) inference and map the in-graph top-k back to item ids.
+    """
+
+    def __init__(self, module, vocab: np.ndarray, max_len: int, top_k: int):
+        self.module = module
+        self.vocab = vocab
+        self.max_len = max_len
+        self.top_k = top_k
+        # Sorted view of the vocabulary for id -> index lookups.
+        self._order = np.argsort(vocab, kind="stable")
+        self._sorted_ids = vocab[self._order]
+        self.p99_ms = None
+
+    def indices_of(self, item_ids) -> np.ndarray:
+        """
+        Model indices of the known items, in session order; unknown ids are dropped.
+        """
+        keys = np.asarray(item_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._sorted_ids) - 1)
+        indices = self._order[pos][self._sorted_ids[pos] == keys]
+        return indices[indices > 0]
+
+    def recommend(self, item_ids, top_k: int = 10) -> list:
+        return self.recommend_batch([item_ids], [top_k])[0]
+
+    def recommend_batch(self, sessions, top_ks) -> list:
+        """
+        One (batch, max_len) forward pass for several sessions; one list of
+        item ids per session ([] for sessions with no known item).
+        """
+        results = [[] for _ in sessions]
+        known = []
+        seq = np.zeros((len(sessions), self.max_len), dtype=np.int64)
+        for i, item_ids in enumerate(sessions):
+            indices = self.indices_of(item_ids)[-self.max_len:]
+            if len(indices):
+                seq[len(known), self.max_len - len(indices):] = indices
+                known.append(i)
+        if not known:
+            return results
+
+        with torch.inference_mode():
+            scores, top = self.module(torch.from_numpy(seq[:len(known)]))
+        scores, top = scores.numpy(), top.numpy()
+        for row, i in enumerate(known):
+            k = min(top_ks[i], self.top_k)
+            # -inf marks masked slots when the vocabulary is smaller than top_k + session.
+            keep = np.isfinite(scores[row, :k])
+            results[i] = self.vocab[top[row, :k][keep]].tolist()
+        return results
+
+    def measure(self, iterations: int = 50) -> float:
+        """
+        Warm up the TorchScript executor and return the p99 latency (ms) of
+        full-length sessions.
+        """
+        sample = self.vocab[1:self.max_len + 1]
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            self.recommend(sample, self.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        self.p99_ms = float(np.percentile(latencies[iterations // 5:], 99))
+        return self.p99_ms
+
+
+def load_session_model(model_dir: str) -> SessionModel:
+    """
+    Load session_model.pt and its vocabulary, set torch's intra-op threads
+    to settings.SESSION_MODEL_THREADS (concurrency comes from the compute
+    executor, not from one request using every core) and warn when the
+    warmed-up p99 exceeds settings.SESSION_LATENCY_BUDGET_MS.
+    """
+    global _threads_set
+    if not _threads_set:
+        torch.set_num_threads(settings.SESSION_MODEL_THREADS)
+        _threads_set = True
+
+    with open(os.path.join(model_dir, META_FILE)) as f:
+        meta = json.load(f)
+    module = torch.jit.load(os.path.join(model_dir, MODEL_FILE), map_location="cpu").eval()
+    vocab = np.load(os.path.join(model_dir, VOCAB_FILE), allow_pickle=False)
+    model = SessionModel(module, vocab, meta["max_len"], meta["top_k"])
+
+    p99 = model.measure()
+    log = logger.warning if p99 > settings.SESSION_LATENCY_BUDGET_MS else logger.info
+    log(
+        "Session model %s: %d items, p99 %.2fms with %d torch threads (budget %.0fms)",
+        meta.get("model"), len(vocab) - 1, p99, settings.SESSION_MODEL_THREADS,
+        settings.SESSION_LATENCY_BUDGET_MS,
+    )
+    return model
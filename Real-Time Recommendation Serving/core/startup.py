@@ -0,0 +1,62 @@
+"""
+Startup phases of an API worker, reported by GET /ready and logged once
+the worker is ready.
+
+Nothing heavy happens at import time: the app module only imports code
+(faiss and torch are imported only when an artifact needs them), artifacts load
+in the FastAPI lifespan or, under gunicorn with preload_app, once in the
+master before workers fork (Docker/gunicorn.conf.py). A preloaded worker
+inherits the master's phases and only adds its own.
+"""
+import os
+import time
+from contextlib import contextmanager
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_phases = {}
+_ready = False
+_preloaded = False
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = time.perf_counter() - start
+
+
+def record(name: str, seconds: float):
+    _phases[name] = seconds
+
+
+def mark_preloaded():
+    global _preloaded
+    _preloaded = True
+
+
+def mark_ready():
+    global _ready
+    _ready = True
+    logger.info(
+        "Worker %d ready in %.2fs%s: %s", os.getpid(), sum(_phases.values()),
+        " (artifacts preloaded in master)" if _preloaded else "",
+        ", ".join(f"{name}={seconds:.2f}s" for name, seconds in _phases.items()),
+    )
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def startup_report() -> dict:
+    return {
+        "ready": _ready,
+        "pid": os.getpid(),
+        "preloaded": _preloaded,
+        "phases": dict(_phases),
+        "total_seconds": sum(_phases.values()),
+    }
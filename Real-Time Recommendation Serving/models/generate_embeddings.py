@@ -2,10 +2,14 @@ import numpy as np
 import os
 from sklearn.feature_extraction.text import TfidfVectorizer
 import pickle
-import faiss
 import json
+from core.artifact_store import (
+    HISTORY_SOURCES, dequantized, history_from_dict, read_artifacts, write_artifacts, write_embedding_artifacts
+)
+from core.config import settings
+from core.faiss_loader import build_index, save_index
 
-MODEL_DIR = "models"
+MODEL_DIR = settings.MODEL_DIR
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 # Example item data
@@ -22,7 +26,8 @@ descriptions = [i["description"] for i in items]
 # TF-IDF Vectorizer
 # -------------------
 tfidf = TfidfVectorizer(max_features=50)
-tfidf_embeddings = tfidf.fit_transform(descriptions).toarray()
+# float32 throughout: float64 would double memory and bandwidth for no accuracy gain
+tfidf_embeddings = tfidf.fit_transform(descriptions).toarray().astype(np.float32)
 
 with open(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"), "wb") as f:
     pickle.dump(tfidf, f)
@@ -36,13 +41,13 @@ np.save(os.path.join(MODEL_DIR, "content_embeddings.npy"), content_embeddings)
 # -------------------
 # User embeddings (dummy random)
 # -------------------
-user_embeddings = {uid: np.random.rand(50) for uid in range(1, 4)}
+user_embeddings = {uid: np.random.rand(50).astype(np.float32) for uid in range(1, 4)}
 np.save(os.path.join(MODEL_DIR, "user_embeddings.npy"), user_embeddings)
 
 # -------------------
 # Item embeddings (dummy random)
 # -------------------
-item_embeddings = {item_id: np.random.rand(50) for item_id in item_ids}
+item_embeddings = {item_id: np.random.rand(50).astype(np.float32) for item_id in item_ids}
 np.save(os.path.join(MODEL_DIR, "item_embeddings.npy"), item_embeddings)
 
 # -------------------
@@ -59,11 +64,27 @@ with open(os.path.join(MODEL_DIR, "version.txt"), "w") as f:
     f.write("v1.0")
 
 # -------------------
-# Optional: FAISS index
+# Memory-mappable layout (manifest + raw .npy matrices) read by core.model_loader
 # -------------------
-dimension = tfidf_embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(tfidf_embeddings.astype('float32'))
-faiss.write_index(index, os.path.join(MODEL_DIR, "faiss.index"))
+write_embedding_artifacts(
+    MODEL_DIR, user_embeddings, item_embeddings, content_embeddings,
+    version="v1.0", dtype=settings.EMBEDDING_DTYPE,
+)
+
+# -------------------
+# User histories (dummy): CSR arrays of catalog rows, see scripts/build_user_history.py
+# -------------------
+user_histories = {1: [1], 2: [2, 3]}
+write_artifacts(
+    MODEL_DIR, history_from_dict(user_histories, np.array(sorted(item_ids), dtype=np.int64)),
+    built_from=HISTORY_SOURCES,
+)
+
+# -------------------
+# FAISS index over the content embeddings (cosine, keyed by item id)
+# -------------------
+artifacts = read_artifacts(MODEL_DIR, mmap=False)
+index = build_index(dequantized(artifacts, "content_matrix"), artifacts["item_ids"])
+save_index(index, MODEL_DIR)
 
 print("All model artifacts generated in 'models/' folder.")
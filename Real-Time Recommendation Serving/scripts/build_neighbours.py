@@ -0,0 +1,96 @@
+"""
+Precompute the top-N content neighbours of every item for /similar.
+
+Runs offline after update_embeddings (the catalog changes daily). Rows are
+scored in blocks, (block x dim) @ (dim x items), on a thread pool; numpy
+releases the GIL inside the matrix product and the partition, so blocks run
+on all cores. The result is stored in the artifact manifest as
+neighbour_rows (int32 catalog rows) and neighbour_scores (float16), which
+get_similar_items slices directly, together with the digest of the content
+matrix it was built from (a table for an older content matrix is ignored
+on load).
+
+Peak memory is the normalized float32 copy of the content matrix, the
+output (6 bytes per neighbour) and, per worker, a block x n_items float32
+score block plus the int64 partition of it: 12 bytes per score. The block
+size is derived from --memory-mb for that last part, e.g. 1M items, 8
+workers and 2048 MB give blocks of 21 rows.
+
+    python -m scripts.build_neighbours --top-n 50 --workers 8 --memory-mb 2048
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from core.config import settings
+from core.artifact_store import NEIGHBOUR_SOURCES, dequantized, read_artifacts, write_artifacts
+from utils.scoring_utils import normalize_rows, top_k_indices_2d
+
+# float32 score plus int64 argpartition index per (block row, item)
+BYTES_PER_SCORE = 12
+MAX_BLOCK_SIZE = 1024
+
+
+def _neighbour_block(vectors: np.ndarray, start: int, stop: int, top_n: int):
+    scores = vectors[start:stop] @ vectors.T
+    # An item is never its own neighbour.
+    scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    rows = top_k_indices_2d(scores, top_n)
+    return rows.astype(np.int32), np.take_along_axis(scores, rows, axis=1).astype(np.float16)
+
+
+def block_size_for(n_items: int, workers: int, memory_mb: float) -> int:
+    """
+    Rows per block so that `workers` concurrent score blocks fit in
+    memory_mb (at least 1, at most MAX_BLOCK_SIZE).
+    """
+    per_row = max(n_items, 1) * BYTES_PER_SCORE
+    return int(min(MAX_BLOCK_SIZE, max(1, memory_mb * 1e6 // (workers * per_row))))
+
+
+def compute_neighbours(content_matrix: np.ndarray, top_n: int, block_size: int = None, workers: int = None,
+                       memory_mb: float = 2048):
+    """
+    Top-N cosine neighbours for every row of content_matrix.
+    Returns (rows int32 (n, N), scores float16 (n, N)). Without
+    `block_size` it is derived from memory_mb (block_size_for).
+    """
+    vectors = normalize_rows(np.asarray(content_matrix, dtype=np.float32))
+    n = len(vectors)
+    top_n = min(top_n, max(n - 1, 0))
+    workers = workers or os.cpu_count()
+    block_size = block_size or block_size_for(n, workers, memory_mb)
+    rows = np.empty((n, top_n), dtype=np.int32)
+    scores = np.empty((n, top_n), dtype=np.float16)
+
+    def run(start):
+        stop = min(start + block_size, n)
+        rows[start:stop], scores[start:stop] = _neighbour_block(vectors, start, stop, top_n)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, range(0, n, block_size)))
+    return rows, scores
+
+
+def build_neighbours(model_dir: str, top_n: int, block_size: int = None, workers: int = None,
+                     memory_mb: float = 2048):
+    arrays = read_artifacts(model_dir)
+    start = time.perf_counter()
+    rows, scores = compute_neighbours(dequantized(arrays, "content_matrix"), top_n, block_size, workers, memory_mb)
+    write_artifacts(model_dir, {"neighbour_rows": rows, "neighbour_scores": scores}, built_from=NEIGHBOUR_SOURCES)
+    print(
+        f"Wrote top-{rows.shape[1]} neighbours for {rows.shape[0]} items "
+        f"({(rows.nbytes + scores.nbytes) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the /similar neighbour table")
+    parser.add_argument("--top-n", type=int, default=settings.NEIGHBOUR_TABLE_SIZE)
+    parser.add_argument("--block-size", type=int, default=None, help="Rows per block (default: from --memory-mb)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--memory-mb", type=float, default=2048,
+                        help="Budget for the score blocks of all workers together")
+    args = parser.parse_args()
+    build_neighbours(settings.MODEL_DIR, args.top_n, args.block_size, args.workers, args.memory_mb)
@@ -1,9 +1,27 @@
+"""
+Trending lists from incremental hourly rollups (DDL:
+Real-Time-Data-Processing/Sql/trending_rollups.sql).
 
-import pandas as pd
-from sqlalchemy import create_engine
-from core.config import settings
+Each run folds only the events_clean rows past the stored id watermark into
+item_views_hourly / category_views_hourly and advances the watermark, all in
+one transaction, so a failed run is simply retried. 1h / 24h / 7d lists are
+then summed from the rollups at hourly granularity: the current, partial
+hour bucket plus the hours-1 buckets before it, so a window never covers
+more than its name (1h spans the last 0-60 minutes).
+
+events_clean ids are assigned before commit, so a row can become visible
+after rows with higher ids. Each run re-reads the last TRENDING_ID_OVERLAP
+ids below the watermark and skips those already folded (rollup_seen_events),
+so a row committed late within that window is still counted, once.
+
+    python -m scripts.build_trending                # refresh, write trending.json (24h) + trending_windows.json
+    python -m scripts.build_trending --window 1h
+"""
+import argparse
 import json
 import os
+from sqlalchemy import create_engine, text
+from core.config import settings
 
 # Database connection
 DATABASE_URL = (
@@ -14,29 +32,187 @@ DATABASE_URL = (
 )
 engine = create_engine(DATABASE_URL)
 
-def compute_trending(top_n: int = 100) -> dict:
+JOB = "trending"
+WINDOWS = {"1h": 1, "24h": 24, "7d": 7 * 24}
+RETENTION_HOURS = WINDOWS["7d"] + 1
+
+VIEWS = """
+    FROM events_clean e
+    WHERE id > :after AND id <= :upto
+      AND NOT EXISTS (SELECT 1 FROM rollup_seen_events s WHERE s.job = :job AND s.event_id = e.id)
+      AND event_type = 'view'
+"""
+
+ROLLUP_ITEMS = f"""
+    INSERT INTO item_views_hourly (hour, item_id, views)
+    SELECT date_trunc('hour', event_timestamp), (metadata->>'item_id')::BIGINT, COUNT(*)
+    {VIEWS}
+      -- only ids that cast cleanly; a bad value must not fail the whole run
+      AND metadata->>'item_id' ~ '^[0-9]+$'
+    GROUP BY 1, 2
+    ON CONFLICT (hour, item_id) DO UPDATE SET views = item_views_hourly.views + EXCLUDED.views
+"""
+
+ROLLUP_CATEGORIES = f"""
+    INSERT INTO category_views_hourly (hour, category, views)
+    SELECT date_trunc('hour', event_timestamp), metadata->>'category', COUNT(*)
+    {VIEWS}
+      AND metadata->>'category' IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (hour, category) DO UPDATE SET views = category_views_hourly.views + EXCLUDED.views
+"""
+
+# Exclusive: `hours` buckets including the current one.
+WINDOW_START = "date_trunc('hour', NOW()) - make_interval(hours => :hours)"
+
+
+def refresh_rollups(overlap: int = None) -> dict:
+    """
+    Fold the events_clean rows not yet counted -- past the watermark, or
+    committed late within `overlap` ids below it -- into the hourly rollups
+    and drop buckets older than the longest window.
+    Returns {"after": lowest id re-read, "upto": new watermark}.
+    """
+    overlap = settings.TRENDING_ID_OVERLAP if overlap is None else overlap
+    # One snapshot for the whole run: a row committing between the rollup and
+    # the seen-id insert must not be marked seen without being counted. A run
+    # racing another one fails to serialize and is simply retried.
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        last, after = lock_watermark(conn, JOB, overlap)
+        upto = max(last, conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM events_clean")).scalar())
+        params = {"after": after, "upto": upto, "job": JOB}
+        conn.execute(text(ROLLUP_ITEMS), params)
+        conn.execute(text(ROLLUP_CATEGORIES), params)
+        advance_watermark(conn, JOB, after, upto, overlap)
+        for table in ("item_views_hourly", "category_views_hourly"):
+            conn.execute(
+                text(f"DELETE FROM {table} WHERE hour < NOW() - make_interval(hours => :hours)"),
+                {"hours": RETENTION_HOURS},
+            )
+    return {"after": after, "upto": upto}
+
+
+def lock_watermark(conn, job: str, overlap: int) -> tuple:
+    """
+    (watermark, lowest id to re-read) of `job`, with its rollup_watermarks
+    row locked until the transaction ends, so concurrent runs never double
+    count. A job without seen ids yet (first run, or a
+    watermark from before rollup_seen_events) re-reads nothing.
+    """
+    conn.execute(
+        text("INSERT INTO rollup_watermarks (job) VALUES (:job) ON CONFLICT (job) DO NOTHING"),
+        {"job": job},
+    )
+    last = conn.execute(
+        text("SELECT last_event_id FROM rollup_watermarks WHERE job = :job FOR UPDATE"),
+        {"job": job},
+    ).scalar()
+    has_seen = conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM rollup_seen_events WHERE job = :job)"), {"job": job}
+    ).scalar()
+    return last, max(last - overlap, 0) if has_seen else last
+
+
+def advance_watermark(conn, job: str, after: int, upto: int, overlap: int):
+    """
+    Move the watermark to `upto` and remember the ids of the next re-read
+    window (upto - overlap, upto] as seen, forgetting older ones.
+    """
+    conn.execute(
+        text("""
+            INSERT INTO rollup_seen_events (job, event_id)
+            SELECT :job, id FROM events_clean WHERE id > :low AND id <= :upto
+            ON CONFLICT DO NOTHING
+        """),
+        {"job": job, "low": max(after, upto - overlap), "upto": upto},
+    )
+    conn.execute(
+        text("DELETE FROM rollup_seen_events WHERE job = :job AND event_id <= :low"),
+        {"job": job, "low": upto - overlap},
+    )
+    conn.execute(
+        text("UPDATE rollup_watermarks SET last_event_id = :upto, updated_at = NOW() WHERE job = :job"),
+        {"upto": upto, "job": job},
+    )
+
+
+def trending_window(hours: int, top_n: int = 100) -> dict:
     """
-    Compute trending items based on recent events.
-    Returns a dict: {item_id: trending_score}
+    {item_id: views} of the top_n items over the last `hours` hour buckets.
     """
-    query = """
-        SELECT metadata->>'item_id' AS item_id, COUNT(*) AS views
-        FROM events_clean
-        WHERE event_type='view'
+    query = f"""
+        SELECT item_id, SUM(views) AS views
+        FROM item_views_hourly
+        WHERE hour > {WINDOW_START}
         GROUP BY item_id
         ORDER BY views DESC
         LIMIT :top_n
     """
-    df = pd.read_sql(query, engine, params={"top_n": top_n})
-    trending_scores = {int(row["item_id"]): int(row["views"]) for _, row in df.iterrows()}
-    return trending_scores
+    with engine.connect() as conn:
+        rows = conn.execute(text(query), {"hours": hours, "top_n": top_n}).fetchall()
+    return {int(item_id): int(views) for item_id, views in rows}
+
+
+def category_window(hours: int, top_n: int = 100) -> dict:
+    """
+    {category: views} of the top_n categories over the last `hours` hour buckets.
+    """
+    query = f"""
+        SELECT category, SUM(views) AS views
+        FROM category_views_hourly
+        WHERE hour > {WINDOW_START}
+        GROUP BY category
+        ORDER BY views DESC
+        LIMIT :top_n
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text(query), {"hours": hours, "top_n": top_n}).fetchall()
+    return {category: int(views) for category, views in rows}
+
+
+def compute_trending(top_n: int = 100, window: str = "24h") -> dict:
+    """
+    Refresh the rollups, then return {item_id: trending_score} for `window`.
+    """
+    refresh_rollups()
+    return trending_window(WINDOWS[window], top_n)
+
+
+def _write_json(name: str, payload: dict) -> str:
+    # Write then rename: the API never reads a half-written file.
+    path = os.path.join(settings.MODEL_DIR, name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
 
 def save_trending(trending_scores: dict):
-    path = os.path.join(settings.MODEL_DIR, "trending.json")
-    with open(path, "w") as f:
-        json.dump(trending_scores, f, indent=2)
+    path = _write_json("trending.json", trending_scores)
     print(f"Saved trending scores to {path}")
 
+
+def save_windows(top_n: int = 100):
+    """
+    Every window's item and category lists in trending_windows.json.
+    """
+    windows = {
+        name: {"items": trending_window(hours, top_n), "categories": category_window(hours, top_n)}
+        for name, hours in WINDOWS.items()
+    }
+    path = _write_json("trending_windows.json", windows)
+    print(f"Saved trending windows to {path}")
+
+
 if __name__ == "__main__":
-    trending_scores = compute_trending()
-    save_trending(trending_scores)
+    parser = argparse.ArgumentParser(description="Refresh trending rollups and write trending.json")
+    parser.add_argument("--window", choices=list(WINDOWS), default="24h",
+                        help="Window served as trending.json")
+    parser.add_argument("--top-n", type=int, default=100)
+    args = parser.parse_args()
+
+    marks = refresh_rollups()
+    print(f"Rolled up events_clean ids {marks['after']}..{marks['upto']}")
+    save_trending(trending_window(WINDOWS[args.window], args.top_n))
+    save_windows(args.top_n)
@@ -0,0 +1,87 @@
+"""
+User histories (the items each user has viewed or bought) as CSR artifacts
+in the manifest (core.artifact_store.HISTORY_ARRAYS). The API memory-maps
+them for content profiles and to keep seen items out of recommendations.
+
+Run after update_embeddings: histories are stored as catalog rows, so they
+must be rebuilt (or remapped, as write_content_matrix does) whenever the
+catalog changes. The manifest records the item_ids they were built for;
+the API ignores histories of another catalog.
+
+    python -m scripts.build_user_history                              # from events_clean
+    python -m scripts.build_user_history --event-types view,purchase --days 90
+    python -m scripts.build_user_history --from-json metadata.json    # legacy {user_id: [item_id, ...]}
+"""
+import argparse
+import json
+import time
+import numpy as np
+from sqlalchemy import text
+from core.config import settings
+from core.artifact_store import HISTORY_SOURCES, history_arrays, history_from_dict, read_artifacts, write_artifacts
+
+# Tracker events carry product_id; older rows item_id. Only ids that cast cleanly.
+ITEM_ID = "COALESCE(metadata->>'product_id', metadata->>'item_id')"
+
+INTERACTIONS = f"""
+    SELECT DISTINCT user_id::BIGINT, ({ITEM_ID})::BIGINT
+    FROM events_clean
+    WHERE event_type = ANY(:event_types)
+      AND event_timestamp >= NOW() - make_interval(days => :days)
+      AND user_id ~ '^[0-9]+$'
+      AND {ITEM_ID} ~ '^[0-9]+$'
+"""
+
+
+def fetch_interactions(event_types, days: int, chunk_size: int = 1_000_000):
+    """
+    Distinct (user_id, item_id) pairs of the last `days` days as two int64
+    arrays, streamed from the server in chunks.
+    """
+    from core.db import engine
+
+    users, items = [], []
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            text(INTERACTIONS), {"event_types": list(event_types), "days": days}
+        )
+        while True:
+            chunk = result.fetchmany(chunk_size)
+            if not chunk:
+                break
+            pairs = np.array(chunk, dtype=np.int64)
+            users.append(pairs[:, 0])
+            items.append(pairs[:, 1])
+    if not users:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(users), np.concatenate(items)
+
+
+def write_history(model_dir: str, history: dict):
+    write_artifacts(model_dir, history, built_from=HISTORY_SOURCES)
+    nbytes = sum(a.nbytes for a in history.values())
+    print(
+        f"Wrote histories of {len(history['history_user_ids'])} users, "
+        f"{len(history['history_rows'])} items ({nbytes / 1e6:.1f} MB) to {model_dir}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write user histories as CSR artifacts")
+    parser.add_argument("--model-dir", default=settings.MODEL_DIR)
+    parser.add_argument("--event-types", default="view,add_to_cart,purchase",
+                        help="Comma-separated event types that count as seen")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--from-json", help="{user_id: [item_id, ...]} file instead of events_clean")
+    args = parser.parse_args()
+
+    catalog = read_artifacts(args.model_dir)["item_ids"]
+    start = time.perf_counter()
+    if args.from_json:
+        with open(args.from_json) as f:
+            history = history_from_dict(json.load(f), catalog)
+    else:
+        users, items = fetch_interactions([t for t in args.event_types.split(",") if t], args.days)
+        history = history_arrays(users, items, catalog)
+    write_history(args.model_dir, history)
+    print(f"Built in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,134 @@
+"""
+Recall-vs-latency report for the FAISS index behind /similar.
+
+Every configuration is compared against exact brute-force cosine top-k
+(the same answer the "exact" SIMILAR_BACKEND returns) on a sample of
+query items. Use it to pick FAISS_INDEX_TYPE / FAISS_NLIST / FAISS_NPROBE /
+FAISS_HNSW_M / FAISS_HNSW_EF_SEARCH for a catalog size.
+
+    python -m scripts.faiss_benchmark                                # MODEL_DIR content matrix
+    python -m scripts.faiss_benchmark --synthetic 2000000 --dim 64   # clustered random vectors
+"""
+import argparse
+import json
+import time
+import numpy as np
+from core.config import settings
+from core.artifact_store import dequantized, read_artifacts
+from core.faiss_loader import apply_search_params, build_index
+from utils.scoring_utils import normalize_rows, top_k_indices_2d
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    Gaussian clusters, closer to real embeddings than uniform noise
+    (which makes every index look equally good or bad).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)]
+    vectors += 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int, block: int = 256) -> np.ndarray:
+    """
+    Brute-force cosine top-k rows for each query row, excluding the query itself.
+    """
+    out = []
+    for start in range(0, len(queries), block):
+        rows = queries[start:start + block]
+        top = top_k_indices_2d(vectors[rows] @ vectors.T, k + 1)
+        out.extend([r[r != q][:k] for q, r in zip(rows, top)])
+    return np.array(out)
+
+
+def measure(index, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, ids = index.search(vectors[q:q + 1], k + 1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = ids[0][(ids[0] != q) & (ids[0] >= 0)][:k]
+        hits += len(np.intersect1d(found, expected))
+    return {
+        f"recall_at_{k}": hits / float(truth.size),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "qps_single_thread": len(queries) / (sum(latencies) / 1000),
+    }
+
+
+def run(vectors: np.ndarray, k: int, n_queries: int, nlists, nprobes, hnsw_ms, ef_searches) -> dict:
+    vectors = normalize_rows(vectors)
+    ids = np.arange(len(vectors), dtype=np.int64)
+    rng = np.random.default_rng(1)
+    queries = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+
+    start = time.perf_counter()
+    truth = exact_neighbours(vectors, queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    results = []
+
+    def add(index_type, build_s, params, index):
+        row = {"index": index_type, "build_seconds": round(build_s, 3), **params}
+        row.update(measure(index, vectors, queries, truth, k))
+        results.append(row)
+        print(json.dumps(row))
+
+    start = time.perf_counter()
+    flat = build_index(vectors, ids, "flat")
+    add("flat", time.perf_counter() - start, {}, flat)
+
+    for nlist in nlists:
+        start = time.perf_counter()
+        index = build_index(vectors, ids, "ivf", nlist=nlist)
+        build_s = time.perf_counter() - start
+        for nprobe in nprobes:
+            add("ivf", build_s, {"nlist": nlist, "nprobe": nprobe}, apply_search_params(index, nprobe=nprobe))
+
+    for m in hnsw_ms:
+        start = time.perf_counter()
+        index = build_index(vectors, ids, "hnsw", hnsw_m=m)
+        build_s = time.perf_counter() - start
+        for ef in ef_searches:
+            add("hnsw", build_s, {"M": m, "ef_search": ef}, apply_search_params(index, ef_search=ef))
+
+    return {
+        "items": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "k": k,
+        "queries": int(len(queries)),
+        "exact_bruteforce_ms_per_query": exact_ms,
+        "results": results,
+    }
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS recall-vs-latency report for /similar")
+    parser.add_argument("--synthetic", type=int, help="Benchmark N synthetic items instead of MODEL_DIR")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nlist", type=_ints, default=[256, 1024, 4096])
+    parser.add_argument("--nprobe", type=_ints, default=[1, 8, 32, 128])
+    parser.add_argument("--hnsw-m", type=_ints, default=[16, 32])
+    parser.add_argument("--ef-search", type=_ints, default=[16, 64, 256])
+    parser.add_argument("--output", default="faiss_report.json")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+    else:
+        vectors = dequantized(read_artifacts(settings.MODEL_DIR), "content_matrix")
+
+    report = run(vectors, args.k, args.queries, args.nlist, args.nprobe, args.hnsw_m, args.ef_search)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote FAISS report to {args.output}")
@@ -0,0 +1,141 @@
+"""
+Accuracy-vs-speed report for quantized item/content matrices, and the
+tool that rewrites MODEL_DIR in the chosen storage dtype.
+
+For float16 and int8 (per-row scale) storage, top-k from the quantized
+scoring kernel (utils.scoring_utils.matrix_scores) is compared with
+float32 top-k on a sample of queries:
+    cf       user vectors against item_matrix (/recommend)
+    content  item content rows against content_matrix (/similar, content score)
+next to single-query (GEMV) and batched (GEMM) scoring time and the bytes
+each matrix takes. Use it to pick EMBEDDING_DTYPE for a catalog.
+
+    python -m scripts.quantize_embeddings                                # MODEL_DIR matrices
+    python -m scripts.quantize_embeddings --synthetic 1000000 --dim 64   # random vectors
+    python -m scripts.quantize_embeddings --write int8                   # convert MODEL_DIR
+"""
+import argparse
+import json
+import time
+import numpy as np
+from core.config import settings
+from core.artifact_store import (
+    NEIGHBOUR_ARRAYS, NEIGHBOUR_SOURCES, QUANTIZABLE_ARRAYS, dequantized, is_current, is_normalized, quantized,
+    read_artifacts, read_manifest, remove_artifacts, restamp_artifacts, write_artifacts
+)
+from scripts.faiss_benchmark import synthetic_vectors
+from utils.scoring_utils import (
+    EMBEDDING_DTYPES, dequantize_rows, matrix_scores, normalize_rows, quantize_rows, top_k_indices_2d
+)
+
+
+def _timed_ms(fn, repeat: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def measure(matrix: np.ndarray, queries: np.ndarray, dtype: str, k: int, batch: int, repeat: int) -> dict:
+    """
+    matrix (n, dim) float32, queries (q, dim) float32. Top-k overlap with
+    float32 scoring and per-query / per-batch latency for `dtype` storage.
+    """
+    stored, scale = quantize_rows(matrix, dtype)
+
+    truth = top_k_indices_2d((matrix @ queries.T).T, k)
+    found = top_k_indices_2d(matrix_scores(stored, queries.T, scale).T, k)
+    overlap = np.mean([len(np.intersect1d(f, t)) / k for f, t in zip(found, truth)])
+    max_error = float(np.abs(dequantize_rows(stored, scale) - matrix).max())
+
+    block = queries[:batch].T.copy()
+    return {
+        "dtype": dtype,
+        "bytes": int(stored.nbytes + (scale.nbytes if scale is not None else 0)),
+        f"overlap_at_{k}": float(overlap),
+        "max_abs_error": max_error,
+        "gemv_ms": _timed_ms(lambda: matrix_scores(stored, queries[0], scale), repeat),
+        f"gemm_{batch}_ms": _timed_ms(lambda: matrix_scores(stored, block, scale), repeat),
+    }
+
+
+def run(arrays: dict, k: int, n_queries: int, batch: int, repeat: int) -> dict:
+    rng = np.random.default_rng(1)
+    item_matrix = dequantized(arrays, "item_matrix")
+    content_matrix = normalize_rows(dequantized(arrays, "content_matrix"))
+    users = arrays["user_matrix"]
+    user_queries = np.asarray(users[rng.choice(len(users), size=min(n_queries, len(users)), replace=False)],
+                              dtype=np.float32)
+    item_queries = content_matrix[rng.choice(len(content_matrix), size=min(n_queries, len(content_matrix)),
+                                             replace=False)]
+
+    report = {
+        "items": int(item_matrix.shape[0]),
+        "dim": int(item_matrix.shape[1]),
+        "k": k,
+        "queries": int(len(user_queries)),
+    }
+    for name, matrix, queries in (("cf", item_matrix, user_queries), ("content", content_matrix, item_queries)):
+        report[name] = []
+        for dtype in EMBEDDING_DTYPES:
+            row = measure(matrix, queries, dtype, k, batch, repeat)
+            report[name].append(row)
+            print(json.dumps({"matrix": name, **row}))
+    return report
+
+
+def write(model_dir: str, dtype: str):
+    """
+    Rewrite the item/content matrices of model_dir as `dtype`. Workers pick
+    the new manifest up through the model watcher. Content rows stay (or
+    become) L2-normalized.
+    """
+    arrays = read_artifacts(model_dir, mmap=False)
+    manifest = read_manifest(model_dir)
+    # Same content, new storage: a neighbour table built for it stays valid.
+    neighbours_current = all(
+        name in manifest["arrays"] and is_current(manifest, name, NEIGHBOUR_SOURCES[name]) for name in NEIGHBOUR_ARRAYS
+    )
+    matrices = {name: dequantized(arrays, name) for name in QUANTIZABLE_ARRAYS}
+    if not is_normalized(model_dir, "content_matrix"):
+        matrices["content_matrix"] = normalize_rows(matrices["content_matrix"])
+    stored = quantized(matrices, dtype)
+    if dtype != "int8":
+        remove_artifacts(model_dir, [f"{name}_scale" for name in QUANTIZABLE_ARRAYS])
+    write_artifacts(model_dir, stored, normalized=("content_matrix",))
+    if neighbours_current:
+        restamp_artifacts(model_dir, NEIGHBOUR_SOURCES)
+    print(f"Rewrote {', '.join(QUANTIZABLE_ARRAYS)} in {model_dir} as {dtype}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized embedding accuracy/speed/memory report")
+    parser.add_argument("--synthetic", type=int, help="Benchmark N synthetic items instead of MODEL_DIR")
+    parser.add_argument("--users", type=int, default=10000, help="Synthetic users")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32, help="Queries per GEMM timing")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--write", choices=EMBEDDING_DTYPES,
+                        help="Rewrite MODEL_DIR item/content matrices in this dtype instead of reporting")
+    parser.add_argument("--output", default="quantization_report.json")
+    args = parser.parse_args()
+
+    if args.write:
+        write(settings.MODEL_DIR, args.write)
+    else:
+        if args.synthetic:
+            arrays = {
+                "user_matrix": synthetic_vectors(args.users, args.dim, seed=2),
+                "item_matrix": synthetic_vectors(args.synthetic, args.dim, seed=0),
+                "content_matrix": synthetic_vectors(args.synthetic, args.dim, seed=1),
+            }
+        else:
+            arrays = read_artifacts(settings.MODEL_DIR)
+
+        report = run(arrays, args.k, args.queries, args.batch, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote quantization report to {args.output}")
@@ -0,0 +1,100 @@
+"""
+Replay harness for the streaming trending engine (Services/trending_stream.py).
+
+Feeds a local JSON-lines event file (one events_clean-shaped object per
+line: event_type, event_timestamp, item_id or metadata.item_id) through
+StreamingTrending and compares its top-N with exact decayed scores computed
+from the same events. Reports recall@N, score error, ingest rate and sketch
+memory, so TRENDING_SKETCH_WIDTH / _DEPTH / TRENDING_HEAP_SIZE can be sized.
+
+    python -m scripts.replay_trending --events events.jsonl
+    python -m scripts.replay_trending --synthetic 1000000 --items 200000 --write-events events.jsonl
+"""
+import argparse
+import json
+import math
+import time
+import numpy as np
+from core.config import settings
+from services.trending_stream import StreamingTrending, file_event_batches, run_trending_stream
+
+
+def synthetic_events(n: int, items: int, span_seconds: float, zipf: float = 1.2, seed: int = 0):
+    """
+    n view events over `span_seconds` with Zipf-distributed item popularity,
+    whose head drifts half way through (so decay matters).
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.uniform(0, span_seconds, n)) + 1_700_000_000
+    ranks = np.minimum(rng.zipf(zipf, n), items) - 1
+    shift = np.where(np.arange(n) >= n // 2, items // 2, 0)
+    item_ids = (ranks + shift) % items + 1
+    for item_id, ts in zip(item_ids.tolist(), timestamps.tolist()):
+        yield {"event_type": "view", "event_timestamp": ts, "item_id": item_id}
+
+
+def exact_decayed(path: str, half_life: float, now: float) -> dict:
+    decay = math.log(2) / half_life
+    scores = {}
+    for item_ids, timestamps, weights in file_event_batches(path):
+        values = weights * np.exp(-decay * (now - timestamps))
+        for item_id, value in zip(item_ids.tolist(), values.tolist()):
+            scores[item_id] = scores.get(item_id, 0.0) + value
+    return scores
+
+
+def replay(path: str, top_n: int, half_life: float, width: int, depth: int, heap_size: int) -> dict:
+    engine = StreamingTrending(half_life, width, depth, heap_size)
+    published = []
+    start = time.perf_counter()
+    run_trending_stream(file_event_batches(path), engine, publish=published.append,
+                        publish_interval=0, top_n=top_n)
+    elapsed = time.perf_counter() - start
+
+    streamed = engine.top(top_n)
+    exact = exact_decayed(path, half_life, engine.now)
+    truth = sorted(exact, key=exact.get, reverse=True)[:top_n]
+    errors = [abs(streamed[i] - exact[i]) / exact[i] for i in streamed if exact.get(i)]
+    return {
+        "events": engine.events,
+        "events_per_second": engine.events / elapsed,
+        "publishes": len(published),
+        f"recall_at_{top_n}": len(set(streamed) & set(truth)) / max(len(truth), 1),
+        "mean_relative_error": float(np.mean(errors)) if errors else 0.0,
+        "max_relative_error": float(np.max(errors)) if errors else 0.0,
+        "sketch_bytes": engine.sketch.nbytes,
+        "config": {"half_life_seconds": half_life, "width": width, "depth": depth,
+                   "heap_size": heap_size, "top_n": top_n},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay events through the streaming trending engine")
+    parser.add_argument("--events", help="JSON-lines event file to replay")
+    parser.add_argument("--synthetic", type=int, help="Generate N synthetic view events instead")
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--span-seconds", type=float, default=6 * 3600)
+    parser.add_argument("--write-events", default="trending_events.jsonl",
+                        help="Where --synthetic writes its event file")
+    parser.add_argument("--top-n", type=int, default=settings.TRENDING_TOP_N)
+    parser.add_argument("--half-life", type=float, default=settings.TRENDING_HALF_LIFE_SECONDS)
+    parser.add_argument("--width", type=int, default=settings.TRENDING_SKETCH_WIDTH)
+    parser.add_argument("--depth", type=int, default=settings.TRENDING_SKETCH_DEPTH)
+    parser.add_argument("--heap-size", type=int, default=settings.TRENDING_HEAP_SIZE)
+    parser.add_argument("--output", default="trending_replay_report.json")
+    args = parser.parse_args()
+
+    path = args.events
+    if args.synthetic:
+        path = args.write_events
+        with open(path, "w") as f:
+            for event in synthetic_events(args.synthetic, args.items, args.span_seconds):
+                f.write(json.dumps(event) + "\n")
+    if not path:
+        parser.error("--events or --synthetic is required")
+
+    report = replay(path, args.top_n, args.half_life, args.width, args.depth, args.heap_size)
+    print(json.dumps(report, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.output}")
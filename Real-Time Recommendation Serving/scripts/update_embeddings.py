@@ -1,13 +1,23 @@
 """
 Rebuild user/item/content embeddings after Phase-3 model retraining.
 This script can be scheduled or triggered manually.
+
+    python -m scripts.update_embeddings            # rebuild content embeddings
+    python -m scripts.update_embeddings --convert  # pickled dicts -> mmap layout
 """
 import numpy as np
 import os
 import pickle
 from sklearn.feature_extraction.text import TfidfVectorizer
 from core.config import settings
+from core.artifact_store import (
+    HISTORY_SOURCES, NEIGHBOUR_ARRAYS, dequantized, has_manifest, quantized, read_artifacts, remove_artifacts,
+    to_matrix, write_artifacts, write_embedding_artifacts
+)
+from core.faiss_loader import build_index, save_index
+from utils.scoring_utils import normalize_rows
 import json
+import sys
 
 MODEL_DIR = settings.MODEL_DIR
 os.makedirs(MODEL_DIR, exist_ok=True)
@@ -21,7 +31,7 @@ def rebuild_content_embeddings(items: list):
     descriptions = [i["description"] for i in items]
 
     tfidf = TfidfVectorizer(max_features=50)
-    tfidf_embeddings = tfidf.fit_transform(descriptions).toarray()
+    tfidf_embeddings = tfidf.fit_transform(descriptions).toarray().astype(np.float32)
 
     # Save TF-IDF
     with open(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"), "wb") as f:
@@ -29,6 +39,8 @@ def rebuild_content_embeddings(items: list):
 
     content_embeddings = {item_id: emb for item_id, emb in zip(item_ids, tfidf_embeddings)}
     np.save(os.path.join(MODEL_DIR, "content_embeddings.npy"), content_embeddings)
+    if has_manifest(MODEL_DIR):
+        write_content_matrix(content_embeddings)
 
     metadata = {item["item_id"]: {"title": item["title"], "description": item["description"]} for item in items}
     with open(os.path.join(MODEL_DIR, "metadata.json"), "w") as f:
@@ -36,7 +48,73 @@ def rebuild_content_embeddings(items: list):
 
     print("Rebuilt content embeddings and metadata")
 
+def write_content_matrix(content_embeddings: dict):
+    """
+    Replace content_matrix in the mmap layout. The catalog becomes the union of
+    the existing item ids and the new content ids, so item_matrix and the
+    user histories are realigned (new items get zero CF vectors).
+    """
+    arrays = read_artifacts(MODEL_DIR, mmap=False)
+    old_ids = arrays["item_ids"]
+    catalog = np.union1d(old_ids, np.array(list(content_embeddings), dtype=np.int64))
+    _, content_matrix = to_matrix(content_embeddings, catalog)
+
+    item_matrix = np.zeros((len(catalog), arrays["item_matrix"].shape[1]), dtype=np.float32)
+    item_matrix[np.searchsorted(catalog, old_ids)] = dequantized(arrays, "item_matrix")
+
+    realigned = {
+        "item_ids": catalog,
+        "item_matrix": item_matrix,
+        "content_matrix": normalize_rows(content_matrix),
+    }
+    if "history_rows" in arrays:
+        # Histories are catalog rows; the catalog only grows, so per-user order holds.
+        realigned["history_rows"] = np.searchsorted(catalog, old_ids[arrays["history_rows"]]).astype(np.int32)
+    write_artifacts(
+        MODEL_DIR, quantized(realigned, settings.EMBEDDING_DTYPE), normalized=("content_matrix",),
+        built_from=HISTORY_SOURCES,
+    )
+    # The neighbour table describes the old content; rerun scripts.build_neighbours.
+    remove_artifacts(MODEL_DIR, NEIGHBOUR_ARRAYS)
+    rebuild_faiss_index()
+
+def rebuild_faiss_index():
+    """
+    Rebuild faiss.index from the current content_matrix (type from
+    settings.FAISS_INDEX_TYPE).
+    """
+    arrays = read_artifacts(MODEL_DIR)
+    save_index(build_index(dequantized(arrays, "content_matrix"), arrays["item_ids"]), MODEL_DIR)
+
+def convert_legacy_embeddings():
+    """
+    Write the pickled {id: vector} .npy dicts out in the mmap layout.
+    """
+    def load(name):
+        return np.load(os.path.join(MODEL_DIR, name), allow_pickle=True).item()
+
+    version = None
+    version_path = os.path.join(MODEL_DIR, "version.txt")
+    if os.path.exists(version_path):
+        with open(version_path) as f:
+            version = f.read().strip()
+
+    write_embedding_artifacts(
+        MODEL_DIR,
+        load("user_embeddings.npy"),
+        load("item_embeddings.npy"),
+        load("content_embeddings.npy"),
+        version=version,
+        dtype=settings.EMBEDDING_DTYPE,
+    )
+    rebuild_faiss_index()
+    print(f"Converted embeddings in {MODEL_DIR} to the mmap layout")
+
 if __name__ == "__main__":
+    if "--convert" in sys.argv:
+        convert_legacy_embeddings()
+        sys.exit(0)
+
     # Example usage
     items = [
         {"item_id": 1, "title": "Red Shoes", "description": "Comfortable running shoes"},
@@ -0,0 +1,34 @@
+import pytest
+import numpy as np
+from core.artifact_store import dequantized, read_artifacts, write_embedding_artifacts, memory_report
+
+def test_write_and_mmap_artifacts(tmp_path):
+    users = {2: np.ones(4), 1: np.zeros(4)}
+    items = {10: np.full(4, 0.5), 30: np.ones(4)}
+    content = {10: np.ones(3), 20: np.ones(3)}
+    write_embedding_artifacts(str(tmp_path), users, items, content, version="v-test")
+
+    arrays = read_artifacts(str(tmp_path))
+    assert isinstance(arrays["item_matrix"], np.memmap)
+    assert arrays["user_ids"].tolist() == [1, 2]
+    assert arrays["item_ids"].tolist() == [10, 20, 30]
+    assert arrays["item_matrix"].dtype == np.float32
+    assert arrays["content_matrix"].shape == (3, 3)
+    # item 20 has content but no CF vector
+    assert not arrays["item_matrix"][1].any()
+
+    report = memory_report(arrays)
+    assert report["mapped_bytes"] == sum(a.nbytes for a in arrays.values())
+    assert report["heap_bytes"] == 0
+
+def test_int8_artifacts_carry_row_scale(tmp_path):
+    items = {10: np.array([0.5, -1.0]), 20: np.array([2.0, 1.0])}
+    content = {10: np.array([3.0, 4.0])}
+    write_embedding_artifacts(str(tmp_path), {1: np.ones(2)}, items, content, dtype="int8")
+
+    arrays = read_artifacts(str(tmp_path))
+    assert arrays["item_matrix"].dtype == np.int8
+    assert arrays["item_matrix_scale"].shape == (2,)
+    assert arrays["user_matrix"].dtype == np.float32
+    assert np.allclose(dequantized(arrays, "item_matrix"), [[0.5, -1.0], [2.0, 1.0]], atol=0.02)
+    assert np.allclose(dequantized(arrays, "content_matrix")[0], [0.6, 0.8], atol=0.01)
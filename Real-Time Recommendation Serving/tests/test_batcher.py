@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+import numpy as np
+from core.batcher import MicroBatcher
+from core.model_loader import get_model_store, load_models
+from services.collaborative_filter import cf_score, cf_score_batch
+
+load_models()
+
+
+def test_micro_batcher_groups_concurrent_calls():
+    sizes = []
+
+    def double_all(items):
+        sizes.append(len(items))
+        return [2 * i for i in items]
+
+    async def run():
+        batcher = MicroBatcher(double_all, max_batch=8, max_wait_us=50_000, max_concurrent=1)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10))), batcher
+
+    results, batcher = asyncio.run(run())
+    assert results == [2 * i for i in range(10)]
+    # All ten arrive in one loop iteration: a full batch, then the remainder.
+    assert sizes == [8, 2]
+    assert batcher.stats()["batches"] == len(sizes)
+
+
+def test_micro_batcher_propagates_errors():
+    def fail(items):
+        raise ValueError("boom")
+
+    async def run():
+        return await MicroBatcher(fail).submit(1)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_cf_score_batch_matches_single():
+    store = get_model_store()
+    requests = [(1, None, store), (9999, None, store), (2, 1, store)]
+    batched = cf_score_batch(requests)
+    for (user_id, top_k, _), (rows, scores) in zip(requests, batched):
+        expected_rows, expected_scores = cf_score(user_id, top_k, store)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(scores, expected_scores)
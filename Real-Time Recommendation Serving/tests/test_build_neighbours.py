@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+import json
+from core.artifact_store import write_embedding_artifacts
+from core.model_loader import build_snapshot
+from scripts.build_neighbours import block_size_for, build_neighbours, compute_neighbours
+from utils.scoring_utils import normalize_rows
+
+def test_compute_neighbours_matches_exact():
+    rng = np.random.default_rng(0)
+    content = rng.random((40, 6)).astype(np.float32)
+    rows, scores = compute_neighbours(content, top_n=5, block_size=7, workers=2)
+    assert rows.dtype == np.int32 and scores.dtype == np.float16
+    assert rows.shape == (40, 5)
+
+    normed = normalize_rows(content)
+    sims = normed @ normed.T
+    np.fill_diagonal(sims, -np.inf)
+    expected = np.argsort(-sims, axis=1)[:, :5]
+    assert (rows == expected).all()
+    assert not (rows == np.arange(40)[:, None]).any()
+
+def test_compute_neighbours_small_catalog():
+    rows, _ = compute_neighbours(np.eye(3, dtype=np.float32), top_n=50)
+    assert rows.shape == (3, 2)
+
+def test_block_size_follows_memory_budget():
+    assert block_size_for(1_000_000, workers=8, memory_mb=2048) == 21
+    assert block_size_for(10_000_000, workers=64, memory_mb=100) == 1
+    assert block_size_for(100, workers=1, memory_mb=2048) == 1024
+    rows, _ = compute_neighbours(np.eye(30, dtype=np.float32), top_n=3, workers=2, memory_mb=30 * 12 * 2 * 4 / 1e6)
+    assert rows.shape == (30, 3)
+
+def test_neighbours_of_replaced_content_matrix_are_ignored(tmp_path):
+    rng = np.random.default_rng(0)
+    items = {i: rng.standard_normal(4) for i in range(20)}
+    write_embedding_artifacts(str(tmp_path), {1: np.ones(4)}, items, items)
+    (tmp_path / "metadata.json").write_text(json.dumps({}))
+    (tmp_path / "trending.json").write_text(json.dumps({}))
+    build_neighbours(str(tmp_path), top_n=5)
+    assert build_snapshot(str(tmp_path))["neighbour_rows"] is not None
+
+    # Same catalog size, new content: the table must not be served.
+    content = {i: rng.standard_normal(4) for i in range(20)}
+    write_embedding_artifacts(str(tmp_path), {1: np.ones(4)}, items, content)
+    assert build_snapshot(str(tmp_path))["neighbour_rows"] is None
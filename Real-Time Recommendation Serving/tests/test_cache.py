@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+import core.cache as cache
+from core.config import settings
+from core.model_loader import get_model_store, load_models
+
+load_models()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+class FakeAsyncRedis:
+    def __init__(self, sync):
+        self.sync = sync
+
+    async def get(self, key):
+        return self.sync.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.sync.set(key, value, ex=ex)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "get_redis_client", lambda: fake)
+    monkeypatch.setattr(cache, "get_async_redis_client", lambda: FakeAsyncRedis(fake))
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "_redis_down_until", 0.0)
+    return fake
+
+
+def test_read_through_hits_after_first_call(fake_redis):
+    calls = []
+
+    @cache.read_through("test_endpoint", ttl=10)
+    def compute(item_id: int, top_k: int = 10, store=None):
+        calls.append(item_id)
+        return [item_id, top_k]
+
+    assert compute(5) == [5, 10]
+    assert compute(5, top_k=10) == [5, 10]
+    assert calls == [5]
+    stats = cache.cache_stats()["test_endpoint"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_keys_are_namespaced_by_model_version(fake_redis):
+    @cache.read_through("versioned", ttl=10)
+    def compute(item_id: int):
+        return item_id
+
+    compute(1)
+    namespace = get_model_store()["cache_namespace"]
+    assert list(fake_redis.data) == [f"reco:{namespace}:versioned:item_id=1"]
+
+
+def test_local_tier_answers_before_redis(fake_redis):
+    calls = []
+
+    @cache.local_tier("local_endpoint", maxsize=10, ttl=60)
+    @cache.read_through("local_endpoint", ttl=10)
+    def compute(item_id: int, store=None):
+        calls.append(item_id)
+        return [item_id]
+
+    compute(3)
+    fake_redis.data.clear()
+    assert compute(3) == [3]
+    assert calls == [3]
+    assert cache.cache_stats()["local_endpoint"]["local_hits"] == 1
+
+
+def test_local_tier_dropped_on_new_model_version(fake_redis):
+    @cache.local_tier("swap_endpoint", maxsize=10, ttl=60)
+    def compute(item_id: int, store=None):
+        return store["cache_namespace"]
+
+    old = dict(get_model_store())
+    new = dict(old, cache_namespace="next-version")
+    assert compute(1, store=old) == old["cache_namespace"]
+    assert compute(1, store=new) == "next-version"
+    assert len(compute.local_cache) == 1
+
+
+def test_cached_call_shares_tiers_with_sync_path(fake_redis):
+    calls = []
+
+    @cache.local_tier("async_endpoint", maxsize=10, ttl=60)
+    @cache.read_through("async_endpoint", ttl=10)
+    def compute(item_id: int, store=None):
+        calls.append(item_id)
+        return [item_id]
+
+    assert asyncio.run(cache.cached_call(compute, 4)) == [4]
+    assert compute(4) == [4]
+    compute.local_cache.clear()
+    assert asyncio.run(cache.cached_call(compute, 4)) == [4]
+    assert calls == [4]
+    stats = cache.cache_stats()["async_endpoint"]
+    assert stats["misses"] == 1 and stats["local_hits"] == 1 and stats["hits"] == 1
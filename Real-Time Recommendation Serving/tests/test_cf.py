@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from services.collaborative_filter import cf_score
 from core.model_loader import load_models
 
@@ -6,10 +7,16 @@ load_models()
 
 def test_cf_score_exists():
     user_id = 1
-    scores = cf_score(user_id)
-    assert isinstance(scores, dict)
+    rows, scores = cf_score(user_id)
+    assert isinstance(rows, np.ndarray)
+    assert len(rows) == len(scores)
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_cf_score_limits_candidates():
+    rows, _ = cf_score(1, top_k=1)
+    assert len(rows) == 1
 
 def test_cf_score_empty_for_unknown_user():
     user_id = 9999
-    scores = cf_score(user_id)
-    assert scores == {}
+    rows, scores = cf_score(user_id)
+    assert len(rows) == 0 and len(scores) == 0
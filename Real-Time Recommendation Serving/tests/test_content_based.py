@@ -1,6 +1,9 @@
 import pytest
-from services.content_based import get_similar_items, content_score
-from core.model_loader import load_models
+import numpy as np
+from services.content_based import get_similar_items, content_score, user_profile
+from core.local_cache import LRUCache
+from core.artifact_store import history_from_dict
+from core.model_loader import build_history_index, load_models
 
 load_models()
 
@@ -13,10 +16,27 @@ def test_get_similar_items():
 
 def test_content_score_known_user():
     user_id = 1
-    scores = content_score(user_id)
-    assert isinstance(scores, dict)
+    rows, scores = content_score(user_id)
+    assert isinstance(rows, np.ndarray)
+    assert len(rows) == len(scores)
 
 def test_content_score_unknown_user():
     user_id = 9999
-    scores = content_score(user_id)
-    assert scores == {}
+    rows, scores = content_score(user_id)
+    assert len(rows) == 0
+
+def test_user_profile_cached_per_snapshot():
+    item_ids = np.array([10, 20, 30])
+    store = {
+        "item_ids": item_ids,
+        "content_matrix": np.eye(3, dtype=np.float32),
+        "user_history": build_history_index(history_from_dict({"5": [10, 20, 99]}, item_ids), 3),
+        "profile_cache": LRUCache(10),
+    }
+    profile = user_profile(5, store)
+    assert np.linalg.norm(profile) == pytest.approx(1.0)
+    assert user_profile(5, store) is profile
+    assert user_profile(6, store) is None
+    assert len(store["profile_cache"]) == 2
+    rows, _ = content_score(5, top_k=2, store=store)
+    assert set(rows.tolist()) == {0, 1}
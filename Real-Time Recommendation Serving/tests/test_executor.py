@@ -0,0 +1,31 @@
+import asyncio
+import threading
+import pytest
+import core.executor as executor
+from core.config import settings
+
+
+def test_run_compute_returns_result():
+    assert asyncio.run(executor.run_compute(sum, [1, 2, 3])) == 6
+    assert executor.compute_stats()["in_flight"] == 0
+
+
+def test_run_compute_rejects_past_queue_bound(monkeypatch):
+    monkeypatch.setattr(settings, "COMPUTE_QUEUE_SIZE", 0)
+    release = threading.Event()
+
+    async def saturate():
+        busy = [
+            asyncio.ensure_future(executor.run_compute(release.wait))
+            for _ in range(settings.COMPUTE_WORKERS)
+        ]
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(executor.ComputeQueueFull):
+                await executor.run_compute(sum, [1])
+        finally:
+            release.set()
+            await asyncio.gather(*busy)
+
+    asyncio.run(saturate())
+    assert executor.compute_stats()["in_flight"] == 0
@@ -0,0 +1,20 @@
+import pytest
+import numpy as np
+from core.faiss_loader import build_index, search
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_build_index_returns_item_ids(index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((50, 8)).astype(np.float32)
+    ids = np.arange(100, 150, dtype=np.int64)
+    index = build_index(vectors, ids, index_type, nlist=4)
+    found, scores = search(vectors[3], top_k=5, index=index)
+    assert found[0] == 103
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert all(100 <= i < 150 for i in found)
+
+def test_search_drops_empty_slots():
+    vectors = np.eye(3, dtype=np.float32)
+    index = build_index(vectors, np.array([7, 8, 9]), "flat")
+    found, _ = search(vectors[0], top_k=10, index=index)
+    assert sorted(found) == [7, 8, 9]
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+GUNICORN_CONF = Path(__file__).resolve().parents[1] / "Docker" / "gunicorn.conf.py"
+
+# What gunicorn does with preload_app: read the config, then import the app in the master.
+BOOT = f"""
+import runpy
+runpy.run_path({str(GUNICORN_CONF)!r})
+import api.main
+"""
+
+# Then the master's when_ready preload, and the series /metrics would aggregate.
+PRELOAD = f"""
+import logging, runpy, types
+config = runpy.run_path({str(GUNICORN_CONF)!r})
+import api.main
+config["when_ready"](types.SimpleNamespace(log=logging.getLogger("gunicorn")))
+from prometheus_client import CollectorRegistry, multiprocess
+registry = CollectorRegistry()
+multiprocess.MultiProcessCollector(registry)
+print(sorted({{family.name for family in registry.collect() if family.samples}}))
+"""
+
+
+def _boot(metrics_dir, script=BOOT):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir), PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=120)
+
+
+def test_preloaded_app_boots_without_metrics_dir(tmp_path):
+    metrics_dir = tmp_path / "prometheus"
+    result = _boot(metrics_dir)
+    assert result.returncode == 0, result.stderr
+    assert any(metrics_dir.glob("*.db"))
+
+
+def test_config_clears_samples_of_previous_run(tmp_path):
+    metrics_dir = tmp_path / "prometheus"
+    metrics_dir.mkdir()
+    (metrics_dir / "gauge_liveall_12345.db").write_bytes(b"stale")
+    result = _boot(metrics_dir)
+    assert result.returncode == 0, result.stderr
+    assert not (metrics_dir / "gauge_liveall_12345.db").exists()
+
+
+def test_master_preload_publishes_no_model_series(tmp_path):
+    result = _boot(tmp_path / "prometheus", PRELOAD)
+    assert result.returncode == 0, result.stderr
+    families = result.stdout.strip().splitlines()[-1]
+    assert "reco_model_info" not in families
+    assert "reco_model_load_seconds" not in families
+    assert "reco_worker_rss_bytes" not in families
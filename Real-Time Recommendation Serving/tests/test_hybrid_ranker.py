@@ -1,13 +1,36 @@
 import pytest
+import numpy as np
 from services.hybrid_ranker import rank_scores
 
 def test_rank_scores_basic():
-    cf = {1: 0.5, 2: 0.3}
-    cb = {2: 0.4, 3: 0.6}
-    tr = {1: 0.2, 3: 0.3}
-    result = rank_scores(cf, cb, tr)
-    assert isinstance(result, dict)
-    assert set(result.keys()) == {1,2,3}
+    cf = (np.array([1, 2]), np.array([0.5, 0.3]))
+    cb = (np.array([2, 3]), np.array([0.4, 0.6]))
+    tr = (np.array([1, 3]), np.array([0.2, 0.3]))
+    rows, scores = rank_scores(cf, cb, tr)
+    assert isinstance(rows, np.ndarray)
+    assert rows.tolist() == [1, 2, 3]
     # Check weighted sum
-    assert result[1] == 0.5*0.55 + 0.2*0.1
-    assert result[2] == 0.3*0.55 + 0.4*0.35
+    assert scores[0] == pytest.approx(0.5*0.55 + 0.2*0.1)
+    assert scores[1] == pytest.approx(0.3*0.55 + 0.4*0.35)
+
+def test_rank_scores_empty_sources():
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    rows, scores = rank_scores(empty, empty, (np.array([4]), np.array([1.0])))
+    assert rows.tolist() == [4]
+    assert scores[0] == pytest.approx(0.1)
+
+def test_rank_scores_boost_reaches_every_candidate():
+    cf = (np.array([0, 2]), np.array([0.5, 0.3]))
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    boost = np.array([0.0, 1.0, 2.0], dtype=np.float32)
+    rows, scores = rank_scores(cf, empty, (np.array([1]), np.array([1.0])), boost=boost)
+    assert rows.tolist() == [0, 1, 2]
+    assert scores[2] == pytest.approx(0.3*0.55 + 2.0*0.1)
+
+def test_rank_scores_excludes_seen_rows():
+    cf = (np.array([1, 2]), np.array([0.5, 0.3]))
+    cb = (np.array([2, 3]), np.array([0.4, 0.6]))
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    rows, scores = rank_scores(cf, cb, empty, exclude=np.array([2, 5], dtype=np.int32))
+    assert rows.tolist() == [1, 3]
+    assert scores[1] == pytest.approx(0.6*0.35)
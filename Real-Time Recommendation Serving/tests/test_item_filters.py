@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import core.model_loader as model_loader
+from api.main import app
+from core.item_filters import allowed_mask, build_filter_index, category_rows, empty_attributes
+from core.model_loader import get_model_store, load_models, publish_filters
+from services.item_filter_refresh import merge_attributes, run_filter_refresh
+
+load_models()
+client = TestClient(app)
+
+
+@pytest.fixture
+def live_filters():
+    """
+    Publish filters into the live snapshot; dropped again afterwards.
+    """
+    yield publish_filters
+    model_loader._live_filters = None
+    load_models()
+
+
+def test_merge_attributes_upserts_changed_rows():
+    first = merge_attributes(empty_attributes(), [30, 10], ["shoes", None], [True, True], [False, False], "v1")
+    second = merge_attributes(first, [10, 20, 10], ["hats", "shoes", "bags"], [True, False, True],
+                              [False, False, True], "v2")
+    assert second["item_ids"].tolist() == [10, 20, 30]
+    assert second["categories"] == ("shoes", "bags")
+    # The last row of a repeated id wins.
+    assert second["category"].tolist() == [1, 0, 0]
+    assert second["blocked"].tolist() == [True, False, False]
+    assert second["in_stock"].tolist() == [True, False, True]
+    assert second["version"] == "v2"
+
+
+def test_filter_index_combines_rules():
+    attributes = merge_attributes(
+        empty_attributes(), [1, 2, 3, 4, 99], ["a", "a", "b", "a", "a"],
+        [True, False, True, True, True], [False, False, False, True, False], "v1",
+    )
+    catalog = np.array([1, 2, 3, 4, 5], dtype=np.int64)
+    filters = build_filter_index(attributes, catalog)
+    assert filters["excluded"].tolist() == [False, True, False, True, False]
+    assert filters["excluded_rows"].tolist() == [1, 3]
+    assert category_rows(filters, "a").tolist() == [0]
+    assert category_rows(filters, "b").tolist() == [2]
+    assert len(category_rows(filters, "unknown")) == 0
+    rows = np.array([4, 3, 2, 0])
+    assert allowed_mask(filters, rows).tolist() == [True, False, True, True]
+    assert allowed_mask(filters, rows, "a").tolist() == [False, False, False, True]
+    assert not allowed_mask(None, rows, "a").any()
+
+
+def test_publish_changes_namespace_and_survives_reload(live_filters):
+    namespace = get_model_store()["cache_namespace"]
+    run_filter_refresh([([1], ["shoes"], [True], [False], "v1")], publish=live_filters)
+    assert get_model_store()["cache_namespace"] != namespace
+    assert get_model_store()["item_filters"]["version"] == "v1"
+    load_models()
+    assert get_model_store()["item_filters"]["version"] == "v1"
+
+
+def test_category_requires_filters():
+    assert client.get("/recommend/1?category=shoes").status_code == 503
+    assert client.post("/recommend/batch", json={"user_ids": [1], "category": "shoes"}).status_code == 503
+    assert client.get("/similar/1?category=shoes").status_code == 503
+
+
+def test_endpoints_apply_filters(live_filters):
+    item_ids = get_model_store()["item_ids"].tolist()
+    blocked, *rest = item_ids
+    live_filters(merge_attributes(
+        empty_attributes(), item_ids, [None] + ["shoes"] * len(rest),
+        [True] * len(item_ids), [True] + [False] * len(rest), "v1",
+    ))
+
+    for user_id in (1, 9999):
+        recs = client.get(f"/recommend/{user_id}?top_k=10").json()["recommendations"]
+        assert blocked not in recs
+        in_category = client.get(f"/recommend/{user_id}?top_k=10&category=shoes").json()["recommendations"]
+        assert set(in_category) <= set(rest)
+        assert client.get(f"/recommend/{user_id}?top_k=10&category=hats").json()["recommendations"] == []
+
+    batch = client.post("/recommend/batch", json={"user_ids": [1, 9999], "top_k": 10, "category": "shoes"})
+    for line in map(json.loads, batch.text.splitlines()):
+        single = client.get(f"/recommend/{line['user_id']}?top_k=10&category=shoes").json()["recommendations"]
+        assert line["recommendations"] == single
+
+    similar = client.get(f"/similar/{rest[0]}?top_k=10&category=shoes").json()["similar_items"]
+    assert set(similar) <= set(rest) - {rest[0]}
+    assert blocked not in client.get(f"/similar/{rest[0]}?top_k=10").json()["similar_items"]
@@ -0,0 +1,27 @@
+import pytest
+from core.local_cache import LRUCache, MISSING
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_caches_none():
+    cache = LRUCache(1)
+    cache.put("a", None)
+    assert cache.get("a") is None
+
+def test_lru_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("core.local_cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(10, ttl=5)
+    cache.put("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is MISSING
@@ -1,14 +1,90 @@
 import pytest
-from core.model_loader import load_models, model_store
+import numpy as np
+import json
+from core.artifact_store import (
+    HISTORY_SOURCES, history_arrays, history_from_dict, read_artifacts, write_artifacts, write_embedding_artifacts
+)
+from core.model_loader import (
+    build_history_index, build_snapshot, get_model_store, load_models, row_of, rows_of, seen_rows
+)
+from services.collaborative_filter import cf_score
 
 def test_load_models():
     load_models()
-    assert "user_embeddings" in model_store
-    assert isinstance(model_store["user_embeddings"], dict)
-    assert "item_embeddings" in model_store
-    assert isinstance(model_store["item_embeddings"], dict)
-    assert "content_embeddings" in model_store
-    assert isinstance(model_store["content_embeddings"], dict)
+    model_store = get_model_store()
+    assert "user_matrix" in model_store
+    assert model_store["user_matrix"].dtype == np.float32
+    assert len(model_store["user_ids"]) == model_store["user_matrix"].shape[0]
+    assert "item_matrix" in model_store
+    assert model_store["item_matrix"].dtype == np.float32
+    assert len(model_store["item_ids"]) == model_store["item_matrix"].shape[0]
+    assert "content_matrix" in model_store
+    assert model_store["content_matrix"].shape[0] == len(model_store["item_ids"])
     assert "user_history" in model_store
-    assert isinstance(model_store["user_history"], dict)
-    assert "trending_scores" in model_store
+    assert model_store["user_history"]["offsets"][-1] == len(model_store["user_history"]["rows"])
+    assert "trending" in model_store
+
+def test_reload_swaps_whole_snapshot():
+    before = get_model_store()
+    version = load_models()
+    after = get_model_store()
+    assert after is not before
+    assert after["version"] == version
+    # The old snapshot is left intact for requests still holding it
+    assert before["item_matrix"].shape[0] == len(before["item_ids"])
+    with pytest.raises(TypeError):
+        after["version"] = "mutated"
+
+def test_row_lookup():
+    ids = np.array([3, 7, 11], dtype=np.int64)
+    assert row_of(ids, 7) == 1
+    assert row_of(ids, 8) == -1
+    assert rows_of(ids, [11, 2, 3]).tolist() == [2, -1, 0]
+
+def test_int8_snapshot_scores_like_float32(tmp_path):
+    rng = np.random.default_rng(0)
+    users = {u: rng.standard_normal(8) for u in range(5)}
+    items = {i: rng.standard_normal(8) for i in range(100, 140)}
+    rankings = {}
+    for dtype in ("float32", "int8"):
+        model_dir = tmp_path / dtype
+        write_embedding_artifacts(str(model_dir), users, items, items, dtype=dtype)
+        (model_dir / "metadata.json").write_text(json.dumps({}))
+        (model_dir / "trending.json").write_text(json.dumps({}))
+        snapshot = build_snapshot(str(model_dir))
+        assert (snapshot["item_matrix_scale"] is None) == (dtype == "float32")
+        rankings[dtype] = cf_score(3, top_k=5, store=snapshot)[0].tolist()
+    assert rankings["int8"] == rankings["float32"]
+
+def test_history_csr_roundtrip(tmp_path):
+    catalog = np.array([10, 20, 30, 40], dtype=np.int64)
+    history = history_from_dict({"7": [30, 10, 30, 99], "3": [40]}, catalog)
+    assert history["history_user_ids"].tolist() == [3, 7]
+    assert history["history_offsets"].tolist() == [0, 1, 3]
+    assert history["history_rows"].dtype == np.int32
+    assert history["history_rows"].tolist() == [3, 0, 2]
+
+    write_artifacts(str(tmp_path), history)
+    index = build_history_index(read_artifacts(str(tmp_path)), len(catalog))
+    assert isinstance(index["rows"], np.memmap)
+    assert seen_rows(index, 7).tolist() == [0, 2]
+    assert seen_rows(index, 5).tolist() == []
+
+def test_history_for_other_catalog_is_ignored():
+    history = history_arrays([1, 1], [10, 40], np.array([10, 20, 30, 40], dtype=np.int64))
+    assert len(build_history_index(history, 2)["user_ids"]) == 0
+
+def test_history_of_reordered_catalog_is_dropped(tmp_path):
+    rng = np.random.default_rng(0)
+    items = {i: rng.standard_normal(4) for i in (10, 20, 30, 40)}
+    write_embedding_artifacts(str(tmp_path), {7: np.ones(4)}, items, items)
+    (tmp_path / "metadata.json").write_text(json.dumps({}))
+    (tmp_path / "trending.json").write_text(json.dumps({}))
+    catalog = read_artifacts(str(tmp_path))["item_ids"]
+    write_artifacts(str(tmp_path), history_from_dict({"7": [30]}, catalog), built_from=HISTORY_SOURCES)
+    assert seen_rows(build_snapshot(str(tmp_path))["user_history"], 7).tolist() == [2]
+
+    # Same size, other items: row 2 is no longer item 30.
+    items = {i: rng.standard_normal(4) for i in (10, 20, 25, 30)}
+    write_embedding_artifacts(str(tmp_path), {7: np.ones(4)}, items, items)
+    assert len(build_snapshot(str(tmp_path))["user_history"]["user_ids"]) == 0
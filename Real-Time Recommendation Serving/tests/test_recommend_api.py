@@ -1,7 +1,11 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from api.main import app
+from core.model_loader import load_models
 
+# The app loads artifacts in its lifespan; the module-level client does not run it.
+load_models()
 client = TestClient(app)
 
 def test_root():
@@ -14,6 +18,15 @@ def test_health():
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
+def test_ready_after_startup():
+    with TestClient(app) as started:
+        response = started.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["model_version"] is not None
+    assert {"imports", "background_threads"} <= set(body["phases"])
+
 def test_recommend_endpoint():
     user_id = 1
     response = client.get(f"/recommend/{user_id}?top_k=5")
@@ -33,3 +46,75 @@ def test_trending_endpoint():
     assert response.status_code == 200
     assert "trending" in response.json()
     assert len(response.json()["trending"]) <= 5
+
+def test_recommend_batch_endpoint():
+    response = client.post("/recommend/batch", json={"user_ids": [1, 2, 9999], "top_k": 2})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["user_id"] for line in lines] == [1, 2, 9999]
+    assert all(len(line["recommendations"]) <= 2 for line in lines)
+
+def test_batch_matches_single_requests(monkeypatch):
+    from core.config import settings
+    monkeypatch.setattr(settings, "BATCH_BLOCK_SIZE", 2)
+    user_ids = [1, 2, 9999, 3]
+    response = client.post("/recommend/batch", json={"user_ids": user_ids, "top_k": 3})
+    batch = {line["user_id"]: line["recommendations"] for line in map(json.loads, response.text.splitlines())}
+    for user_id in user_ids:
+        assert batch[user_id] == client.get(f"/recommend/{user_id}?top_k=3").json()["recommendations"]
+
+def test_batch_reports_users_left_when_overloaded(monkeypatch):
+    import routers.recommend as recommend
+    from core.config import settings
+    from core.executor import ComputeQueueFull
+    monkeypatch.setattr(settings, "BATCH_BLOCK_SIZE", 1)
+    calls = []
+    real_run_compute = recommend.run_compute
+
+    async def run_compute(fn, *args):
+        calls.append(fn)
+        if len(calls) > 2:
+            raise ComputeQueueFull("full")
+        return await real_run_compute(fn, *args)
+
+    monkeypatch.setattr(recommend, "run_compute", run_compute)
+    response = client.post("/recommend/batch", json={"user_ids": [1, 2, 3, 4], "top_k": 2})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["user_id"] for line in lines[:-1]] == [1, 2]
+    assert lines[-1] == {"error": "overloaded", "remaining_user_ids": [3, 4]}
+
+def test_seen_items_not_recommended():
+    from core.model_loader import get_model_store, seen_rows
+    store = get_model_store()
+    seen = set(store["item_ids"][seen_rows(store["user_history"], 2)].tolist())
+    assert seen
+    single = client.get("/recommend/2?top_k=10").json()["recommendations"]
+    batch = json.loads(client.post("/recommend/batch", json={"user_ids": [2], "top_k": 10}).text.splitlines()[0])
+    assert not seen & set(single)
+    assert not seen & set(batch["recommendations"])
+
+def test_full_compute_queue_returns_503(monkeypatch):
+    import core.executor as executor
+    monkeypatch.setattr(executor, "_in_flight", 10**6)
+    response = client.get("/recommend/1?top_k=5")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+def test_session_endpoint_without_model():
+    from core.model_loader import get_model_store
+    if get_model_store()["session_model"] is not None:
+        pytest.skip("session model present")
+    response = client.post("/recommend/session", json={"item_ids": [1, 2], "top_k": 3})
+    assert response.status_code == 503
+
+def test_metrics_endpoint():
+    client.get("/recommend/1?top_k=5")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'reco_stage_seconds_count{stage="rank_scores"}' in body
+    assert 'route="/recommend/{user_id}"' in body
+    assert "reco_model_info{" in body
+    assert "reco_worker_rss_bytes" in body
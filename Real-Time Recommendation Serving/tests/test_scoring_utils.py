@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+import utils.scoring_utils as scoring_utils
+from utils.scoring_utils import (
+    dequantize_rows, matrix_scores, matrix_top_k, quantize_rows, top_k_indices
+)
+
+def test_top_k_indices_sorted():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k_indices(scores, 2).tolist() == [1, 3]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0]
+    assert len(top_k_indices(scores, 0)) == 0
+
+@pytest.mark.parametrize("dtype, tol", [("float16", 1e-3), ("int8", 2e-2)])
+def test_quantized_matrix_scores_close_to_float32(monkeypatch, dtype, tol):
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((50, 8)).astype(np.float32)
+    matrix[3] = 0.0
+    stored, scale = quantize_rows(matrix, dtype)
+    assert stored.dtype == np.dtype(dtype)
+    assert np.allclose(dequantize_rows(stored, scale), matrix, atol=tol * 4)
+
+    # Small blocks so the blockwise conversion path is exercised.
+    monkeypatch.setattr(scoring_utils, "SCORE_BLOCK_ROWS", 16)
+    vectors = rng.standard_normal((8, 3)).astype(np.float32)
+    scores = matrix_scores(stored, vectors, scale)
+    assert scores.dtype == np.float32
+    assert np.allclose(scores, matrix @ vectors, atol=tol * 10)
+    assert np.allclose(matrix_scores(stored, vectors[:, 0], scale), scores[:, 0], atol=1e-5)
+    assert not scores[3].any()
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_matrix_top_k_matches_full_scores(monkeypatch, dtype):
+    rng = np.random.default_rng(1)
+    stored, scale = quantize_rows(rng.standard_normal((70, 8)), dtype)
+    vectors = rng.standard_normal((8, 4)).astype(np.float32)
+    full = matrix_scores(stored, vectors, scale).T
+    # Blocks smaller than k and than the catalog, so the running merge is exercised.
+    monkeypatch.setattr(scoring_utils, "SCORE_BLOCK_ROWS", 16)
+    for k in (5, 20, 100):
+        rows, scores = matrix_top_k(stored, vectors, k, scale)
+        assert rows.shape == scores.shape == (4, min(k, 70))
+        for user in range(4):
+            assert rows[user].tolist() == top_k_indices(full[user], k).tolist()
+            assert np.allclose(scores[user], full[user][rows[user]])
+    assert matrix_top_k(stored, vectors, 0, scale)[0].shape == (4, 0)
@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+
+torch = pytest.importorskip("torch")
+
+from core.session_model import SessionModel
+
+
+class LastItemScores(torch.nn.Module):
+    """
+    Stand-in for an exported session model: scores item i by |i - last item|,
+    with the same in-graph masking and top-k.
+    """
+    def __init__(self, vocab_size: int, top_k: int):
+        super().__init__()
+        self.vocab_size = vocab_size
+        self.top_k = top_k
+
+    def forward(self, input_seq):
+        last = input_seq[:, -1:].float()
+        logits = -(torch.arange(self.vocab_size).float().unsqueeze(0) - last).abs()
+        logits = logits.scatter(1, input_seq, float("-inf"))
+        return torch.topk(logits, self.top_k, dim=1)
+
+
+@pytest.fixture
+def session_model():
+    vocab = np.array([-1, 50, 10, 40, 20, 30], dtype=np.int64)
+    module = torch.jit.script(LastItemScores(len(vocab), 4))
+    return SessionModel(module, vocab, max_len=3, top_k=4)
+
+
+def test_indices_drop_unknown_items(session_model):
+    assert session_model.indices_of([10, 99, 30]).tolist() == [2, 5]
+
+
+def test_recommend_excludes_session_items(session_model):
+    recs = session_model.recommend([50, 10], top_k=2)
+    # last index 2: neighbours 3 and 1, but 1 (item 50) is already in the session
+    assert recs == [40, 20]
+
+
+def test_recommend_unknown_session_is_empty(session_model):
+    assert session_model.recommend([999], top_k=3) == []
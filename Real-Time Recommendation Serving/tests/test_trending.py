@@ -1,6 +1,7 @@
 import pytest
+import numpy as np
 from services.trending_engine import get_trending_items, trending_boost
-from core.model_loader import load_models
+from core.model_loader import build_trending_index, load_models
 
 load_models()
 
@@ -11,6 +12,16 @@ def test_get_trending_items():
     assert len(trending) <= top_k
     assert all(isinstance(i, int) for i in trending)
 
-def test_trending_boost_returns_dict():
-    scores = trending_boost()
-    assert isinstance(scores, dict)
+def test_trending_boost_returns_candidates():
+    rows, scores = trending_boost(top_k=2)
+    assert len(rows) == len(scores) <= 2
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_trending_index_is_ranked_and_catalog_aligned():
+    item_ids = np.array([1, 2, 3], dtype=np.int64)
+    index = build_trending_index({"3": 1, "7": 9, "1": 5}, item_ids)
+    assert index["item_ids"].tolist() == [7, 1, 3]
+    assert index["rows"].tolist() == [0, 2]
+    assert index["vector"].tolist() == [5.0, 0.0, 1.0]
+    store = {"trending": index, "item_ids": item_ids}
+    assert get_trending_items(2, store=store) == [7, 1]
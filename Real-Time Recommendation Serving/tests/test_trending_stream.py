@@ -0,0 +1,108 @@
+import json
+import math
+import sys
+import types
+import pytest
+import numpy as np
+import core.model_loader as model_loader
+from core.model_loader import get_model_store, load_models, publish_trending
+from services.trending_stream import (
+    CountMinSketch, StreamingTrending, file_event_batches, load_live_trending,
+    postgres_event_batches, run_trending_stream, write_live_trending
+)
+
+load_models()
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=3)
+    keys = np.arange(500, dtype=np.int64)
+    sketch.add(keys, np.ones(500))
+    sketch.add(np.array([7, 7, 7]), np.ones(3))
+    estimates = sketch.estimate(keys)
+    assert np.all(estimates >= 1.0)
+    assert estimates[7] >= 4.0
+
+
+def test_decay_favours_recent_events():
+    engine = StreamingTrending(half_life_seconds=60, width=1024, depth=4, heap_size=10)
+    engine.add([1] * 8, [0.0] * 8)
+    engine.add([2] * 5, [600.0] * 5)
+    top = engine.top(2)
+    assert list(top) == [2, 1]
+    assert top[2] == pytest.approx(5.0)
+    assert top[1] == pytest.approx(8.0 * 2 ** -10)
+
+
+def test_landmark_rescale_keeps_scores():
+    engine = StreamingTrending(half_life_seconds=1, width=1024, depth=4, heap_size=10)
+    engine.add([1, 2], [0.0, 0.0])
+    engine.add([1], [100.0])
+    assert engine.landmark == 100.0
+    assert engine.top(2) == pytest.approx({1: 1.0, 2: 2.0 ** -100})
+
+
+def test_replay_from_event_file(tmp_path):
+    path = tmp_path / "events.jsonl"
+    events = (
+        [{"event_type": "view", "event_timestamp": "2024-01-01T00:00:00+00:00", "metadata": {"item_id": "3"}}] * 2
+        + [{"event_type": "view", "event_timestamp": 1704067200 + i, "item_id": 1} for i in range(5)]
+        + [{"event_type": "purchase", "event_timestamp": 1704067200, "item_id": 2}]
+    )
+    path.write_text("\n".join(json.dumps(e) for e in events))
+
+    published = []
+    engine = run_trending_stream(
+        file_event_batches(str(path), batch_size=3),
+        StreamingTrending(half_life_seconds=3600, width=1024, depth=4, heap_size=10),
+        publish=published.append, publish_interval=0, top_n=5,
+    )
+    assert engine.events == 7
+    assert list(published[-1]) == [1, 3]
+    assert published[-1][3] == pytest.approx(2 * math.exp(-math.log(2) * 4 / 3600))
+
+
+def test_publish_trending_keeps_cache_namespace():
+    store = get_model_store()
+    item_id = int(store["item_ids"][0])
+    try:
+        publish_trending({item_id: 42.0})
+        live = get_model_store()
+        assert live["cache_namespace"] == store["cache_namespace"]
+        assert live["trending"]["item_ids"].tolist() == [item_id]
+        assert live["trending"]["vector"][0] == 42.0
+        load_models()
+        assert get_model_store()["trending"]["item_ids"].tolist() == [item_id]
+    finally:
+        model_loader._live_trending = None
+        load_models()
+
+
+def test_poller_picks_up_rows_committed_out_of_id_order(monkeypatch):
+    table = [(i, "view", 1704067200 + i, str(i)) for i in (1, 2, 4)]
+
+    def read_sql(sql, params):
+        if "MAX(id)" in sql:
+            return [(0,)]
+        rows = sorted(r for r in table if r[0] > params["floor"])
+        return rows[:params["limit"]]
+
+    monkeypatch.setitem(sys.modules, "core.db", types.SimpleNamespace(read_sql=read_sql))
+    batches = postgres_event_batches(batch_size=10, poll_interval=1e-6, overlap=5)
+    assert next(batches)[0].tolist() == [1, 2, 4]
+    # id 3 was taken before id 4 but committed after it.
+    table.append((3, "view", 1704067203, "3"))
+    assert next(batches)[0].tolist() == [3]
+    assert next(batches)[0].tolist() == []
+
+
+def test_workers_publish_the_live_trending_file(tmp_path):
+    path = str(tmp_path / "trending_live.json")
+    published = []
+    assert load_live_trending(path, publish=published.append) is None
+
+    write_live_trending({7: 2.5, 3: 1.0}, path)
+    stamp = load_live_trending(path, publish=published.append)
+    assert published == [{"7": 2.5, "3": 1.0}]
+    assert load_live_trending(path, stamp, publish=published.append) == stamp
+    assert len(published) == 1
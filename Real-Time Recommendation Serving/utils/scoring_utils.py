@@ -0,0 +1,165 @@
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    Uses argpartition so only the selected k are fully sorted.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    # Partition on the raw scores (no negated copy of the catalog-sized array).
+    top = np.argpartition(scores, n - k)[n - k:]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def empty_candidates():
+    """
+    (rows, scores) pair for a source with nothing to offer.
+    """
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def top_k_candidates(scores: np.ndarray, k: int):
+    """
+    (rows, scores) of the k best entries of a catalog-aligned score vector.
+    """
+    top = top_k_indices(scores, k)
+    return top, scores[top]
+
+
+def top_k_indices_2d(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Row-wise top_k_indices for a (batch, n) score block.
+    """
+    batch, n = scores.shape
+    if k <= 0 or n == 0:
+        return np.empty((batch, 0), dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, axis=1, kind="stable")
+    top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row; zero rows stay zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+# Rows converted to float32 per step when scoring a quantized matrix: large
+# enough for BLAS to be efficient, small enough to stay in cache.
+SCORE_BLOCK_ROWS = 8192
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_rows(matrix: np.ndarray, dtype: str):
+    """
+    (stored matrix, per-row scale or None). int8 rows are scaled so the
+    largest magnitude maps to 127 (matrix ~= q * scale[:, None]).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        scale = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(len(matrix), np.float32)
+        scale = scale.astype(np.float32)
+        safe = np.where(scale == 0, 1.0, scale)
+        q = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+        return q, scale
+    raise ValueError(f"Unknown embedding dtype {dtype!r}, expected one of {EMBEDDING_DTYPES}")
+
+
+def dequantize_rows(matrix: np.ndarray, scale: np.ndarray = None) -> np.ndarray:
+    """
+    float32 copy of (a row subset of) a stored matrix; `scale` must be
+    aligned with the given rows.
+    """
+    out = np.asarray(matrix, dtype=np.float32)
+    if scale is not None:
+        out = out * scale[:, None]
+    return out
+
+
+def matrix_scores(matrix: np.ndarray, vectors: np.ndarray, scale: np.ndarray = None) -> np.ndarray:
+    """
+    matrix @ vectors as float32, for float32, float16 or int8 (with per-row
+    `scale`) matrices; vectors is (dim,) or (dim, b). Quantized matrices are
+    converted SCORE_BLOCK_ROWS rows at a time, never as a full float32 copy.
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ vectors
+    vectors = np.asarray(vectors, dtype=np.float32)
+    out = np.empty((len(matrix),) + vectors.shape[1:], dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        stop = start + SCORE_BLOCK_ROWS
+        out[start:stop] = matrix[start:stop].astype(np.float32) @ vectors
+    if scale is not None:
+        out *= scale.reshape((-1,) + (1,) * (out.ndim - 1))
+    return out
+
+
+def matrix_top_k(matrix: np.ndarray, vectors: np.ndarray, k: int, scale: np.ndarray = None):
+    """
+    Top k rows of `matrix` for each column of `vectors` (dim, b), as
+    (rows, scores), both (b, min(k, n)) and best first. Scores
+    SCORE_BLOCK_ROWS rows at a time and merges each block into a running
+    top k, so the largest temporary is b x (k + SCORE_BLOCK_ROWS) rather
+    than the b x n score matrix. Once a column's top k is full, only the
+    block entries above its current k-th score take part in the merge: one
+    comparison per score instead of a partition over all of them.
+    """
+    n, b = len(matrix), vectors.shape[1]
+    k = max(min(k, n), 0)
+    best_rows = np.empty((b, 0), dtype=np.int64)
+    best_scores = np.empty((b, 0), dtype=np.float32)
+    if k == 0:
+        return best_rows, best_scores
+    for start in range(0, n, SCORE_BLOCK_ROWS):
+        stop = min(start + SCORE_BLOCK_ROWS, n)
+        block = matrix_scores(matrix[start:stop], vectors, None if scale is None else scale[start:stop]).T
+        if best_scores.shape[1] == k:
+            block_rows, block = _above(block, best_scores.min(axis=1), start)
+            if block.shape[1] == 0:
+                continue
+        else:
+            block_rows = np.broadcast_to(np.arange(start, stop), block.shape)
+        scores = np.concatenate([best_scores, block], axis=1)
+        rows = np.concatenate([best_rows, block_rows], axis=1)
+        if scores.shape[1] > k:
+            keep = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+            scores = np.take_along_axis(scores, keep, axis=1)
+            rows = np.take_along_axis(rows, keep, axis=1)
+        best_rows, best_scores = rows, scores
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _above(block: np.ndarray, thresholds: np.ndarray, start: int):
+    """
+    (rows, scores) of the entries of each block row above its threshold,
+    packed left into (b, widest count) arrays padded with -inf scores.
+    """
+    # 1-D flatnonzero over the (contiguous) transpose: many times faster
+    # than nonzero on the 2-D mask. Then group the few hits by row.
+    columns, users = np.divmod(np.flatnonzero((block > thresholds[:, None]).T), len(block))
+    order = np.argsort(users, kind="stable")
+    users, columns = users[order], columns[order]
+    counts = np.bincount(users, minlength=len(block))
+    width = int(counts.max()) if len(users) else 0
+    # Place of every entry within its row.
+    slots = np.arange(len(users)) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = np.zeros((len(block), width), dtype=np.int64)
+    scores = np.full((len(block), width), -np.inf, dtype=block.dtype)
+    rows[users, slots] = columns + start
+    scores[users, slots] = block[users, columns]
+    return rows, scores
@@ -9,3 +9,8 @@ CREATE INDEX IF NOT EXISTS idx_events_clean_event_timestamp
 -- Index on user_id in user_sessions for lookup
 CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id 
     ON user_sessions (user_id);
+
+-- Sessions of a user ending after a time: the open sessions an incremental
+-- ETL run (etl_batch.py --incremental) reloads
+CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id_session_end
+    ON user_sessions (user_id, session_end);
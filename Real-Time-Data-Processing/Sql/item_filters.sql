@@ -0,0 +1,27 @@
+-- Merchandising rules applied at rank time by the API
+-- ("Real-Time Recommendation Serving/Services/item_filter_refresh.py").
+-- Workers poll rows by updated_at, so every write must move it (the trigger
+-- below does). Rows are never deleted: unblock or restock an item instead.
+
+CREATE TABLE IF NOT EXISTS item_attributes (
+    item_id BIGINT PRIMARY KEY,
+    category TEXT,
+    in_stock BOOLEAN NOT NULL DEFAULT TRUE,
+    blocked BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION item_attributes_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS item_attributes_touch ON item_attributes;
+CREATE TRIGGER item_attributes_touch
+    BEFORE INSERT OR UPDATE ON item_attributes
+    FOR EACH ROW EXECUTE FUNCTION item_attributes_touch();
+
+-- The refresh query is a range scan on updated_at.
+CREATE INDEX IF NOT EXISTS idx_item_attributes_updated_at ON item_attributes (updated_at);
@@ -0,0 +1,42 @@
+-- Incremental trending rollups, maintained by
+-- "Real-Time Recommendation Serving/scripts/build_trending.py".
+-- Each run aggregates only events_clean rows with id past the watermark
+-- (plus a small re-read window below it, see rollup_seen_events), so
+-- events_clean is scanned in full once, on the first run.
+
+-- Last events_clean.id folded into the rollups, per job (the incremental
+-- ETL in Real-Time-Data-Processing/etl_batch.py keeps its own row here)
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    job TEXT PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- events_clean ids a job has already folded within its re-read window
+-- (TRENDING_ID_OVERLAP / ETL_ID_OVERLAP ids below last_event_id): rows
+-- committed late with a lower id are picked up on the next run, and
+-- counted only once
+CREATE TABLE IF NOT EXISTS rollup_seen_events (
+    job TEXT NOT NULL,
+    event_id BIGINT NOT NULL,
+    PRIMARY KEY (job, event_id)
+);
+
+-- Views per item per hour
+CREATE TABLE IF NOT EXISTS item_views_hourly (
+    hour TIMESTAMPTZ NOT NULL,
+    item_id BIGINT NOT NULL,
+    views BIGINT NOT NULL,
+    PRIMARY KEY (hour, item_id)
+);
+
+-- Views per category per hour
+CREATE TABLE IF NOT EXISTS category_views_hourly (
+    hour TIMESTAMPTZ NOT NULL,
+    category TEXT NOT NULL,
+    views BIGINT NOT NULL,
+    PRIMARY KEY (hour, category)
+);
+
+-- Window queries filter on hour and group by item/category; the primary
+-- keys lead with hour, so they serve the range scan.
@@ -0,0 +1,265 @@
+"""
+Scaling benchmark of the offline pipeline on synthetic events_clean data.
+
+For each --sizes event count, generates a clickstream
+(benchmarks.synthetic_events) and runs the stages in pipeline order, each
+on the previous stage's output:
+
+    etl_transform       etl_batch.clean_events                 events_clean rows
+    sessionize          sessionize.sessionize_events           cleaned events
+    session_features    features.compute_session_features      events tagged with session_id
+    flatten_sessions    data_prep.flatten_sessions             user_sessions rows
+    interaction_matrix  als_cf.build_interaction_matrix        interactions
+
+Every stage runs in its own process, rooted in its project
+(Real-Time-Data-Processing or Build Recommendation Models, whose modules
+share names like config and db), so its peak memory is its own. The report
+has seconds, rows/s and events/s (input events of the whole pipeline, so
+stages compare), and the resident memory the stage added on top of its
+input, per stage and size. A stage is skipped at a size where its previous
+rate projects beyond --max-stage-seconds.
+
+    python -m benchmarks.pipeline_benchmark --sizes 10000,100000,1000000
+    python -m benchmarks.pipeline_benchmark --baseline pipeline_report.json   # exit 1 on regression
+
+als_cf imports phase3.*: put the parent of the installed phase3 package on
+PYTHONPATH, or the interaction_matrix stage is reported as failed.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCESSING_DIR = os.path.dirname(BENCHMARK_DIR)
+MODELS_DIR = os.path.join(os.path.dirname(PROCESSING_DIR), "Build Recommendation Models")
+
+# name -> (project, input stage output, output file)
+STAGES = {
+    "etl_transform": ("processing", "events", "clean"),
+    "sessionize": ("processing", "clean", "sessions"),
+    "session_features": ("processing", "sessions", None),
+    "flatten_sessions": ("models", "sessions", "interactions"),
+    "interaction_matrix": ("models", "interactions", None),
+}
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PeakRSS:
+    """
+    Samples this process's RSS on a thread while the block runs.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def _stage_callable(name: str, data):
+    """
+    (fn, args, input rows) for a stage; untimed preparation happens here.
+    Imports resolve against the stage's project (PYTHONPATH set by the parent).
+    """
+    import pandas as pd
+    if name == "etl_transform":
+        from etl_batch import clean_events
+        return clean_events, (data,), len(data)
+    if name == "sessionize":
+        from sessionize import sessionize_events
+        return sessionize_events, (data,), len(data)
+    if name == "session_features":
+        from features import compute_session_features
+        events = data[["session_id", "events"]].explode("events").dropna(subset=["events"])
+        tagged = pd.DataFrame({
+            "session_id": events["session_id"].to_numpy(),
+            "event_type": [e["event_type"] for e in events["events"]],
+            "timestamp": pd.to_datetime([e["event_timestamp"] for e in events["events"]], utc=True, format="ISO8601"),
+            "product_id": [(e.get("metadata") or {}).get("product_id") for e in events["events"]],
+        })
+        return compute_session_features, (tagged,), len(tagged)
+    if name == "flatten_sessions":
+        from data_prep import flatten_sessions
+        return flatten_sessions, (data,), len(data)
+    if name == "interaction_matrix":
+        from als_cf import build_interaction_matrix
+        return build_interaction_matrix, (data,), len(data)
+    raise ValueError(f"Unknown stage {name!r}")
+
+
+def run_stage(name: str, input_path: str, output_path: str = None) -> dict:
+    """
+    Child-process side: load the input, time one call of the stage, save its
+    output for the next stage.
+    """
+    import pandas as pd
+    data = pd.read_pickle(input_path)
+    fn, args, rows = _stage_callable(name, data)
+    del data
+    gc.collect()
+
+    with PeakRSS() as memory:
+        base = memory.peak
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds = time.perf_counter() - start
+
+    output_rows = result[0].shape[0] if isinstance(result, tuple) else len(result)
+    if output_path is not None:
+        result.to_pickle(output_path)
+    return {
+        "seconds": seconds,
+        "input_rows": rows,
+        "output_rows": int(output_rows),
+        "rows_per_second": rows / seconds if seconds else None,
+        "stage_rss_bytes": memory.peak - base,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def _spawn_stage(name: str, workdir: str, size: int, models_dir: str) -> dict:
+    project, source, target = STAGES[name]
+    project_dir = PROCESSING_DIR if project == "processing" else models_dir
+    input_path = os.path.join(workdir, f"{source}_{size}.pkl")
+    if not os.path.exists(input_path):
+        return {"skipped": f"no {source} output"}
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", name, "--input", input_path]
+    if target is not None:
+        command += ["--stage-output", os.path.join(workdir, f"{target}_{size}.pkl")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [project_dir, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run(command, cwd=project_dir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"failed": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "unknown"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(sizes, stages, max_stage_seconds: float, models_dir: str, seed: int = 0, workdir: str = None) -> dict:
+    from benchmarks.synthetic_events import generate_events
+
+    workdir = workdir or tempfile.mkdtemp(prefix="pipeline_bench_")
+    results = []
+    last_rate = {}
+    for size in sorted(sizes):
+        start = time.perf_counter()
+        generate_events(size, seed=seed).to_pickle(os.path.join(workdir, f"events_{size}.pkl"))
+        print(f"Generated {size} events in {time.perf_counter() - start:.1f}s")
+
+        for name in stages:
+            row = {"stage": name, "events": size}
+            projected = size / last_rate[name] if last_rate.get(name) else 0.0
+            if projected > max_stage_seconds:
+                row["skipped"] = f"projected {projected:.0f}s > {max_stage_seconds:.0f}s"
+            else:
+                row.update(_spawn_stage(name, workdir, size, models_dir))
+            if "seconds" in row:
+                row["events_per_second"] = size / row["seconds"] if row["seconds"] else None
+                last_rate[name] = row["events_per_second"]
+            results.append(row)
+            print(json.dumps(row))
+
+        for name in os.listdir(workdir):
+            if name.endswith(f"_{size}.pkl"):
+                os.remove(os.path.join(workdir, name))
+
+    import numpy as np
+    import pandas as pd
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    (stage, size) pairs that got slower, or use more memory, than the
+    baseline by more than `tolerance` (a fraction).
+    """
+    before = {(r["stage"], r["events"]): r for r in baseline.get("results", []) if "seconds" in r}
+    found = []
+    for row in report["results"]:
+        old = before.get((row["stage"], row["events"]))
+        if old is None or "seconds" not in row:
+            continue
+        label = f"{row['stage']} @ {row['events']} events"
+        if row["events_per_second"] < old["events_per_second"] * (1 - tolerance):
+            found.append(f"{label}: {old['events_per_second']:.0f} -> {row['events_per_second']:.0f} events/s")
+        if row["stage_rss_bytes"] > max(old["stage_rss_bytes"], 1 << 20) * (1 + tolerance):
+            found.append(
+                f"{label}: stage memory {old['stage_rss_bytes'] / 1e6:.1f} -> {row['stage_rss_bytes'] / 1e6:.1f} MB"
+            )
+    return found
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline pipeline scaling benchmark")
+    parser.add_argument("--sizes", type=_ints, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--max-stage-seconds", type=float, default=600.0,
+                        help="Skip a stage at sizes its previous rate projects beyond this")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Build Recommendation Models checkout")
+    parser.add_argument("--workdir", help="Scratch directory for stage inputs/outputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", default="pipeline_report.json")
+    # Internal: run one stage in this process (spawned by the parent).
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--stage-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.input, args.stage_output)))
+        sys.exit(0)
+
+    stages = [s for s in args.stages.split(",") if s]
+    report = run(args.sizes, stages, args.max_stage_seconds, args.models_dir, args.seed, args.workdir)
+    report["config"] = {k: v for k, v in vars(args).items()
+                        if k not in ("output", "baseline", "run_stage", "input", "stage_output")}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Saved report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if found else 0)
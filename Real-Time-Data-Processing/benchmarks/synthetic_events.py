@@ -0,0 +1,122 @@
+"""
+Synthetic events_clean clickstreams for benchmarking the offline pipeline.
+
+Vectorized, so 100M events are a matter of memory, not minutes of Python
+loops. The shape follows the tracker in Real-Time-Data-Collection:
+    - users: Zipf-like activity (a few heavy users, a long tail)
+    - sessions: geometric length (mean mean_session_events), starts spread
+      over --days with a daytime peak, exponential gaps between events
+    - event types: browse-heavy funnel (view/click >> add_to_cart > purchase)
+    - products: Zipf-like popularity
+
+Columns match events_clean: id, user_id (text), event_type,
+event_timestamp (UTC), metadata (JSON text, as stored in JSONB).
+
+    python -m benchmarks.synthetic_events --events 1000000 --output events_1m.pkl
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+EVENT_TYPES = np.array([
+    "view", "click", "page_view", "category_view", "search", "add_to_cart", "remove_from_cart", "purchase",
+])
+EVENT_PROBS = np.array([0.45, 0.15, 0.12, 0.08, 0.06, 0.08, 0.02, 0.04])
+# Event types whose metadata carries a product_id.
+PRODUCT_EVENTS = {"view", "click", "add_to_cart", "remove_from_cart", "purchase"}
+
+# Relative traffic per hour of day (UTC): quiet night, evening peak.
+HOURLY_WEIGHTS = np.array([
+    2, 1, 1, 1, 1, 2, 3, 5, 6, 7, 7, 8, 8, 8, 7, 7, 8, 9, 10, 11, 11, 9, 6, 4,
+], dtype=np.float64)
+
+START = pd.Timestamp("2024-01-01", tz="UTC")
+
+
+def _zipf_choice(rng, n: int, size: int, exponent: float) -> np.ndarray:
+    """
+    Indices 0..n-1 drawn with probability ~ 1 / (rank + 1) ** exponent,
+    ranks shuffled so popular ids are spread over the id range.
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    ranks = rng.choice(n, size=size, p=weights / weights.sum())
+    return rng.permutation(n)[ranks]
+
+
+def generate_events(n_events: int, n_users: int = None, n_products: int = None, days: int = 30,
+                    mean_session_events: float = 8.0, mean_gap_seconds: float = 45.0,
+                    max_gap_seconds: float = 1500.0, seed: int = 0) -> pd.DataFrame:
+    """
+    n_events events_clean rows, sorted by time. n_users / n_products default
+    to n_events / 20 and n_events / 50 (at least 10). Gaps within a session
+    stay below max_gap_seconds so they survive a 30 minute session timeout.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(10, n_events // 20)
+    n_products = n_products or max(10, n_events // 50)
+
+    # Session lengths until they cover n_events; the last one is cut short.
+    lengths = rng.geometric(1.0 / mean_session_events, size=int(n_events / mean_session_events * 1.2) + 1)
+    while lengths.sum() < n_events:
+        lengths = np.concatenate([lengths, rng.geometric(1.0 / mean_session_events, size=len(lengths))])
+    ends = np.cumsum(lengths)
+    n_sessions = int(np.searchsorted(ends, n_events)) + 1
+    lengths = lengths[:n_sessions]
+    lengths[-1] -= ends[n_sessions - 1] - n_events
+
+    session_users = _zipf_choice(rng, n_users, n_sessions, exponent=0.6) + 1
+    hours = rng.choice(24, size=n_sessions, p=HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum())
+    session_starts = (
+        rng.integers(0, days, n_sessions) * 86400 + hours * 3600 + rng.integers(0, 3600, n_sessions)
+    ).astype(np.float64)
+
+    # Per event: its session, and seconds since the session's first event.
+    session_of = np.repeat(np.arange(n_sessions), lengths)
+    gaps = np.minimum(rng.exponential(mean_gap_seconds, n_events), max_gap_seconds)
+    first = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    gaps[first] = 0.0
+    elapsed = np.cumsum(gaps)
+    elapsed -= np.repeat(elapsed[first], lengths)
+    seconds = np.round(session_starts[session_of] + elapsed, 3)
+
+    event_types = EVENT_TYPES[rng.choice(len(EVENT_TYPES), size=n_events, p=EVENT_PROBS)]
+    products = (_zipf_choice(rng, n_products, n_events, exponent=1.0) + 1).astype(str)
+
+    df = pd.DataFrame({
+        "user_id": session_users[session_of].astype(str),
+        "event_type": event_types,
+        "seconds": seconds,
+        "product": products,
+    })
+    metadata = pd.Series('{"page": "home"}', index=df.index, dtype=object)
+    has_product = df["event_type"].isin(PRODUCT_EVENTS)
+    metadata[has_product] = '{"product_id": "' + df.loc[has_product, "product"] + '"}'
+    is_category = df["event_type"] == "category_view"
+    metadata[is_category] = '{"category_id": "' + (df.loc[is_category, "product"].str[-2:]) + '"}'
+    is_search = df["event_type"] == "search"
+    metadata[is_search] = '{"query": "q' + df.loc[is_search, "product"] + '"}'
+    df["metadata"] = metadata.astype(object)
+
+    # events_clean ids follow ingestion, i.e. time order.
+    df = df.sort_values("seconds", kind="stable").reset_index(drop=True)
+    df.insert(0, "id", np.arange(1, n_events + 1, dtype=np.int64))
+    df["event_timestamp"] = START + pd.to_timedelta(df["seconds"], unit="s")
+    return df[["id", "user_id", "event_type", "event_timestamp", "metadata"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic events_clean clickstream")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--products", type=int, default=None)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="events_clean.pkl", help=".pkl or .csv")
+    args = parser.parse_args()
+
+    events = generate_events(args.events, args.users, args.products, args.days, seed=args.seed)
+    if args.output.endswith(".csv"):
+        events.to_csv(args.output, index=False)
+    else:
+        events.to_pickle(args.output)
+    print(f"Wrote {len(events)} events for {events['user_id'].nunique()} users to {args.output}")
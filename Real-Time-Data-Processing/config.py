@@ -18,6 +18,9 @@ class Config:
     # Session timeout and output
     SESSION_TIMEOUT_SECONDS = int(os.getenv("SESSION_TIMEOUT_SECONDS", 1800))
     BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "output")
+    # events_clean ids below the watermark each incremental ETL run re-reads,
+    # for rows committed late (ids are assigned before commit)
+    ETL_ID_OVERLAP = int(os.getenv("ETL_ID_OVERLAP", 1000))
     # SQLAlchemy database URI
     SQLALCHEMY_DATABASE_URI = (
         f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
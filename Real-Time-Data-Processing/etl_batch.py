@@ -1,11 +1,42 @@
 import os
 import json
+import argparse
+from contextlib import contextmanager
 from datetime import datetime
 import pandas as pd
 from sqlalchemy import text
-from db import read_sql, engine
+from db import engine
 from config import Config
-from sessionize import sessionize_events
+from sessionize import SESSION_COLUMNS, sessionize_events
+
+# events_clean columns the ETL reads; metadata as text, parsed by safe_metadata
+EVENT_COLUMNS = "id, user_id, event_type, event_timestamp, metadata::text AS metadata"
+
+# What sessionize_events reads of each event
+SESSION_EVENT_COLUMNS = ['user_id', 'event_type', 'event_timestamp', 'metadata']
+
+# Row of rollup_watermarks (Sql/trending_rollups.sql) with the last
+# events_clean.id sessionized into user_sessions
+WATERMARK_JOB = "etl_sessions"
+
+UPSERT_SESSION = text("""
+    INSERT INTO user_sessions (
+        session_id, user_id, session_start, session_end,
+        viewed_products, added_to_cart, purchased, session_length_seconds, events
+    ) VALUES (
+        :session_id, :user_id, :session_start, :session_end,
+        :viewed, :cart, :purchased, :length, :events
+    )
+    ON CONFLICT (session_id) DO UPDATE
+    SET user_id = EXCLUDED.user_id,
+        session_start = EXCLUDED.session_start,
+        session_end = EXCLUDED.session_end,
+        viewed_products = EXCLUDED.viewed_products,
+        added_to_cart = EXCLUDED.added_to_cart,
+        purchased = EXCLUDED.purchased,
+        session_length_seconds = EXCLUDED.session_length_seconds,
+        events = EXCLUDED.events;
+""")
 
 def safe_metadata(x):
     """
@@ -22,16 +53,11 @@ def safe_metadata(x):
         return x
     return {}
 
-def run_etl():
-    # 1. Extract: read all cleaned events
-    query = "SELECT * FROM events_clean"
-    df = read_sql(query)
-
-    # 2. Transform:
-    if df.empty:
-        print("No events to process.")
-        return
-
+def clean_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Transform step of the ETL: dedupe, normalize event types, timestamps
+    and metadata, and sort by user and time (what sessionize_events expects).
+    """
     # Drop duplicates based on key fields
     df = df.drop_duplicates(subset=['user_id', 'event_type', 'event_timestamp', 'metadata'])
     # Lowercase event_type
@@ -41,56 +67,231 @@ def run_etl():
     # Safely convert metadata to dict
     df['metadata'] = df['metadata'].apply(safe_metadata)
     # Sort by user and timestamp
-    df = df.sort_values(['user_id', 'event_timestamp']).reset_index(drop=True)
+    return df.sort_values(['user_id', 'event_timestamp']).reset_index(drop=True)
 
-    # 3. Sessionize
-    session_df = sessionize_events(df)
+@contextmanager
+def transaction():
+    """
+    A transaction on one REPEATABLE READ snapshot: the events read and the
+    ids recorded as seen are the same rows, even while others commit. A run
+    racing another one fails to serialize and is simply retried.
+    """
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        yield conn
 
-    # 4. Load: UPSERT sessions into user_sessions
-    with engine.begin() as conn:
-        for _, row in session_df.iterrows():
-            event_list = row['events']
+def lock_watermark(conn, overlap: int = None):
+    """
+    (last events_clean.id sessionized, lowest id to re-read), with the
+    watermark row locked until the transaction ends, so concurrent ETL runs
+    never sessionize the same events twice. Ids within `overlap`
+    (Config.ETL_ID_OVERLAP) below the watermark are read again, skipping
+    those in rollup_seen_events; a job without seen ids yet re-reads nothing.
+    """
+    overlap = Config.ETL_ID_OVERLAP if overlap is None else overlap
+    conn.execute(
+        text("INSERT INTO rollup_watermarks (job) VALUES (:job) ON CONFLICT (job) DO NOTHING"),
+        {"job": WATERMARK_JOB},
+    )
+    last = conn.execute(
+        text("SELECT last_event_id FROM rollup_watermarks WHERE job = :job FOR UPDATE"),
+        {"job": WATERMARK_JOB},
+    ).scalar()
+    has_seen = conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM rollup_seen_events WHERE job = :job)"), {"job": WATERMARK_JOB}
+    ).scalar()
+    return last, max(last - overlap, 0) if has_seen else last
+
+def set_watermark(conn, after: int, upto: int, overlap: int = None):
+    """
+    Move the watermark to `upto` and remember the ids of the next re-read
+    window (upto - overlap, upto] as seen, forgetting older ones.
+    """
+    overlap = Config.ETL_ID_OVERLAP if overlap is None else overlap
+    conn.execute(
+        text("""
+            INSERT INTO rollup_seen_events (job, event_id)
+            SELECT :job, id FROM events_clean WHERE id > :low AND id <= :upto
+            ON CONFLICT DO NOTHING
+        """),
+        {"job": WATERMARK_JOB, "low": max(after, upto - overlap), "upto": upto},
+    )
+    conn.execute(
+        text("DELETE FROM rollup_seen_events WHERE job = :job AND event_id <= :low"),
+        {"job": WATERMARK_JOB, "low": upto - overlap},
+    )
+    conn.execute(
+        text("UPDATE rollup_watermarks SET last_event_id = :upto, updated_at = NOW() WHERE job = :job"),
+        {"upto": upto, "job": WATERMARK_JOB},
+    )
+
+def upsert_sessions(conn, session_df: pd.DataFrame):
+    """
+    Load step: UPSERT sessions into user_sessions, in one executemany.
+    """
+    if session_df.empty:
+        return
+    rows = [
+        {
+            "session_id": session_id,
+            "user_id": user_id,
+            "session_start": start,
+            "session_end": end,
+            "viewed": viewed,
+            "cart": cart,
+            "purchased": purchased,
+            "length": int(length),
             # Convert events list of dicts to JSON string for insertion
-            events_json = json.dumps(event_list) if event_list else json.dumps([])
-            insert_query = text("""
-                INSERT INTO user_sessions (
-                    session_id, user_id, session_start, session_end,
-                    viewed_products, added_to_cart, purchased, session_length_seconds, events
-                ) VALUES (
-                    :session_id, :user_id, :session_start, :session_end,
-                    :viewed, :cart, :purchased, :length, :events
-                )
-                ON CONFLICT (session_id) DO UPDATE
-                SET user_id = EXCLUDED.user_id,
-                    session_start = EXCLUDED.session_start,
-                    session_end = EXCLUDED.session_end,
-                    viewed_products = EXCLUDED.viewed_products,
-                    added_to_cart = EXCLUDED.added_to_cart,
-                    purchased = EXCLUDED.purchased,
-                    session_length_seconds = EXCLUDED.session_length_seconds,
-                    events = EXCLUDED.events;
-            """)
-            conn.execute(
-                insert_query,
-                {
-                    "session_id": row['session_id'],
-                    "user_id": row['user_id'],
-                    "session_start": row['session_start'],
-                    "session_end": row['session_end'],
-                    "viewed": row['viewed_products'],
-                    "cart": row['added_to_cart'],
-                    "purchased": row['purchased'],
-                    "length": int(row['session_length_seconds']),
-                    "events": events_json
-                }
-            )
-
-    # Save snapshot CSV of sessions
+            "events": json.dumps(events or []),
+        }
+        for session_id, user_id, start, end, viewed, cart, purchased, length, events in zip(
+            *(session_df[column] for column in SESSION_COLUMNS)
+        )
+    ]
+    conn.execute(UPSERT_SESSION, rows)
+
+def save_snapshot(session_df: pd.DataFrame):
+    """
+    Save snapshot CSV of sessions.
+    """
     os.makedirs(Config.BATCH_OUTPUT_DIR, exist_ok=True)
     timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
     output_path = os.path.join(Config.BATCH_OUTPUT_DIR, f"sessions_{timestamp}.csv")
     session_df.to_csv(output_path, index=False)
     print(f"Saved session snapshot to {output_path}")
 
+def run_etl():
+    """
+    Full run: re-sessionize all of events_clean. Also moves the watermark to
+    the last event read, so incremental runs can take over from here.
+    """
+    with transaction() as conn:
+        lock_watermark(conn)
+        upto = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM events_clean")).scalar()
+
+        # 1. Extract: read all cleaned events
+        df = pd.read_sql(
+            text(f"SELECT {EVENT_COLUMNS} FROM events_clean WHERE id <= :upto"), conn, params={"upto": upto}
+        )
+
+        # 2. Transform:
+        if df.empty:
+            print("No events to process.")
+            return
+        df = clean_events(df)
+
+        # 3. Sessionize
+        session_df = sessionize_events(df)
+
+        # 4. Load: UPSERT sessions into user_sessions
+        upsert_sessions(conn, session_df)
+        # Every event up to upto is in: the seen window starts over from it
+        conn.execute(text("DELETE FROM rollup_seen_events WHERE job = :job"), {"job": WATERMARK_JOB})
+        set_watermark(conn, 0, upto)
+
+    save_snapshot(session_df)
+
+def rehydrate_events(sessions: pd.DataFrame) -> pd.DataFrame:
+    """
+    The events of stored user_sessions rows, as clean_events output (one row
+    per event, metadata as dicts), to be sessionized again with new events.
+    """
+    counts = [len(events or []) for events in sessions['events']]
+    events = [event for session_events in sessions['events'] for event in (session_events or [])]
+    return pd.DataFrame({
+        'user_id': sessions['user_id'].repeat(counts).to_numpy(),
+        'event_type': [event['event_type'] for event in events],
+        'event_timestamp': pd.to_datetime(
+            [event['event_timestamp'] for event in events], utc=True, format='ISO8601'
+        ),
+        'metadata': [event.get('metadata') or {} for event in events],
+    })
+
+def sessionize_incremental(new_events: pd.DataFrame, open_sessions: pd.DataFrame):
+    """
+    Sessionize cleaned new events together with the stored sessions they may
+    extend (open_sessions, user_sessions rows). Returns (changed, stale_ids):
+    the sessions to upsert (those that gained events, or whose id moved
+    because a late event changed their start or merged them) and the stored
+    session ids no longer in the result, to delete. Sessions that only
+    consist of stored events are left alone.
+
+    Session ids are a hash of user and start, so an extended session keeps
+    its row and the result matches a full run over the same events.
+    """
+    events = new_events[SESSION_EVENT_COLUMNS]
+    if not open_sessions.empty:
+        events = pd.concat([rehydrate_events(open_sessions), events], ignore_index=True)
+    sessions = sessionize_events(events)
+
+    # Session of every new event: the user's last one starting at or before it
+    new = new_events[['user_id', 'event_timestamp']].sort_values('event_timestamp', kind='mergesort')
+    starts = sessions[['session_id', 'user_id', 'session_start']].sort_values('session_start', kind='mergesort')
+    hit = pd.merge_asof(new, starts, left_on='event_timestamp', right_on='session_start', by='user_id')
+
+    stored = set(open_sessions['session_id'])
+    changed = sessions['session_id'].isin(set(hit['session_id'])) | ~sessions['session_id'].isin(stored)
+    stale_ids = sorted(stored - set(sessions['session_id']))
+    return sessions[changed].reset_index(drop=True), stale_ids
+
+def run_incremental_etl():
+    """
+    Incremental run: sessionize only the events_clean rows not sessionized
+    yet: past the watermark, or committed late within Config.ETL_ID_OVERLAP
+    ids below it (see lock_watermark). Sessions of the same users still open when those events
+    start (session_end within SESSION_TIMEOUT_SECONDS of the earliest new
+    event, so late events are covered too) are read back from user_sessions
+    and extended or closed; only sessions that changed are written. Run time
+    follows the new events, not the size of events_clean.
+    """
+    with transaction() as conn:
+        last, after = lock_watermark(conn)
+        upto = max(last, conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM events_clean")).scalar())
+
+        # 1. Extract: events not sessionized yet, and the sessions they may extend
+        df = pd.read_sql(
+            text(f"""
+                SELECT {EVENT_COLUMNS} FROM events_clean e
+                WHERE id > :after AND id <= :upto
+                  AND NOT EXISTS (
+                      SELECT 1 FROM rollup_seen_events s WHERE s.job = :job AND s.event_id = e.id
+                  )
+            """),
+            conn, params={"after": after, "upto": upto, "job": WATERMARK_JOB},
+        )
+        if df.empty:
+            print("No new events to process.")
+            return
+        df = clean_events(df)
+        since = df['event_timestamp'].min() - pd.Timedelta(seconds=Config.SESSION_TIMEOUT_SECONDS)
+        open_sessions = pd.read_sql(
+            text("""
+                SELECT session_id, user_id, events FROM user_sessions
+                WHERE user_id = ANY(:users) AND session_end >= :since
+            """),
+            conn, params={"users": df['user_id'].unique().tolist(), "since": since.to_pydatetime()},
+        )
+
+        # 2. Sessionize them together
+        session_df, stale_ids = sessionize_incremental(df, open_sessions)
+
+        # 3. Load: replace superseded sessions, upsert changed ones
+        if stale_ids:
+            conn.execute(text("DELETE FROM user_sessions WHERE session_id = ANY(:ids)"), {"ids": stale_ids})
+        upsert_sessions(conn, session_df)
+        set_watermark(conn, after, upto)
+
+    print(
+        f"Events {after + 1}..{upto}: {len(df)} new events, {len(open_sessions)} open sessions reloaded, "
+        f"{len(session_df)} sessions upserted, {len(stale_ids)} replaced"
+    )
+    save_snapshot(session_df)
+
 if __name__ == "__main__":
-    run_etl()
+    parser = argparse.ArgumentParser(description="Sessionize events_clean into user_sessions")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only events past the watermark, extending open sessions")
+    args = parser.parse_args()
+    if args.incremental:
+        run_incremental_etl()
+    else:
+        run_etl()
@@ -1,106 +1,168 @@
+import gc
+import hashlib
 import uuid
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from config import Config
 
+SESSION_COLUMNS = ['session_id', 'user_id', 'session_start', 'session_end',
+                   'viewed_products', 'added_to_cart', 'purchased',
+                   'session_length_seconds', 'events']
+
+# Namespace of the uuid5 session ids: the same user and start always give the same id.
+SESSION_NAMESPACE = uuid.UUID('6f1b6c1e-3a52-5d8e-9c47-2f0d4b8a7e15')
+
+# Product list of the session each event type feeds
+PRODUCT_LISTS = {
+    'viewed_products': ('view',),
+    'added_to_cart': ('add_to_cart', 'cart'),
+    'purchased': ('purchase',),
+}
+LIST_OF_TYPE = {t: code for code, types in enumerate(PRODUCT_LISTS.values()) for t in types}
+
+
+def session_id(user_id, session_start: pd.Timestamp) -> str:
+    """
+    Deterministic session id, so re-running the ETL over the same events
+    upserts the same user_sessions rows instead of adding new ones.
+    """
+    return str(uuid.uuid5(SESSION_NAMESPACE, f"{user_id}|{session_start.isoformat()}"))
+
+
+def _session_ids(users: list, starts: list) -> list:
+    """
+    session_id() of every (user, start isoformat) pair: one sha1 per
+    session, the uuid5 version and variant bits set on all digests at once.
+    """
+    prefix = SESSION_NAMESPACE.bytes
+    digests = b''.join([hashlib.sha1(prefix + f"{u}|{s}".encode()).digest() for u, s in zip(users, starts)])
+    raw = np.frombuffer(digests, dtype=np.uint8).reshape(-1, 20)[:, :16].copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x50
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    h = raw.tobytes().hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, len(h), 32)
+    ]
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pause the cyclic garbage collector while building millions of small
+    dicts and lists: none of them form cycles, but each allocation burst
+    would otherwise trigger full collections that rescan all of them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _isoformat(timestamps: pd.Series) -> list:
+    """
+    Timestamp.isoformat() of every element, built column-wise for UTC or
+    naive timestamps without sub-microsecond parts.
+    """
+    tz = timestamps.dt.tz
+    if (tz is not None and str(tz) != 'UTC') or timestamps.dt.nanosecond.any():
+        return [ts.isoformat() for ts in timestamps]
+    text = np.datetime_as_string(timestamps.dt.tz_localize(None).to_numpy(), unit='us')
+    # isoformat() leaves out an all-zero fraction
+    whole = timestamps.dt.microsecond.to_numpy() == 0
+    text[whole] = text[whole].astype('U19')
+    if tz is not None:
+        text = np.char.add(text, '+00:00')
+    return text.tolist()
+
+
+def _split(values: list, bounds: np.ndarray) -> list:
+    """
+    values[bounds[i]:bounds[i + 1]] for every i.
+    """
+    return [values[start:stop] for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+
 def sessionize_events(df: pd.DataFrame) -> pd.DataFrame:
     """
     Convert sorted events DataFrame into user sessions based on a timeout.
     Output columns: session_id, user_id, session_start, session_end,
                     viewed_products, added_to_cart, purchased,
                     session_length_seconds, events.
+
+    Column-wise: a session starts at a user's first event and after every
+    gap longer than Config.SESSION_TIMEOUT_SECONDS (a diff over the sorted
+    events), and the per-session lists are slices of the event arrays at
+    the session boundaries. Sessions are ordered by user, then start.
     """
     timeout = Config.SESSION_TIMEOUT_SECONDS
-    sessions = []
-
-    # Ensure events are sorted by user and timestamp
-    if not df.empty:
-        df = df.sort_values(['user_id', 'event_timestamp'])
-
-    # Group events by user_id
-    for user, group in df.groupby('user_id'):
-        group = group.sort_values('event_timestamp')
-        session_start = None
-        session_id = None
-        viewed = []
-        added_to_cart = []
-        purchased = []
-        current_events = []
-        last_ts = None
-
-        for _, row in group.iterrows():
-            ts = row['event_timestamp']
-            event_type = row['event_type']
-            metadata = row.get('metadata') or {}
-            # Extract product_id from metadata if present
-            product_id = None
-            if isinstance(metadata, dict):
-                product_id = metadata.get('product_id')
-
-            # Determine if a new session should start
-            if last_ts is None or (ts - last_ts).total_seconds() > timeout:
-                # If there is an ongoing session, finalize it
-                if last_ts is not None:
-                    session_end = last_ts
-                    session_length = int((session_end - session_start).total_seconds())
-                    sessions.append({
-                        'session_id': session_id,
-                        'user_id': user,
-                        'session_start': session_start,
-                        'session_end': session_end,
-                        'viewed_products': viewed,
-                        'added_to_cart': added_to_cart,
-                        'purchased': purchased,
-                        'session_length_seconds': session_length,
-                        'events': current_events
-                    })
-                # Start a new session
-                session_id = str(uuid.uuid4())
-                session_start = ts
-                viewed = []
-                added_to_cart = []
-                purchased = []
-                current_events = []
-
-            # Record the event in the current session
-            event_record = {
-                'event_type': event_type,
-                'event_timestamp': ts.isoformat(),
-                'metadata': metadata
-            }
-            current_events.append(event_record)
-
-            # Append product to appropriate list
-            if event_type == 'view' and product_id:
-                viewed.append(product_id)
-            elif event_type in ['add_to_cart', 'cart'] and product_id:
-                added_to_cart.append(product_id)
-            elif event_type == 'purchase' and product_id:
-                purchased.append(product_id)
-
-            last_ts = ts
-
-        # Finalize the last session for this user
-        if session_id is not None:
-            session_end = last_ts
-            session_length = int((session_end - session_start).total_seconds())
-            sessions.append({
-                'session_id': session_id,
-                'user_id': user,
-                'session_start': session_start,
-                'session_end': session_end,
-                'viewed_products': viewed,
-                'added_to_cart': added_to_cart,
-                'purchased': purchased,
-                'session_length_seconds': session_length,
-                'events': current_events
-            })
-
-    # Create DataFrame of sessions
-    if sessions:
-        return pd.DataFrame(sessions)
-    else:
+    df = df[df['user_id'].notna()] if not df.empty else df
+    if df.empty:
         # Return empty DataFrame with expected columns if no sessions
-        columns = ['session_id', 'user_id', 'session_start', 'session_end',
-                   'viewed_products', 'added_to_cart', 'purchased',
-                   'session_length_seconds', 'events']
-        return pd.DataFrame(columns=columns)
+        return pd.DataFrame(columns=SESSION_COLUMNS)
+
+    # Ensure events are sorted by user and timestamp (stable for equal times):
+    # users as codes in sorted order, then one lexsort over two int arrays
+    user_codes, _ = pd.factorize(df['user_id'], sort=True)
+    ticks = df['event_timestamp'].array.as_unit('ns').asi8
+    order = np.lexsort((ticks, user_codes))
+    df = df.iloc[order]
+    user_codes = user_codes[order]
+    users = df['user_id']
+    timestamps = df['event_timestamp'].reset_index(drop=True)
+    n = len(df)
+
+    # Session boundaries: new user, or a gap past the timeout
+    new_user = np.r_[True, user_codes[1:] != user_codes[:-1]]
+    gap = np.r_[0, np.diff(ticks[order])] / 1e9
+    starts = np.flatnonzero(new_user | (gap > timeout))
+    bounds = np.append(starts, n)
+    ends = bounds[1:] - 1
+
+    session_start = timestamps.iloc[starts].reset_index(drop=True)
+    session_end = timestamps.iloc[ends].reset_index(drop=True)
+    session_users = users.iloc[starts].tolist()
+
+    # Per-event columns, then the per-session lists as slices of them
+    event_types = df['event_type']
+    iso = _isoformat(timestamps)
+    session_of = np.repeat(np.arange(len(starts)), np.diff(bounds))
+    with _gc_paused():
+        if 'metadata' in df:
+            metadata = [m or {} for m in df['metadata'].tolist()]
+        else:
+            metadata = [{}] * n
+        events = [
+            {'event_type': event_type, 'event_timestamp': ts, 'metadata': meta}
+            for event_type, ts, meta in zip(event_types.tolist(), iso, metadata)
+        ]
+        # Product list each event feeds (-1 for none), product ids looked up only for those
+        list_of = event_types.map(LIST_OF_TYPE).fillna(-1).to_numpy(dtype=np.int64)
+        feeding = np.flatnonzero(list_of >= 0)
+        feeding_metadata = [metadata[i] for i in feeding.tolist()]
+        product_ids = np.array(
+            [m.get('product_id') if isinstance(m, dict) else None for m in feeding_metadata], dtype=object
+        )
+        keep = product_ids.astype(bool)
+        feeding, product_ids, list_of = feeding[keep], product_ids[keep], list_of[feeding[keep]]
+
+        sessions = pd.DataFrame({
+            'session_id': _session_ids(session_users, [iso[i] for i in starts.tolist()]),
+            'user_id': session_users,
+            'session_start': session_start,
+            'session_end': session_end,
+        })
+        for code, column in enumerate(PRODUCT_LISTS):
+            selected = list_of == code
+            # Selected events stay in time order, so each session's are one slice
+            product_bounds = np.searchsorted(session_of[feeding[selected]], np.arange(len(starts) + 1))
+            sessions[column] = _split(product_ids[selected].tolist(), product_bounds)
+        sessions['events'] = _split(events, bounds)
+    sessions['session_length_seconds'] = (
+        (session_end - session_start).dt.total_seconds().to_numpy().astype(np.int64)
+    )
+    return sessions[SESSION_COLUMNS]
@@ -0,0 +1,259 @@
+import json
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pytest
+import etl_batch
+from benchmarks.synthetic_events import generate_events
+from config import Config
+from etl_batch import clean_events, rehydrate_events, sessionize_incremental
+from sessionize import SESSION_COLUMNS, session_id, sessionize_events
+
+TIMEOUT = pd.Timedelta(seconds=Config.SESSION_TIMEOUT_SECONDS)
+START = pd.Timestamp('2024-01-01', tz='UTC')
+
+# user_sessions columns under the names sessionize_events gives them
+STORED_COLUMNS = {
+    'session_id': 'session_id', 'user_id': 'user_id', 'session_start': 'session_start',
+    'session_end': 'session_end', 'viewed': 'viewed_products', 'cart': 'added_to_cart',
+    'purchased': 'purchased', 'length': 'session_length_seconds', 'events': 'events',
+}
+
+
+class Scalar:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeWarehouse:
+    """
+    events_clean, user_sessions, the ETL watermark and its seen ids in
+    memory, answering the statements etl_batch issues. Only events with
+    id <= visible_upto and not in `uncommitted` exist yet, so a test can
+    commit them in batches and out of id order.
+    """
+
+    def __init__(self, events: pd.DataFrame):
+        self.events = events
+        self.visible_upto = 0
+        self.uncommitted = set()
+        self.watermark = 0
+        self.seen = set()
+        self.sessions = {}
+
+    def connect(self):
+        return self
+
+    def execution_options(self, **options):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def visible_ids(self, after: int, upto: int) -> set:
+        return {i for i in range(after + 1, min(upto, self.visible_upto) + 1) if i not in self.uncommitted}
+
+    def execute(self, clause, params=None):
+        sql = ' '.join(str(clause).split())
+        if sql.startswith('INSERT INTO rollup_watermarks'):
+            return None
+        if sql.startswith('SELECT last_event_id'):
+            return Scalar(self.watermark)
+        if sql.startswith('SELECT EXISTS (SELECT 1 FROM rollup_seen_events'):
+            return Scalar(bool(self.seen))
+        if sql.startswith('SELECT COALESCE(MAX(id), 0) FROM events_clean'):
+            return Scalar(max(self.visible_ids(0, self.visible_upto), default=0))
+        if sql.startswith('INSERT INTO rollup_seen_events'):
+            self.seen |= self.visible_ids(params['low'], params['upto'])
+            return None
+        if sql.startswith('DELETE FROM rollup_seen_events'):
+            self.seen = {i for i in self.seen if 'event_id <=' in sql and i > params['low']}
+            return None
+        if sql.startswith('UPDATE rollup_watermarks'):
+            self.watermark = params['upto']
+            return None
+        if sql.startswith('DELETE FROM user_sessions'):
+            for stale in params['ids']:
+                del self.sessions[stale]
+            return None
+        if sql.startswith('INSERT INTO user_sessions'):
+            for row in params:
+                # JSONB round trip, as psycopg2 hands it back
+                self.sessions[row['session_id']] = dict(row, events=json.loads(row['events']))
+            return None
+        raise AssertionError(f"Unexpected statement: {sql}")
+
+    def read_sql(self, clause, conn, params):
+        sql = ' '.join(str(clause).split())
+        if 'FROM events_clean' in sql:
+            ids = self.visible_ids(params.get('after', 0), params['upto'])
+            if 'rollup_seen_events' in sql:
+                ids -= self.seen
+            return self.events[self.events['id'].isin(ids)].copy()
+        if 'FROM user_sessions' in sql:
+            rows = [
+                row for row in self.sessions.values()
+                if row['user_id'] in params['users'] and row['session_end'] >= params['since']
+            ]
+            return pd.DataFrame(rows, columns=['session_id', 'user_id', 'events'])
+        raise AssertionError(f"Unexpected query: {sql}")
+
+    def stored_sessions(self) -> pd.DataFrame:
+        stored = pd.DataFrame(list(self.sessions.values())).rename(columns=STORED_COLUMNS)
+        return stored[SESSION_COLUMNS].sort_values('session_id').reset_index(drop=True)
+
+
+@pytest.fixture
+def warehouse(monkeypatch, tmp_path):
+    def install(events):
+        fake = FakeWarehouse(events)
+        monkeypatch.setattr(etl_batch, 'engine', fake)
+        monkeypatch.setattr(pd, 'read_sql', fake.read_sql)
+        monkeypatch.setattr(Config, 'BATCH_OUTPUT_DIR', str(tmp_path))
+        return fake
+    return install
+
+
+def arrival_ordered_events(n: int, seed: int = 3) -> pd.DataFrame:
+    """
+    Synthetic events_clean rows with ids in arrival order: about 5% arrive
+    minutes to hours after their timestamp.
+    """
+    events = generate_events(n, days=1, seed=seed)
+    rng = np.random.default_rng(seed)
+    timestamps = pd.to_datetime(events['event_timestamp'], utc=True, format='ISO8601')
+    delay = rng.exponential(3600, len(events)) * (rng.random(len(events)) < 0.05)
+    arrival = timestamps + pd.to_timedelta(delay, unit='s')
+    events = events.iloc[np.argsort(arrival.to_numpy(), kind='stable')].reset_index(drop=True)
+    events['id'] = np.arange(1, len(events) + 1)
+    return events
+
+
+def full_run(events: pd.DataFrame) -> pd.DataFrame:
+    sessions = sessionize_events(clean_events(events.copy()))
+    return sessions.sort_values('session_id').reset_index(drop=True)
+
+
+def view(user, ts, product):
+    return {'user_id': user, 'event_type': 'view', 'event_timestamp': ts, 'metadata': {'product_id': product}}
+
+
+def test_rehydrate_events_round_trips_stored_sessions():
+    events = clean_events(arrival_ordered_events(400).drop(columns='id'))
+    sessions = sessionize_events(events)
+    stored = sessions[['session_id', 'user_id', 'events']].assign(
+        events=[json.loads(json.dumps(e)) for e in sessions['events']]
+    )
+    rehydrated = rehydrate_events(stored)
+    assert len(rehydrated) == len(events)
+    pd.testing.assert_frame_equal(sessionize_events(rehydrated), sessions, check_dtype=False)
+
+
+def test_incremental_extends_open_sessions_and_replaces_merged_ones():
+    first = pd.DataFrame([view('a', START, 'p1'), view('a', START + 2 * TIMEOUT, 'p3'),
+                          view('b', START, 'p9')])
+    stored = sessionize_events(first)
+    # A late event bridges a's two sessions; another extends a's open one.
+    new = pd.DataFrame([view('a', START + TIMEOUT, 'p2'), view('a', START + 2 * TIMEOUT + TIMEOUT / 2, 'p4')])
+    open_sessions = stored[stored['user_id'] == 'a'][['session_id', 'user_id', 'events']]
+
+    changed, stale_ids = sessionize_incremental(new, open_sessions)
+
+    assert stale_ids == [session_id('a', START + 2 * TIMEOUT)]
+    assert changed['session_id'].tolist() == [session_id('a', START)]
+    assert changed['viewed_products'].tolist() == [['p1', 'p2', 'p3', 'p4']]
+    expected = sessionize_events(pd.concat([first, new], ignore_index=True))
+    pd.testing.assert_frame_equal(changed, expected[expected['user_id'] == 'a'].reset_index(drop=True))
+
+
+def test_incremental_leaves_untouched_sessions_alone():
+    stored = sessionize_events(pd.DataFrame([view('a', START, 'p1'), view('a', START + 3 * TIMEOUT, 'p2')]))
+    new = pd.DataFrame([view('a', START + 3 * TIMEOUT + TIMEOUT / 2, 'p3')])
+    changed, stale_ids = sessionize_incremental(new, stored[['session_id', 'user_id', 'events']])
+    assert stale_ids == []
+    assert changed['session_id'].tolist() == [session_id('a', START + 3 * TIMEOUT)]
+
+
+def test_two_incremental_batches_match_a_full_run(warehouse):
+    events = arrival_ordered_events(3000)
+    fake = warehouse(events)
+
+    fake.visible_upto = len(events) // 2
+    etl_batch.run_incremental_etl()
+    assert fake.watermark == len(events) // 2
+    first_batch = set(fake.sessions)
+
+    fake.visible_upto = len(events)
+    etl_batch.run_incremental_etl()
+    assert fake.watermark == len(events)
+
+    expected = full_run(events)
+    pd.testing.assert_frame_equal(fake.stored_sessions(), expected, check_dtype=False)
+    # Sessions spanning the split were carried over and extended in place;
+    # late events moved some starts, and those rows were deleted.
+    assert first_batch & set(fake.sessions)
+    assert first_batch - set(expected['session_id'])
+
+
+def test_events_committed_late_below_the_watermark_are_sessionized(warehouse, monkeypatch):
+    monkeypatch.setattr(Config, 'ETL_ID_OVERLAP', 500)
+    events = arrival_ordered_events(3000)
+    fake = warehouse(events)
+    # Ids taken just before the first run's watermark, committed only after it
+    half = len(events) // 2
+    fake.uncommitted = set(range(half - 300, half, 7))
+
+    fake.visible_upto = half
+    etl_batch.run_incremental_etl()
+    assert fake.watermark == half
+
+    fake.uncommitted = set()
+    fake.visible_upto = len(events)
+    etl_batch.run_incremental_etl()
+    pd.testing.assert_frame_equal(fake.stored_sessions(), full_run(events), check_dtype=False)
+    # Only the last ETL_ID_OVERLAP ids are remembered.
+    assert min(fake.seen) == len(events) - 500 + 1
+
+    # A re-run finds nothing new and writes nothing.
+    before = dict(fake.sessions)
+    etl_batch.run_incremental_etl()
+    assert fake.sessions == before
+
+
+def test_incremental_without_new_events_writes_nothing(warehouse):
+    events = arrival_ordered_events(200)
+    fake = warehouse(events)
+    fake.visible_upto = len(events)
+    etl_batch.run_incremental_etl()
+    before = dict(fake.sessions)
+
+    fake.execute = lambda clause, params=None: (
+        FakeWarehouse.execute(fake, clause, params)
+        if ' '.join(str(clause).split()).startswith(('INSERT INTO rollup', 'SELECT'))
+        else pytest.fail(f"Unexpected write: {clause}")
+    )
+    etl_batch.run_incremental_etl()
+    assert fake.sessions == before
+    assert fake.watermark == len(events)
+
+
+def test_full_run_sets_the_watermark_for_incremental_runs(warehouse):
+    events = arrival_ordered_events(1000)
+    fake = warehouse(events)
+    fake.visible_upto = 600
+    etl_batch.run_etl()
+    assert fake.watermark == 600
+
+    fake.visible_upto = len(events)
+    etl_batch.run_incremental_etl()
+    pd.testing.assert_frame_equal(fake.stored_sessions(), full_run(events), check_dtype=False)
@@ -0,0 +1,76 @@
+import pandas as pd
+from benchmarks.synthetic_events import generate_events
+from config import Config
+from etl_batch import clean_events
+from sessionize import SESSION_COLUMNS, session_id, sessionize_events
+
+
+def reference_sessions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Event-by-event sessionizer (the loop sessionize_events replaced), with a
+    stable sort so events at equal timestamps keep their input order.
+    """
+    sessions = []
+    for user, group in df.sort_values(['user_id', 'event_timestamp'], kind='mergesort').groupby('user_id'):
+        last_ts = None
+        for row in group.itertuples():
+            ts, metadata = row.event_timestamp, row.metadata or {}
+            if last_ts is None or (ts - last_ts).total_seconds() > Config.SESSION_TIMEOUT_SECONDS:
+                session = {'user_id': user, 'session_start': ts, 'viewed_products': [],
+                           'added_to_cart': [], 'purchased': [], 'events': []}
+                sessions.append(session)
+            session['session_end'] = ts
+            session['events'].append(
+                {'event_type': row.event_type, 'event_timestamp': ts.isoformat(), 'metadata': metadata}
+            )
+            product_id = metadata.get('product_id')
+            if product_id:
+                if row.event_type == 'view':
+                    session['viewed_products'].append(product_id)
+                elif row.event_type in ('add_to_cart', 'cart'):
+                    session['added_to_cart'].append(product_id)
+                elif row.event_type == 'purchase':
+                    session['purchased'].append(product_id)
+            last_ts = ts
+    for session in sessions:
+        session['session_id'] = session_id(session['user_id'], session['session_start'])
+        session['session_length_seconds'] = int(
+            (session['session_end'] - session['session_start']).total_seconds()
+        )
+    return pd.DataFrame(sessions, columns=SESSION_COLUMNS)
+
+
+def test_matches_event_by_event_sessionizer():
+    events = clean_events(generate_events(3000, seed=7).drop(columns='id'))
+    expected = reference_sessions(events)
+    result = sessionize_events(events)
+    assert len(result) > 100
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_gap_boundaries_ties_and_missing_products():
+    timeout = Config.SESSION_TIMEOUT_SECONDS
+    start = pd.Timestamp('2024-01-01', tz='UTC')
+    events = pd.DataFrame({
+        'user_id': ['b', 'a', 'a', 'a', 'a', 'b'],
+        'event_type': ['view', 'view', 'purchase', 'add_to_cart', 'view', 'cart'],
+        'event_timestamp': [
+            start, start, start, start + pd.Timedelta(seconds=timeout),
+            start + pd.Timedelta(seconds=2 * timeout + 1), start,
+        ],
+        'metadata': [{'product_id': 'p1'}, {'product_id': 'p2'}, {'product_id': 'p3'},
+                     {}, None, {'product_id': 'p4'}],
+    })
+    result = sessionize_events(events)
+    pd.testing.assert_frame_equal(result, reference_sessions(events), check_dtype=False)
+    # A gap of exactly the timeout stays in the session, one past it does not.
+    assert result['user_id'].tolist() == ['a', 'a', 'b']
+    assert result['session_length_seconds'].tolist() == [timeout, 0, 0]
+    assert result['purchased'].tolist() == [['p3'], [], []]
+    assert result['added_to_cart'].tolist() == [[], [], ['p4']]
+
+
+def test_session_ids_are_stable_across_runs():
+    events = clean_events(generate_events(500, seed=1).drop(columns='id'))
+    assert sessionize_events(events)['session_id'].tolist() == \
+        sessionize_events(events.sample(frac=1, random_state=0))['session_id'].tolist()